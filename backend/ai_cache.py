@@ -0,0 +1,174 @@
+import hashlib
+import json
+import re
+import string
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+# Response cache for the AI coach.
+#
+# Keys are derived from the normalized user message plus everything else
+# that shapes the answer (system prompt, earlier turns, model and sampling
+# parameters), so near-identical questions share an entry but a change of
+# prompt or model never serves a stale reply.
+#
+# Prompts without per-user context ("context": false at the start of a
+# conversation) are shared between users. A prompt that carries the
+# training digest or earlier turns is scoped to its user: the key includes
+# the user id, and since the digest is part of the hashed messages, new
+# training data moves the user to a fresh key.
+
+_PUNCTUATION = str.maketrans('', '', string.punctuation)
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_message(text):
+    # "How many sets for hypertrophy?" == "how many  sets for Hypertrophy"
+    text = unicodedata.normalize('NFKC', text).lower().translate(_PUNCTUATION)
+    return _WHITESPACE.sub(' ', text).strip()
+
+
+def cache_key(messages, model, params, scope=None):
+    # ``scope`` (a user id) keeps personal prompts out of the shared entries
+    *context, last = messages
+    material = {
+        'scope': scope,
+        'context': context,
+        'message': normalize_message(last['content']),
+        'model': model,
+        'params': sorted(params.items())
+    }
+    digest = hashlib.sha256(json.dumps(material, sort_keys=True).encode()).hexdigest()
+    return f"chat:{digest}"
+
+
+class LRUCacheBackend:
+    """In-process cache with LRU eviction and a per-entry TTL."""
+
+    def __init__(self, max_entries=1024, ttl=3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def size(self):
+        return len(self._entries)
+
+
+class RedisCacheBackend:
+    """Shared cache for multi-worker deployments.
+
+    Size is bounded by the server's maxmemory policy (use allkeys-lru);
+    every entry also carries the TTL.
+    """
+
+    def __init__(self, url, ttl=3600, prefix='fitness:'):
+        import redis
+
+        self.ttl = ttl
+        self.prefix = prefix
+        self.evictions = 0
+        self._client = redis.Redis.from_url(url)
+
+    def get(self, key):
+        value = self._client.get(self.prefix + key)
+        return value.decode() if value is not None else None
+
+    def set(self, key, value):
+        self._client.set(self.prefix + key, value, ex=self.ttl)
+
+    def clear(self):
+        for key in self._client.scan_iter(self.prefix + 'chat:*'):
+            self._client.delete(key)
+
+    def size(self):
+        return sum(1 for _ in self._client.scan_iter(self.prefix + 'chat:*'))
+
+
+class ResponseCache:
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def _count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def get(self, key):
+        # A broken cache must never break the coach: errors count as misses
+        try:
+            value = self.backend.get(key)
+        except Exception as e:
+            print(f"AI cache error: {str(e)}")
+            self._count('errors')
+            value = None
+        self._count('hits' if value is not None else 'misses')
+        return value
+
+    def set(self, key, value):
+        try:
+            self.backend.set(key, value)
+        except Exception as e:
+            print(f"AI cache error: {str(e)}")
+            self._count('errors')
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        try:
+            size = self.backend.size()
+        except Exception:
+            size = None
+        return {
+            'backend': type(self.backend).__name__,
+            'hits': self.hits,
+            'misses': self.misses,
+            'errors': self.errors,
+            'evictions': self.backend.evictions,
+            'size': size,
+            'hitRate': round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+
+def init_ai_cache(app):
+    backend_name = app.config['AI_CACHE_BACKEND']
+    ttl = app.config['AI_CACHE_TTL']
+
+    if backend_name == 'none':
+        app.extensions['ai_cache'] = None
+        return
+    if backend_name == 'redis':
+        backend = RedisCacheBackend(app.config['AI_CACHE_REDIS_URL'], ttl=ttl)
+    else:
+        backend = LRUCacheBackend(max_entries=app.config['AI_CACHE_MAX_ENTRIES'], ttl=ttl)
+
+    app.extensions['ai_cache'] = ResponseCache(backend)
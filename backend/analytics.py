@@ -0,0 +1,400 @@
+import threading
+from collections import OrderedDict
+from datetime import date, timedelta
+import numpy as np
+from flask import Blueprint, current_app, jsonify, request
+from flask_jwt_extended import jwt_required
+from sqlalchemy import event
+from archive import set_source
+from change_log import WORKOUT
+from changes import on_training_data_changed
+from db_pool import RoutingSession
+from http_cache import conditional_get
+from models import db, User, Workout, Exercise, SyncChange
+from user_cache import current_user_id
+
+analytics_bp = Blueprint('analytics', __name__, url_prefix='/api/workouts/analytics')
+
+# Progression analytics over a user's full set history.
+#
+# Each user's sets are loaded once into column arrays (SetHistory) and every
+# metric is computed with NumPy over those arrays. Histories are kept per
+# process. Appends this process commits record the data_version they
+# committed as; when every version since the cached one is such an append,
+# just the sets of the workouts logged at those versions in the sync change
+# feed (change_log.py) are fetched and appended. Set ids are not used for
+# this: they are handed out at insert, not at commit, so concurrent writes
+# can commit them out of order. Any other change, a rolled
+# back append or a version bump from another worker reloads the history.
+
+RESULTS_PER_USER = 16
+DEFAULT_ROLLING_WEEKS = 4
+MAX_ROLLING_WEEKS = 52
+
+# Writes that only add sets; anything else invalidates a cached history
+APPEND_KINDS = {'workout_created', 'workouts_imported'}
+
+# 1970-01-01 was a Thursday; shifting by 3 days starts weeks on Monday
+EPOCH = date(1970, 1, 1)
+WEEK_OFFSET_DAYS = 3
+
+
+def estimate_1rm(weight, reps):
+    """Epley estimate, vectorized. A single rep is its own max; sets
+    without load or reps estimate 0."""
+    weight = np.asarray(weight, dtype=np.float64)
+    reps = np.asarray(reps, dtype=np.float64)
+    e1rm = np.where(reps > 1, weight * (1 + reps / 30), weight)
+    return np.where((weight > 0) & (reps > 0), e1rm, 0.0)
+
+
+def week_index(days):
+    return (days + WEEK_OFFSET_DAYS) // 7
+
+
+def week_start_date(index):
+    return EPOCH + timedelta(days=int(index) * 7 - WEEK_OFFSET_DAYS)
+
+
+def epoch_days(day):
+    return (day - EPOCH).days
+
+
+class SetHistory:
+    """Column arrays of one user's sets, sorted by workout time.
+
+    ``lock`` guards both extending the arrays and computing from them.
+    ``results`` memoizes computed analytics until the history changes.
+    """
+
+    def __init__(self, version):
+        self.version = version
+        # Versions committed by this process's own appends since ``version``
+        self.appended = set()
+        self.lock = threading.Lock()
+        self.results = OrderedDict()
+        self.names = []
+        self._codes = {}
+        self.set_id = np.empty(0, dtype=np.int64)
+        self.workout_id = np.empty(0, dtype=np.int64)
+        self.time = np.empty(0, dtype='datetime64[s]')
+        self.code = np.empty(0, dtype=np.int32)
+        self.reps = np.empty(0, dtype=np.int32)
+        self.weight = np.empty(0, dtype=np.float64)
+        self._derive()
+
+    def extend(self, rows):
+        # A load that raced a commit can already hold some of the rows
+        known = np.isin(np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows)), self.set_id)
+        rows = [row for row, skip in zip(rows, known) if not skip]
+        if not rows:
+            return
+        set_ids, workout_ids, times, names, reps, weights = zip(*rows)
+        codes = np.fromiter(
+            (self._codes.setdefault(name, len(self._codes)) for name in names),
+            dtype=np.int32, count=len(names)
+        )
+        self.names = list(self._codes)
+
+        self.set_id = np.concatenate([self.set_id, np.array(set_ids, dtype=np.int64)])
+        self.workout_id = np.concatenate([self.workout_id, np.array(workout_ids, dtype=np.int64)])
+        self.time = np.concatenate([self.time, np.array(times, dtype='datetime64[s]')])
+        self.code = np.concatenate([self.code, codes])
+        self.reps = np.concatenate([self.reps, np.array(reps, dtype=np.int32)])
+        # NULL weight (bodyweight work) counts as no external load
+        self.weight = np.concatenate([self.weight, np.nan_to_num(np.array(weights, dtype=np.float64))])
+
+        # Imported history can predate what is cached; keep time order
+        order = np.lexsort((self.set_id, self.time))
+        for column in ('set_id', 'workout_id', 'time', 'code', 'reps', 'weight'):
+            setattr(self, column, getattr(self, column)[order])
+        self._derive()
+        self.results.clear()
+
+    def _derive(self):
+        self.day = self.time.astype('datetime64[D]').astype(np.int64)
+        self.week = week_index(self.day)
+        self.e1rm = estimate_1rm(self.weight, self.reps)
+        self.volume = self.reps * self.weight
+
+    def __len__(self):
+        return len(self.set_id)
+
+
+def load_sets(user_id, workout_ids=None):
+    # Whole history, so archived sets too
+    sets = set_source()
+    query = (
+        db.select(sets.c.id, Workout.id, Workout.created_at, Exercise.name, sets.c.reps, sets.c.weight)
+        .select_from(sets)
+        .join(Exercise, Exercise.id == sets.c.exercise_id)
+        .join(Workout, Workout.id == Exercise.workout_id)
+        .where(Workout.user_id == user_id)
+    )
+    if workout_ids is not None:
+        query = query.where(Workout.id.in_(workout_ids))
+    return db.session.execute(query).all()
+
+
+def workouts_logged(user_id, after_version, version):
+    # Workouts the change feed stamped with a version in (after_version, version]
+    return (
+        db.select(SyncChange.entity_id)
+        .where(SyncChange.user_id == user_id, SyncChange.entity == WORKOUT,
+               SyncChange.version > after_version, SyncChange.version <= version)
+    )
+
+
+class HistoryCache:
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        with self._lock:
+            history = self._entries.get(user_id)
+            if history is not None:
+                self._entries.move_to_end(user_id)
+            return history
+
+    def put(self, user_id, history):
+        max_users = current_app.config['ANALYTICS_CACHE_USERS']
+        with self._lock:
+            self._entries[user_id] = history
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > max_users:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+history_cache = HistoryCache()
+
+
+@on_training_data_changed
+def track_history_changes(user_id, kind):
+    user_id = int(user_id)
+    history = history_cache.get(user_id)
+    if history is None:
+        return
+    if kind not in APPEND_KINDS:
+        history_cache.invalidate(user_id)
+        return
+    # http_cache.bump_data_version (imported above, so registered first) has
+    # already bumped the version in this transaction: it is the version the
+    # append commits as. Recorded only once the commit succeeds
+    version = db.session.execute(db.select(User.data_version).where(User.id == user_id)).scalar()
+    db.session.info.setdefault('history_appends', []).append((user_id, version))
+
+
+@event.listens_for(RoutingSession, 'after_commit')
+def record_committed_appends(session):
+    for user_id, version in session.info.pop('history_appends', ()):
+        history = history_cache.get(user_id)
+        if history is not None:
+            with history.lock:
+                history.appended.add(version)
+
+
+@event.listens_for(RoutingSession, 'after_soft_rollback')
+def forget_rolled_back_appends(session, previous_transaction):
+    session.info.pop('history_appends', None)
+
+
+def get_history(user_id):
+    """Return the user's SetHistory, loading only what changed.
+
+    The cached copy is current when its version matches users.data_version.
+    If every version in between was committed by an append in this process,
+    only the sets of the workouts those appends created are fetched;
+    otherwise the history is reloaded.
+    """
+    user_id = int(user_id)
+    version = db.session.execute(
+        db.select(User.data_version).where(User.id == user_id)
+    ).scalar() or 0
+
+    history = history_cache.get(user_id)
+    if history is not None:
+        with history.lock:
+            if history.version == version:
+                return history
+            if history.appended.issuperset(range(history.version + 1, version + 1)):
+                history.extend(load_sets(user_id, workouts_logged(user_id, history.version, version)))
+                history.version = version
+                history.appended = {appended for appended in history.appended if appended > version}
+                return history
+
+    history = SetHistory(version)
+    history.extend(load_sets(user_id))
+    history_cache.put(user_id, history)
+    return history
+
+
+# ============== COMPUTATION ==============
+
+def _record_breaks(group, values):
+    """Flag entries that beat every earlier entry of the same group.
+
+    ``group`` must be sorted ascending and ``values`` non-negative. Offsetting
+    each group above the previous one lets a single maximum.accumulate act
+    as a per-group running max. Returns (is_record, previous_best).
+    """
+    offset = group * (float(values.max()) + 1)
+    running = np.maximum.accumulate(values + offset)
+    previous = np.r_[0.0, running[:-1]]
+    first = np.r_[True, group[1:] != group[:-1]]
+    previous_best = np.where(first, 0.0, previous - offset)
+    return ~first & (values > previous_best), previous_best
+
+
+def personal_records(history):
+    """Per-session bests that beat all earlier sessions for the exercise."""
+    if not len(history):
+        return []
+
+    # Group sets into (exercise, workout) sessions ordered by time
+    order = np.lexsort((history.workout_id, history.day, history.code))
+    code = history.code[order]
+    workout_id = history.workout_id[order]
+    starts = np.flatnonzero(np.r_[True, (code[1:] != code[:-1]) | (workout_id[1:] != workout_id[:-1])])
+
+    session_code = code[starts]
+    session_workout = workout_id[starts]
+    session_day = history.day[order][starts]
+    events = []
+    for kind, values in (('e1rm', history.e1rm), ('weight', history.weight)):
+        best = np.maximum.reduceat(values[order], starts)
+        is_record, previous = _record_breaks(session_code, best)
+        for idx in np.flatnonzero(is_record):
+            events.append({
+                'exercise': history.names[session_code[idx]],
+                'type': kind,
+                'date': (EPOCH + timedelta(days=int(session_day[idx]))).isoformat(),
+                'workoutId': int(session_workout[idx]),
+                'value': round(float(best[idx]), 2),
+                'previous': round(float(previous[idx]), 2)
+            })
+    events.sort(key=lambda event: (event['date'], event['exercise'], event['type']))
+    return events
+
+
+def compute_analytics(history, start=None, end=None, exercises=None, window=DEFAULT_ROLLING_WEEKS):
+    """Weekly volume, e1RM trend and rolling averages per exercise name,
+    plus PR events, for sets between ``start`` and ``end`` (inclusive).
+
+    Rolling averages and PR baselines use the full history, so the first
+    weeks of a range are not skewed by where it starts.
+    """
+    names = history.names
+    mask = np.ones(len(history), dtype=bool)
+    if start is not None:
+        mask &= history.day >= epoch_days(start)
+    if end is not None:
+        mask &= history.day <= epoch_days(end)
+    if exercises:
+        wanted = [names.index(name) for name in exercises if name in names]
+        mask &= np.isin(history.code, wanted)
+
+    result = {'exercises': [], 'personalRecords': []}
+    if not mask.any():
+        return result
+
+    # Dense (exercise x week) grid over the whole history
+    first_week = int(history.week.min())
+    week_slot = history.week - first_week
+    shape = (len(names), int(week_slot.max()) + 1)
+    volume = np.zeros(shape)
+    set_count = np.zeros(shape, dtype=np.int64)
+    best_e1rm = np.zeros(shape)
+    np.add.at(volume, (history.code, week_slot), history.volume)
+    np.add.at(set_count, (history.code, week_slot), 1)
+    np.maximum.at(best_e1rm, (history.code, week_slot), history.e1rm)
+
+    # Trailing mean over `window` weeks, counting weeks without training
+    cumulative = np.cumsum(volume, axis=1)
+    shifted = np.zeros_like(cumulative)
+    shifted[:, window:] = cumulative[:, :-window]
+    span = np.minimum(np.arange(1, shape[1] + 1), window)
+    rolling = (cumulative - shifted) / span
+
+    in_range = np.zeros(shape, dtype=bool)
+    in_range[history.code[mask], week_slot[mask]] = True
+
+    for code in np.flatnonzero(in_range.any(axis=1)):
+        weeks = np.flatnonzero(in_range[code])
+        e1rm_weeks = weeks[best_e1rm[code, weeks] > 0]
+        result['exercises'].append({
+            'exercise': names[code],
+            'sets': int(set_count[code, weeks].sum()),
+            'volume': round(float(volume[code, weeks].sum()), 2),
+            'bestE1rm': round(float(best_e1rm[code, weeks].max()), 2),
+            'latestE1rm': round(float(best_e1rm[code, e1rm_weeks[-1]]), 2) if len(e1rm_weeks) else 0.0,
+            'weekly': [
+                {
+                    'weekStart': week_start_date(first_week + week).isoformat(),
+                    'sets': int(set_count[code, week]),
+                    'volume': round(float(volume[code, week]), 2),
+                    'bestE1rm': round(float(best_e1rm[code, week]), 2),
+                    'rollingVolume': round(float(rolling[code, week]), 2)
+                }
+                for week in weeks
+            ]
+        })
+    result['exercises'].sort(key=lambda item: -item['volume'])
+
+    selected = {item['exercise'] for item in result['exercises']}
+    first_day = start.isoformat() if start else ''
+    last_day = end.isoformat() if end else '9999-12-31'
+    result['personalRecords'] = [
+        event for event in personal_records(history)
+        if event['exercise'] in selected and first_day <= event['date'] <= last_day
+    ]
+    return result
+
+
+def get_analytics(user_id, start=None, end=None, exercises=None, window=DEFAULT_ROLLING_WEEKS):
+    history = get_history(user_id)
+    key = (start, end, tuple(sorted(exercises)) if exercises else None, window)
+    with history.lock:
+        cached = history.results.get(key)
+        if cached is None:
+            cached = compute_analytics(history, start, end, exercises, window)
+            history.results[key] = cached
+            while len(history.results) > RESULTS_PER_USER:
+                history.results.popitem(last=False)
+        return cached
+
+
+# ============== ANALYTICS ROUTES ==============
+
+@analytics_bp.route('', methods=['GET'])
+@jwt_required()
+@conditional_get
+def get_workout_analytics():
+    try:
+        start = date.fromisoformat(request.args['from']) if request.args.get('from') else None
+        end = date.fromisoformat(request.args['to']) if request.args.get('to') else None
+        window = int(request.args.get('window', DEFAULT_ROLLING_WEEKS))
+    except ValueError:
+        return jsonify({'message': 'Use YYYY-MM-DD for from/to and an integer window'}), 400
+    if not 1 <= window <= MAX_ROLLING_WEEKS:
+        return jsonify({'message': f'window must be between 1 and {MAX_ROLLING_WEEKS}'}), 400
+
+    try:
+        exercises = [name.strip() for name in request.args.get('exercise', '').split(',') if name.strip()]
+        result = get_analytics(current_user_id(), start, end, exercises or None, window)
+        return jsonify(dict(
+            result,
+            range={'from': start.isoformat() if start else None, 'to': end.isoformat() if end else None},
+            window=window
+        )), 200
+
+    except Exception as e:
+        return jsonify({'message': str(e)}), 500
@@ -0,0 +1,313 @@
+import re
+import threading
+import time
+from datetime import date, datetime, timedelta
+from flask import current_app
+from sqlalchemy import delete, func, insert, select, text, union_all
+from models import db, ArchiveBoundary, ArchivedCardioSession, ArchivedSet, CardioSession, Exercise, Set
+
+# Time partitioning and archival for sets and cardio_sessions.
+#
+# Both tables are split on a time key: sets.performed_at (a copy of the
+# workout's created_at) and cardio_sessions.date. On Postgres, migration
+# 0007 makes them range-partitioned by month plus a default partition for
+# rows outside the monthly ones; ensure_partitions() keeps
+# PARTITION_MONTHS_AHEAD months created ahead. On SQLite they stay plain
+# tables.
+#
+# archive_history() moves rows keyed before a month boundary
+# ARCHIVE_AFTER_DAYS back into the matching *_archive table. On Postgres,
+# whole monthly partitions are detached from the hot table and attached to
+# the archive, which is a catalog change. Other rows, including every row
+# on SQLite, are moved ARCHIVE_BATCH_SIZE at a time. The hot tables then
+# hold only recent months, so listings and writes only touch recent
+# partitions.
+#
+# Reads that can reach old rows select from set_source()/cardio_source().
+# When something has been archived and the read's range starts before the
+# boundary, that is a UNION ALL of both tables; otherwise it is the hot
+# table alone. Listings try the hot table first and read the archive only
+# for the part of a page that reaches back past the boundary
+# (archive_reaches). Writes to archived rows first move them back to the hot table
+# (restore_workout_sets, restore_cardio_session), and the next archive run
+# moves them out again.
+#
+# Boundaries are cached per process for ARCHIVE_BOUNDARY_TTL seconds. An
+# archive run publishes its new boundary, then waits out the TTL before
+# moving rows. That way no process is still reading only the hot table for
+# a range whose rows are being moved.
+
+MONTHLY_PARTITION = re.compile(r'_p(\d{4})(\d{2})$')
+
+
+class Tier:
+    """A hot table, its archive table and the time column rows split on."""
+
+    def __init__(self, hot, cold, key):
+        self.name = hot.name
+        self.hot = hot
+        self.cold = cold
+        self.key = key
+
+    def before(self, table, boundary):
+        # key < boundary, for a DATE or a TIMESTAMP key
+        column = table.c[self.key]
+        if isinstance(column.type, db.DateTime):
+            boundary = datetime.combine(boundary, datetime.min.time())
+        return column < boundary
+
+
+SETS = Tier(Set.__table__, ArchivedSet.__table__, 'performed_at')
+CARDIO = Tier(CardioSession.__table__, ArchivedCardioSession.__table__, 'date')
+TIERS = (SETS, CARDIO)
+
+_boundaries = {}
+_boundaries_read_at = None
+_boundaries_lock = threading.Lock()
+
+
+def month_start(day):
+    return date(day.year, day.month, 1)
+
+
+def next_month(month):
+    return date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def _as_date(value):
+    return value.date() if isinstance(value, datetime) else value
+
+
+# ============== READ-THROUGH ==============
+
+def archived_before(tier):
+    """Boundary below which the tier's rows may be archived, or None."""
+    global _boundaries, _boundaries_read_at
+    now = time.monotonic()
+    if _boundaries_read_at is None or now - _boundaries_read_at > current_app.config['ARCHIVE_BOUNDARY_TTL']:
+        # Always from the primary: a lagging replica's boundary could be
+        # older than rows already moved there
+        rows = db.session.execute(
+            select(ArchiveBoundary.table_name, ArchiveBoundary.archived_before),
+            bind_arguments={'bind': db.engine}
+        ).all()
+        with _boundaries_lock:
+            _boundaries = dict(rows)
+            _boundaries_read_at = now
+    return _boundaries.get(tier.name)
+
+
+def forget_boundaries():
+    global _boundaries_read_at
+    with _boundaries_lock:
+        _boundaries_read_at = None
+
+
+def source(tier, since=None):
+    """Table to read the tier's rows keyed at or after ``since`` from."""
+    boundary = archived_before(tier)
+    if boundary is None or (since is not None and _as_date(since) >= boundary):
+        return tier.hot
+    return union_all(select(tier.hot), select(tier.cold)).subquery(f'{tier.name}_all')
+
+
+def archive_reaches(tier, key):
+    """Whether archived rows can be keyed at ``key`` or later (None: unknown)."""
+    boundary = archived_before(tier)
+    return boundary is not None and (key is None or _as_date(key) < boundary)
+
+
+def set_source(since=None):
+    return source(SETS, since)
+
+
+def cardio_source(since=None):
+    return source(CARDIO, since)
+
+
+# ============== MOVING ROWS ==============
+
+def _move(source_table, target_table, *criteria, limit=None):
+    # DELETE ... RETURNING, then INSERT, in the caller's transaction: every
+    # reader sees a row in exactly one table, and a delete that waited on
+    # a concurrent update returns the updated row
+    statement = delete(source_table).where(*criteria)
+    if limit is not None:
+        batch = select(source_table.c.id).where(*criteria).order_by(source_table.c.id).limit(limit)
+        statement = statement.where(source_table.c.id.in_(batch))
+    rows = db.session.execute(statement.returning(*source_table.c)).all()
+    if rows:
+        db.session.execute(insert(target_table), [dict(row._mapping) for row in rows])
+    return len(rows)
+
+
+def restore_workout_sets(workout):
+    """Move an archived workout's sets back to the hot table before they change."""
+    boundary = archived_before(SETS)
+    if boundary is None or workout.created_at is None or workout.created_at.date() >= boundary:
+        return 0
+    exercise_ids = select(Exercise.id).where(Exercise.workout_id == workout.id)
+    return _move(SETS.cold, SETS.hot, SETS.cold.c.exercise_id.in_(exercise_ids))
+
+
+def restore_cardio_session(user_id, session_id):
+    """The user's archived cardio session, moved back to the hot table, or None."""
+    if archived_before(CARDIO) is None:
+        return None
+    cold = CARDIO.cold
+    if not _move(cold, CARDIO.hot, cold.c.id == session_id, cold.c.user_id == user_id):
+        return None
+    return db.session.get(CardioSession, session_id)
+
+
+# ============== POSTGRES PARTITIONS ==============
+
+def is_partitioned(table):
+    if db.engine.dialect.name != 'postgresql':
+        return False
+    return db.session.execute(
+        text("SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:name))"),
+        {'name': table.name}
+    ).scalar()
+
+
+def partition_months(table):
+    """{month: partition name} for a partitioned table's monthly partitions."""
+    names = db.session.execute(
+        text("SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+             "WHERE i.inhparent = to_regclass(:name)"),
+        {'name': table.name}
+    ).scalars()
+    months = {}
+    for name in names:
+        match = MONTHLY_PARTITION.search(name)
+        if match:
+            months[date(int(match.group(1)), int(match.group(2)), 1)] = name
+    return months
+
+
+def _bounds(month):
+    return f"FOR VALUES FROM ('{month.isoformat()}') TO ('{next_month(month).isoformat()}')"
+
+
+def create_partition(tier, parent, month):
+    # Monthly partitions are named after the hot table in both parents.
+    # Rows the hot table's default partition already holds for the month
+    # move into the new partition first, or ATTACH would refuse
+    name = f'{tier.name}_p{month:%Y%m}'
+    db.session.execute(text(f'CREATE TABLE {name} (LIKE {parent.name} INCLUDING DEFAULTS)'))
+    if parent is tier.hot:
+        db.session.execute(text(
+            f'WITH moved AS (DELETE FROM {tier.name}_default '
+            f'WHERE {tier.key} >= :lower AND {tier.key} < :upper RETURNING *) '
+            f'INSERT INTO {name} SELECT * FROM moved'
+        ), {'lower': month, 'upper': next_month(month)})
+    db.session.execute(text(f'ALTER TABLE {parent.name} ATTACH PARTITION {name} {_bounds(month)}'))
+    return name
+
+
+def ensure_partitions(months_ahead=None, today=None):
+    """Create the hot tables' monthly partitions up to ``months_ahead`` ahead."""
+    if months_ahead is None:
+        months_ahead = current_app.config['PARTITION_MONTHS_AHEAD']
+    created = []
+    for tier in TIERS:
+        if not is_partitioned(tier.hot):
+            continue
+        existing = partition_months(tier.hot)
+        month = month_start(today or date.today())
+        for _ in range(months_ahead + 1):
+            if month not in existing:
+                created.append(create_partition(tier, tier.hot, month))
+            month = next_month(month)
+        db.session.commit()
+    return created
+
+
+def _swap_partitions(tier, boundary):
+    # Whole months below the boundary. The CHECK constraint is validated
+    # while the partition is still attached and served; with it in place
+    # ATTACH skips its validation scan, so the DETACH/ATTACH transaction
+    # holds its locks only briefly
+    swapped = []
+    for month, name in sorted(partition_months(tier.hot).items()):
+        if next_month(month) > boundary:
+            break
+        check = f'{name}_range'
+        db.session.execute(text(
+            f"ALTER TABLE {name} ADD CONSTRAINT {check} CHECK ({tier.key} >= '{month.isoformat()}' "
+            f"AND {tier.key} < '{next_month(month).isoformat()}') NOT VALID"
+        ))
+        db.session.commit()
+        db.session.execute(text(f'ALTER TABLE {name} VALIDATE CONSTRAINT {check}'))
+        db.session.commit()
+        db.session.execute(text(f'ALTER TABLE {tier.name} DETACH PARTITION {name}'))
+        db.session.execute(text(f'ALTER TABLE {tier.cold.name} ATTACH PARTITION {name} {_bounds(month)}'))
+        db.session.commit()
+        swapped.append(name)
+    return swapped
+
+
+def _ensure_archive_months(tier, boundary):
+    # The archive has no default partition: create the months that rows
+    # about to be moved row by row need
+    existing = partition_months(tier.cold)
+    months = db.session.execute(
+        select(func.date_trunc('month', tier.hot.c[tier.key])).distinct()
+        .where(tier.before(tier.hot, boundary))
+    ).scalars().all()
+    for month in {_as_date(month) for month in months} - set(existing):
+        create_partition(tier, tier.cold, month)
+    db.session.commit()
+
+
+# ============== ARCHIVAL ==============
+
+def publish_boundary(boundary):
+    """Move every tier's boundary forward to ``boundary``; True if any moved."""
+    moved = False
+    for tier in TIERS:
+        row = db.session.get(ArchiveBoundary, tier.name)
+        if row is None:
+            db.session.add(ArchiveBoundary(table_name=tier.name, archived_before=boundary))
+            moved = True
+        elif row.archived_before < boundary:
+            row.archived_before = boundary
+            moved = True
+    db.session.commit()
+    forget_boundaries()
+    return moved
+
+
+def archive_history(before=None, wait=True):
+    """Move sets and cardio sessions keyed before ``before`` to the archive.
+
+    ``before`` defaults to ARCHIVE_AFTER_DAYS ago and is rounded down to the
+    start of its month. With ``wait`` a newly published boundary is left to
+    reach every process's cache before rows move. Returns the partitions and
+    rows moved per table.
+    """
+    config = current_app.config
+    ensure_partitions()
+    boundary = month_start(before or date.today() - timedelta(days=config['ARCHIVE_AFTER_DAYS']))
+    if publish_boundary(boundary) and wait:
+        time.sleep(config['ARCHIVE_BOUNDARY_TTL'])
+
+    report = {}
+    for tier in TIERS:
+        # A boundary published earlier may be further ahead than this run's
+        boundary = archived_before(tier)
+        partitions = []
+        if is_partitioned(tier.hot):
+            partitions = _swap_partitions(tier, boundary)
+            _ensure_archive_months(tier, boundary)
+
+        rows = 0
+        while True:
+            moved = _move(tier.hot, tier.cold, tier.before(tier.hot, boundary), limit=config['ARCHIVE_BATCH_SIZE'])
+            db.session.commit()
+            rows += moved
+            if moved < config['ARCHIVE_BATCH_SIZE']:
+                break
+        report[tier.name] = {'archivedBefore': boundary.isoformat(), 'partitions': partitions, 'rows': rows}
+    return report
@@ -0,0 +1,102 @@
+import math
+from flask import current_app
+from sqlalchemy import update
+from models import db, CardioSession
+
+# Derived metrics for cardio sessions.
+#
+# Computed once when a session is written (and by the backfill below for
+# older rows) and stored in indexed columns, so listings, range queries and
+# dashboard aggregates never normalize units or derive pace per row.
+#
+# Training load is Banister's TRIMP:
+#     minutes * HRr * 0.64 * e^(1.92 * HRr),  HRr = (HRavg - HRrest) / (HRmax - HRrest)
+# Users have no resting/max heart rate on file, so population defaults are
+# used (CARDIO_HR_REST, CARDIO_HR_MAX). Sessions without an average heart rate get no training load.
+
+METRICS_VERSION = 1
+
+TRIMP_A = 0.64
+TRIMP_B = 1.92
+
+METRES_PER_UNIT = {
+    'm': 1.0, 'meter': 1.0, 'meters': 1.0, 'metre': 1.0, 'metres': 1.0,
+    'km': 1000.0, 'kms': 1000.0, 'kilometer': 1000.0, 'kilometers': 1000.0,
+    'kilometre': 1000.0, 'kilometres': 1000.0,
+    'mi': 1609.344, 'mile': 1609.344, 'miles': 1609.344,
+    'yd': 0.9144, 'yard': 0.9144, 'yards': 0.9144,
+}
+DEFAULT_UNIT = 'km'
+
+BACKFILL_BATCH_SIZE = 1000
+
+
+def distance_m(distance, unit):
+    # Unknown or missing units are taken as the column default (km)
+    if not distance:
+        return 0.0
+    unit = (unit or DEFAULT_UNIT).strip().lower()
+    return distance * METRES_PER_UNIT.get(unit, METRES_PER_UNIT[DEFAULT_UNIT])
+
+
+def training_load(duration_minutes, avg_heart_rate):
+    if not duration_minutes or not avg_heart_rate:
+        return None
+    hr_rest, hr_max = current_app.config['CARDIO_HR_REST'], current_app.config['CARDIO_HR_MAX']
+    reserve = (avg_heart_rate - hr_rest) / (hr_max - hr_rest)
+    reserve = min(max(reserve, 0.0), 1.0)
+    return round(duration_minutes * reserve * TRIMP_A * math.exp(TRIMP_B * reserve), 1)
+
+
+def cardio_metrics(distance, distance_unit, duration_minutes, avg_heart_rate):
+    """Column values for the derived metrics of one session."""
+    metres = distance_m(distance, distance_unit)
+    seconds = (duration_minutes or 0) * 60
+    moving = metres > 0 and seconds > 0
+    return {
+        'distance_m': round(metres, 1) if metres else None,
+        'pace_s_per_km': round(seconds / (metres / 1000), 1) if moving else None,
+        'speed_kmh': round((metres / 1000) / (seconds / 3600), 2) if moving else None,
+        'training_load': training_load(duration_minutes, avg_heart_rate),
+        'metrics_version': METRICS_VERSION
+    }
+
+
+def apply_cardio_metrics(session):
+    for column, value in cardio_metrics(
+        session.distance, session.distance_unit, session.duration_minutes, session.avg_heart_rate
+    ).items():
+        setattr(session, column, value)
+
+
+def backfill_cardio_metrics(batch_size=BACKFILL_BATCH_SIZE):
+    """Compute metrics for sessions written before METRICS_VERSION.
+
+    Walks the table by primary key and commits one executemany UPDATE per
+    batch, so it can be interrupted and rerun. Returns the number of rows
+    updated.
+    """
+    updated = 0
+    last_id = 0
+    while True:
+        rows = db.session.execute(
+            db.select(
+                CardioSession.id, CardioSession.distance, CardioSession.distance_unit,
+                CardioSession.duration_minutes, CardioSession.avg_heart_rate
+            )
+            .where(CardioSession.id > last_id,
+                   db.or_(CardioSession.metrics_version.is_(None),
+                          CardioSession.metrics_version < METRICS_VERSION))
+            .order_by(CardioSession.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            return updated
+
+        db.session.execute(update(CardioSession), [
+            dict(cardio_metrics(distance, unit, duration, heart_rate), id=session_id)
+            for session_id, distance, unit, duration, heart_rate in rows
+        ])
+        db.session.commit()
+        updated += len(rows)
+        last_id = rows[-1][0]
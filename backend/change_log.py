@@ -0,0 +1,43 @@
+from datetime import datetime
+from sqlalchemy import delete, insert
+from models import db, User, SyncChange
+
+# Change feed for /api/sync.
+#
+# Every write path records which workouts and cardio sessions it touched,
+# right after training_data_changed() has bumped users.data_version in the
+# same transaction. Each entity keeps only its latest change, stamped with
+# that version, so "what changed since sync token N" is an indexed range
+# scan on (user_id, version) and the table grows with the number of
+# entities, not edits. Deletes leave tombstones.
+
+WORKOUT = 'workout'
+CARDIO = 'cardio'
+
+
+def log_changes(user_id, entity, entity_ids, deleted=False):
+    if not entity_ids:
+        return
+    version = db.session.execute(
+        db.select(User.data_version).where(User.id == user_id)
+    ).scalar()
+    db.session.execute(
+        delete(SyncChange)
+        .where(SyncChange.user_id == user_id, SyncChange.entity == entity,
+               SyncChange.entity_id.in_(entity_ids))
+        .execution_options(synchronize_session=False)
+    )
+    now = datetime.utcnow()
+    db.session.execute(insert(SyncChange), [
+        {'user_id': user_id, 'version': version, 'entity': entity, 'entity_id': entity_id,
+         'deleted': deleted, 'changed_at': now}
+        for entity_id in entity_ids
+    ])
+
+
+def changes_since(user_id, version):
+    """(entity, entity_id, deleted) for every entity changed after ``version``."""
+    return db.session.execute(
+        db.select(SyncChange.entity, SyncChange.entity_id, SyncChange.deleted)
+        .where(SyncChange.user_id == user_id, SyncChange.version > version)
+    ).all()
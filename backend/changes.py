@@ -0,0 +1,22 @@
+# Change notifications for per-user training data.
+#
+# Write routes call training_data_changed() inside their transaction after
+# modifying workouts or cardio sessions. Modules that keep derived per-user
+# state (digests, caches, versions) register a listener instead of being
+# called from every route.
+#
+# Kinds: workout_created, workout_updated, workout_deleted,
+#        cardio_created, cardio_deleted,
+#        workouts_imported, cardio_imported
+
+_listeners = []
+
+
+def on_training_data_changed(listener):
+    _listeners.append(listener)
+    return listener
+
+
+def training_data_changed(user_id, kind):
+    for listener in _listeners:
+        listener(user_id, kind)
@@ -0,0 +1,373 @@
+from flask import Blueprint, Response, current_app, request, jsonify, stream_with_context
+from flask_jwt_extended import current_user, jwt_required
+from ai_cache import cache_key, init_ai_cache
+from datetime import datetime
+from conversations import append_turn, load_window, new_conversation_id
+from digest import get_digest
+from instrumentation import record_ai_call, record_first_token
+from jobs import JobError, QueueFull, enqueue, job_accepted, prefers_async, queue_full_response, task
+from models import db, ChatMessage
+from pagination import PaginationError, paginate_desc, paginated_response
+from user_cache import current_user_id
+import json
+import threading
+import time
+
+chat_bp = Blueprint('chat', __name__, url_prefix='/api/chat')
+
+# Fitness coach personality
+SYSTEM_PROMPT = """You're an experienced fitness coach. 
+        Help with workouts, nutrition, and motivation. 
+        Keep advice practical and safe."""
+
+CHAT_PARAMS = {'max_tokens': 500, 'temperature': 0.7}
+
+
+class ConcurrencyLimiter:
+    """Caps in-flight LLM calls per worker process.
+
+    Up to ``max_concurrent`` calls run at once. Further callers wait in a
+    bounded queue for at most ``queue_timeout`` seconds; when the queue is
+    full or the wait times out, ``acquire`` returns False and the caller
+    should answer 429.
+
+    The OpenAI client is synchronous: every call, streamed or not, holds a
+    request thread (the streaming response's generator) until the reply is
+    complete. Streaming only gets tokens to the client sooner. This limit
+    is what keeps those calls from taking every worker thread, so keep
+    ``max_concurrent`` below the server's threads per process.
+    """
+
+    def __init__(self, max_concurrent, max_queue, queue_timeout):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._lock = threading.Lock()
+        self._waiting = 0
+
+    def acquire(self):
+        if self._slots.acquire(blocking=False):
+            return True
+
+        with self._lock:
+            if self._waiting >= self.max_queue:
+                return False
+            self._waiting += 1
+        try:
+            return self._slots.acquire(timeout=self.queue_timeout)
+        finally:
+            with self._lock:
+                self._waiting -= 1
+
+    def release(self):
+        self._slots.release()
+
+    def releaser(self):
+        # Idempotent release, safe to call from both a generator's finally
+        # block and the response close callback
+        released = threading.Event()
+
+        def release():
+            if not released.is_set():
+                released.set()
+                self.release()
+
+        return release
+
+    @property
+    def waiting(self):
+        return self._waiting
+
+
+def init_chat(app):
+    app.extensions['ai_limiter'] = ConcurrencyLimiter(
+        max_concurrent=app.config['AI_MAX_CONCURRENT'],
+        max_queue=app.config['AI_MAX_QUEUE'],
+        queue_timeout=app.config['AI_QUEUE_TIMEOUT']
+    )
+    init_ai_cache(app)
+
+
+def ai_enabled():
+    return bool(current_app.config.get('OPENAI_API_KEY'))
+
+
+def get_ai_client():
+    # Built on first use: importing openai and creating the HTTP client is
+    # the most expensive part of booting a worker
+    if not ai_enabled():
+        return None
+    client = current_app.extensions.get('ai_client')
+    if client is None:
+        from openai import OpenAI
+
+        client = OpenAI(
+            api_key=current_app.config['OPENAI_API_KEY'],
+            base_url=current_app.config.get('OPENAI_BASE_URL')
+        )
+        current_app.extensions['ai_client'] = client
+    return client
+
+
+def get_limiter():
+    return current_app.extensions['ai_limiter']
+
+
+def get_response_cache(data, shared):
+    # Skipped when disabled, when the request sends "cache": false or, for
+    # shared answers, when the user has opted out of them
+    cache = current_app.extensions.get('ai_cache')
+    if cache is None or data.get('cache') is False:
+        return None
+    if shared and current_user.ai_cache_opt_out:
+        return None
+    return cache
+
+
+def busy_response():
+    response = jsonify({'error': 'AI coach is busy. Please retry shortly.'})
+    response.status_code = 429
+    response.headers['Retry-After'] = str(current_app.config['AI_RETRY_AFTER'])
+    return response
+
+
+def wants_stream(data):
+    return bool(data.get('stream')) or 'text/event-stream' in request.headers.get('Accept', '')
+
+
+def sse_event(event, payload):
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+
+def stream_cached(ai_response, conversation_id):
+    yield sse_event('token', {'token': ai_response})
+    yield sse_event('done', {'cached': True, 'conversationId': conversation_id})
+
+
+def stream_completion(client, messages, release, on_reply, conversation_id):
+    # Relay tokens to the client as the upstream produces them
+    started = time.perf_counter()
+    finished = False
+    try:
+        stream = client.chat.completions.create(
+            model=current_app.config['AI_MODEL'], messages=messages, stream=True, **CHAT_PARAMS
+        )
+        tokens = []
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            token = chunk.choices[0].delta.content
+            if token:
+                if not tokens:
+                    record_first_token(time.perf_counter() - started)
+                tokens.append(token)
+                yield sse_event('token', {'token': token})
+        finished = True
+        record_ai_call(time.perf_counter() - started, 'stream', 'ok')
+        on_reply(''.join(tokens))
+        yield sse_event('done', {'conversationId': conversation_id})
+    except Exception as e:
+        if not finished:
+            record_ai_call(time.perf_counter() - started, 'stream', 'error')
+        print(f"AI error: {str(e)}")
+        yield sse_event('error', {'error': 'Failed to get response'})
+    finally:
+        release()
+
+
+@task('chat_reply', timeout=120, max_attempts=2)
+def chat_reply_job(user_id, messages, conversation_id, user_message, cache_key=None):
+    # Queued variant of the JSON reply below; shares the process's limiter
+    client = get_ai_client()
+    if not client:
+        raise JobError('AI coach unavailable. Configure API key.')
+    limiter = get_limiter()
+    if not limiter.acquire():
+        raise RuntimeError('AI coach is busy')
+    
+    client = client.with_options(timeout=current_app.config['AI_REQUEST_TIMEOUT'])
+    started = time.perf_counter()
+    try:
+        response = client.chat.completions.create(
+            model=current_app.config['AI_MODEL'], messages=messages, **CHAT_PARAMS
+        )
+    except Exception:
+        record_ai_call(time.perf_counter() - started, 'job', 'error')
+        raise
+    finally:
+        limiter.release()
+    record_ai_call(time.perf_counter() - started, 'job', 'ok')
+    
+    ai_response = response.choices[0].message.content
+    cache = current_app.extensions.get('ai_cache')
+    if cache is not None and cache_key is not None and ai_response:
+        cache.set(cache_key, ai_response)
+    append_turn(user_id, conversation_id, user_message, ai_response)
+    return {'response': ai_response, 'conversationId': conversation_id}
+
+
+# AI Fitness Coach endpoint
+@chat_bp.route('', methods=['POST'])
+@jwt_required()
+def chat_with_ai():
+    client = get_ai_client()
+    if not client:
+        return jsonify({'error': 'AI coach unavailable. Configure API key.'}), 503
+    
+    try:
+        data = request.get_json() or {}
+        user_message = data.get('message', '')
+        
+        if not user_message:
+            return jsonify({'error': 'No message provided'}), 400
+        
+        messages = [{"role": "system", "content": SYSTEM_PROMPT}]
+        
+        # Precomputed training summary: one primary-key lookup unless the
+        # user's data changed since it was last built
+        if data.get('context', True):
+            messages.append({"role": "system", "content": get_digest(current_user_id())})
+        
+        # Multi-turn: a bounded window of earlier messages in this conversation
+        user_id = current_user_id()
+        conversation_id = data.get('conversationId') or new_conversation_id()
+        if len(conversation_id) > 36:
+            return jsonify({'error': 'Invalid conversationId'}), 400
+        messages.extend(load_window(user_id, conversation_id))
+        
+        messages.append({"role": "user", "content": user_message})
+        client = client.with_options(timeout=current_app.config['AI_REQUEST_TIMEOUT'])
+        stream = wants_stream(data)
+        
+        # Cache hits skip the LLM and the concurrency limiter entirely. Prompts
+        # without per-user context (training digest, earlier turns) share
+        # replies between users; the others are cached for their user only
+        personal = len(messages) > 2
+        cache = get_response_cache(data, shared=not personal)
+        key = cache_key(
+            messages, current_app.config['AI_MODEL'], CHAT_PARAMS, scope=user_id if personal else None
+        ) if cache is not None else None
+        
+        def on_reply(ai_response, cached=False):
+            if cache is not None and ai_response and not cached:
+                cache.set(key, ai_response)
+            append_turn(user_id, conversation_id, user_message, ai_response)
+        
+        if cache is not None:
+            cached = cache.get(key)
+            if cached is not None:
+                on_reply(cached, cached=True)
+                if stream:
+                    return Response(stream_cached(cached, conversation_id), mimetype='text/event-stream',
+                                    headers={'Cache-Control': 'no-cache'})
+                return jsonify({'response': cached, 'cached': True, 'conversationId': conversation_id}), 200
+        
+        # "Prefer: respond-async": answer 202 now, the reply via /api/jobs/<id>
+        if prefers_async() and not stream:
+            try:
+                job = enqueue('chat_reply', user_id, {
+                    'messages': messages,
+                    'conversation_id': conversation_id,
+                    'user_message': user_message,
+                    'cache_key': key
+                })
+            except QueueFull:
+                return queue_full_response()
+            return job_accepted(job)
+        
+    except Exception as e:
+        # Digest, conversation history or queue failures: same JSON error
+        # as a failed completion
+        print(f"AI error: {str(e)}")
+        return jsonify({'error': 'Failed to get response'}), 500
+    
+    # Back-pressure: never let LLM calls occupy every worker thread
+    limiter = get_limiter()
+    if not limiter.acquire():
+        return busy_response()
+    release = limiter.releaser()
+    
+    if stream:
+        response = Response(
+            stream_with_context(stream_completion(client, messages, release, on_reply, conversation_id)),
+            mimetype='text/event-stream',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+        )
+        # Covers clients that disconnect before the first chunk is sent
+        response.call_on_close(release)
+        return response
+    
+    started = time.perf_counter()
+    answered = False
+    try:
+        response = client.chat.completions.create(
+            model=current_app.config['AI_MODEL'], messages=messages, **CHAT_PARAMS
+        )
+        answered = True
+        record_ai_call(time.perf_counter() - started, 'json', 'ok')
+        ai_response = response.choices[0].message.content
+        on_reply(ai_response)
+        
+        return jsonify({'response': ai_response, 'conversationId': conversation_id}), 200
+        
+    except Exception as e:
+        if not answered:
+            record_ai_call(time.perf_counter() - started, 'json', 'error')
+        print(f"AI error: {str(e)}")
+        return jsonify({'error': 'Failed to get response'}), 500
+    finally:
+        release()
+
+
+@chat_bp.route('/cache/stats', methods=['GET'])
+@jwt_required()
+def get_cache_stats():
+    cache = current_app.extensions.get('ai_cache')
+    if cache is None:
+        return jsonify({'enabled': False}), 200
+    return jsonify(dict(cache.stats(), enabled=True)), 200
+
+
+@chat_bp.route('/conversations', methods=['GET'])
+@jwt_required()
+def get_conversations():
+    try:
+        user_id = current_user_id()
+        last_message = db.func.max(ChatMessage.created_at)
+        
+        rows = db.session.execute(
+            db.select(ChatMessage.conversation_id, last_message, db.func.count(ChatMessage.id))
+            .where(ChatMessage.user_id == user_id)
+            .group_by(ChatMessage.conversation_id)
+            .order_by(last_message.desc())
+            .limit(50)
+        ).all()
+        
+        return jsonify([
+            {'conversationId': conversation_id, 'lastMessageAt': last_at.isoformat(), 'messages': count}
+            for conversation_id, last_at, count in rows
+        ]), 200
+        
+    except Exception as e:
+        return jsonify({'message': str(e)}), 500
+
+
+@chat_bp.route('/conversations/<conversation_id>/messages', methods=['GET'])
+@jwt_required()
+def get_conversation_messages(conversation_id):
+    try:
+        user_id = current_user_id()
+        query = ChatMessage.query.filter_by(user_id=user_id, conversation_id=conversation_id)
+        
+        # Newest first; pass X-Next-Cursor back as ?cursor= for older pages
+        messages, next_cursor = paginate_desc(
+            query, ChatMessage.created_at, ChatMessage.id, request.args, datetime.fromisoformat
+        )
+        
+        return paginated_response([message.to_dict() for message in messages], next_cursor), 200
+        
+    except PaginationError as e:
+        return jsonify({'message': str(e)}), 400
+    except Exception as e:
+        return jsonify({'message': str(e)}), 500
@@ -0,0 +1,61 @@
+import gzip
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # optional: only gzip is offered without it
+    brotli = None
+
+# Response compression for JSON API responses.
+#
+# Applied in after_request to complete (non-streamed) bodies above
+# COMPRESSION_MIN_SIZE when the client accepts br or gzip. Strong ETags get
+# the encoding appended, so each representation keeps its own validator;
+# etag_variants() lets conditional GET handlers accept either form.
+
+COMPRESSIBLE_TYPES = ('application/json', 'text/plain', 'text/csv', 'application/x-ndjson')
+ENCODINGS = ('br', 'gzip')
+
+
+def etag_variants(etag):
+    return [etag] + [f"{etag}-{encoding}" for encoding in ENCODINGS]
+
+
+def choose_encoding(accept_encoding):
+    if brotli is not None and 'br' in accept_encoding:
+        return 'br'
+    if 'gzip' in accept_encoding:
+        return 'gzip'
+    return None
+
+
+def init_compression(app):
+    if not app.config['COMPRESSION_ENABLED']:
+        return
+
+    @app.after_request
+    def compress_response(response):
+        if (response.direct_passthrough or response.is_streamed
+                or response.status_code < 200 or response.status_code >= 300
+                or 'Content-Encoding' in response.headers
+                or response.mimetype not in COMPRESSIBLE_TYPES):
+            return response
+
+        response.vary.add('Accept-Encoding')
+        encoding = choose_encoding(request.headers.get('Accept-Encoding', ''))
+        body = response.get_data()
+        if encoding is None or len(body) < app.config['COMPRESSION_MIN_SIZE']:
+            return response
+
+        level = app.config['COMPRESSION_LEVEL']
+        if encoding == 'br':
+            body = brotli.compress(body, quality=min(level, 11))
+        else:
+            body = gzip.compress(body, compresslevel=level)
+
+        response.set_data(body)
+        response.headers['Content-Encoding'] = encoding
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(f"{etag}-{encoding}")
+        return response
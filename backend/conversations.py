@@ -0,0 +1,49 @@
+import uuid
+from flask import current_app
+from models import db, ChatMessage
+from digest import estimate_tokens
+
+# Conversation storage for the AI coach.
+#
+# Messages are append-only and indexed by (user_id, conversation_id,
+# created_at). Each LLM call only carries a sliding window of the most
+# recent turns: at most AI_HISTORY_MAX_MESSAGES rows are read, then trimmed to
+# AI_HISTORY_TOKEN_BUDGET, so prompt size and memory stay flat no matter how
+# long a conversation runs.
+
+
+def new_conversation_id():
+    return str(uuid.uuid4())
+
+
+def load_window(user_id, conversation_id):
+    rows = db.session.execute(
+        db.select(ChatMessage.role, ChatMessage.content, ChatMessage.token_count)
+        .where(ChatMessage.user_id == user_id, ChatMessage.conversation_id == conversation_id)
+        .order_by(ChatMessage.created_at.desc(), ChatMessage.id.desc())
+        .limit(current_app.config['AI_HISTORY_MAX_MESSAGES'])
+    ).all()
+
+    # Walk back from the newest message until the budget is used up
+    window = []
+    tokens = 0
+    for role, content, token_count in rows:
+        tokens += token_count
+        if tokens > current_app.config['AI_HISTORY_TOKEN_BUDGET']:
+            break
+        window.append({'role': role, 'content': content})
+
+    window.reverse()
+    # Never open the window on an assistant reply without its question
+    while window and window[0]['role'] != 'user':
+        window.pop(0)
+    return window
+
+
+def append_turn(user_id, conversation_id, user_message, ai_response):
+    db.session.add_all([
+        ChatMessage(user_id=user_id, conversation_id=conversation_id, role=role,
+                    content=content, token_count=estimate_tokens(content))
+        for role, content in (('user', user_message), ('assistant', ai_response))
+    ])
+    db.session.commit()
@@ -0,0 +1,93 @@
+import time
+from flask import g, has_request_context
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import NullPool, QueuePool
+
+# Connection pool configuration for SQLALCHEMY_ENGINE_OPTIONS.
+#
+# Direct Postgres connections use a QueuePool sized from Config and set
+# statement_timeout once per connection through libpq startup options.
+# Behind an external transaction-mode pooler (PgBouncer and friends) the
+# app must not hold server connections or rely on session state, so it uses
+# NullPool and applies the timeout with SET LOCAL inside each transaction.
+
+
+def build_engine_options(config):
+    url = make_url(config['SQLALCHEMY_DATABASE_URI'])
+    if url.get_backend_name() != 'postgresql':
+        # SQLite (tests, local dev) keeps SQLAlchemy's defaults
+        return {}
+
+    options = {'pool_pre_ping': config['DB_POOL_PRE_PING']}
+    connect_args = {}
+
+    if config['DB_EXTERNAL_POOLER']:
+        options['poolclass'] = NullPool
+        if url.get_driver_name() == 'psycopg':
+            # Server-side prepared statements break under transaction pooling
+            connect_args['prepare_threshold'] = None
+    else:
+        options.update(
+            pool_size=config['DB_POOL_SIZE'],
+            max_overflow=config['DB_MAX_OVERFLOW'],
+            pool_timeout=config['DB_POOL_TIMEOUT'],
+            pool_recycle=config['DB_POOL_RECYCLE'],
+        )
+        if config['DB_STATEMENT_TIMEOUT_MS']:
+            connect_args['options'] = f"-c statement_timeout={config['DB_STATEMENT_TIMEOUT_MS']}"
+
+    if connect_args:
+        options['connect_args'] = connect_args
+    return options
+
+
+def configure_engine(engine, config):
+    if engine.dialect.name != 'postgresql':
+        return
+    timeout = config['DB_STATEMENT_TIMEOUT_MS']
+    if config['DB_EXTERNAL_POOLER'] and timeout:
+        @event.listens_for(engine, 'begin')
+        def set_statement_timeout(connection):
+            connection.exec_driver_sql(f"SET LOCAL statement_timeout = {int(timeout)}")
+
+
+def pool_status(engine):
+    pool = engine.pool
+    status = {'class': type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        status.update(
+            size=pool.size(),
+            checkedIn=pool.checkedin(),
+            checkedOut=pool.checkedout(),
+            overflow=pool.overflow()
+        )
+    return status
+
+
+def ping(session):
+    # Round-trip latency of a trivial query, in milliseconds
+    start = time.perf_counter()
+    session.execute(text('SELECT 1'))
+    return round((time.perf_counter() - start) * 1000, 2)
+
+
+class RoutingSession(Session):
+    """db.session class that can send reads to a replica.
+
+    While a request has a replica bind chosen (g.read_bind, set by
+    replicas.read_replica), plain SELECTs run on that bind. Writes, flushes,
+    SELECT ... FOR UPDATE and textual SQL always use the primary.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and has_request_context():
+            read_bind = g.get('read_bind')
+            if read_bind is not None and is_plain_select(clause):
+                return self._db.engines[read_bind]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def is_plain_select(clause):
+    return getattr(clause, 'is_select', False) and getattr(clause, '_for_update_arg', None) is None
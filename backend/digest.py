@@ -0,0 +1,157 @@
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import func, update
+from sqlalchemy.exc import IntegrityError
+from archive import cardio_source, set_source
+from changes import on_training_data_changed
+from models import db, Workout, Exercise, TrainingDigest
+from stats import distance_km
+
+# Per-user training digest for the AI coach.
+#
+# The digest is a few lines of plain text built from SQL aggregates and
+# stored in training_digests. Chat requests read it with a single primary-key
+# lookup; it is rebuilt when a write route has marked it stale, and on the
+# first request of each day since the window moves with the date.
+
+DIGEST_WINDOW_DAYS = 28
+TOP_EXERCISES = 5
+
+
+def estimate_tokens(text):
+    # Roughly four characters per token for English text
+    return (len(text) + 3) // 4
+
+
+def fit_budget(lines, budget):
+    # Lines are ordered by importance; drop from the end until it fits
+    while lines and estimate_tokens('\n'.join(lines)) > budget:
+        lines.pop()
+    return '\n'.join(lines)
+
+
+def build_digest(user_id, now=None):
+    now = now or datetime.utcnow()
+    since = now - timedelta(days=DIGEST_WINDOW_DAYS)
+    recent_sets = set_source(since)
+    volume = func.coalesce(func.sum(recent_sets.c.reps * func.coalesce(recent_sets.c.weight, 0)), 0)
+
+    workouts, sets, total_volume = db.session.execute(
+        db.select(
+            func.count(func.distinct(Workout.id)),
+            func.count(recent_sets.c.id),
+            volume
+        )
+        .select_from(Workout)
+        .outerjoin(Exercise, Exercise.workout_id == Workout.id)
+        .outerjoin(recent_sets, recent_sets.c.exercise_id == Exercise.id)
+        .where(Workout.user_id == user_id, Workout.created_at >= since)
+    ).one()
+
+    top_exercises = db.session.execute(
+        db.select(Exercise.name, func.count(recent_sets.c.id), volume, func.max(recent_sets.c.weight))
+        .select_from(recent_sets)
+        .join(Exercise, Exercise.id == recent_sets.c.exercise_id)
+        .join(Workout, Workout.id == Exercise.workout_id)
+        .where(Workout.user_id == user_id, Workout.created_at >= since)
+        .group_by(Exercise.name)
+        .order_by(volume.desc())
+        .limit(TOP_EXERCISES)
+    ).all() if sets else []
+
+    names = [row[0] for row in top_exercises]
+    all_sets = set_source()
+    records = dict(db.session.execute(
+        db.select(Exercise.name, func.max(all_sets.c.weight))
+        .select_from(all_sets)
+        .join(Exercise, Exercise.id == all_sets.c.exercise_id)
+        .join(Workout, Workout.id == Exercise.workout_id)
+        .where(Workout.user_id == user_id, Exercise.name.in_(names))
+        .group_by(Exercise.name)
+    ).all()) if names else {}
+
+    cardio = {}
+    recent_cardio = cardio_source(since)
+    for activity, unit, sessions, minutes, distance in db.session.execute(
+        db.select(
+            recent_cardio.c.activity_type,
+            recent_cardio.c.distance_unit,
+            func.count(),
+            func.sum(recent_cardio.c.duration_minutes),
+            func.sum(recent_cardio.c.distance)
+        )
+        .where(recent_cardio.c.user_id == user_id, recent_cardio.c.date >= since.date())
+        .group_by(recent_cardio.c.activity_type, recent_cardio.c.distance_unit)
+    ):
+        totals = cardio.setdefault(activity, [0, 0, 0.0])
+        totals[0] += sessions
+        totals[1] += minutes or 0
+        totals[2] += distance_km(distance, unit)
+
+    last_workout = db.session.execute(
+        db.select(func.max(Workout.created_at)).where(Workout.user_id == user_id)
+    ).scalar()
+
+    lines = [f"User training summary, last {DIGEST_WINDOW_DAYS} days:"]
+    lines.append(f"Strength: {workouts} workouts, {sets} sets, {float(total_volume):.0f} kg total volume.")
+    if cardio:
+        parts = [
+            f"{activity} {count}x/{minutes} min" + (f"/{km:.1f} km" if km else '')
+            for activity, (count, minutes, km) in sorted(cardio.items(), key=lambda item: -item[1][1])
+        ]
+        lines.append("Cardio: " + ', '.join(parts) + '.')
+    else:
+        lines.append("Cardio: none logged.")
+    if last_workout:
+        lines.append(f"Last workout: {last_workout.date().isoformat()}.")
+    for name, exercise_sets, exercise_volume, recent_best in top_exercises:
+        record = records.get(name)
+        lines.append(
+            f"- {name}: {exercise_sets} sets, {float(exercise_volume):.0f} kg volume, "
+            f"recent top {recent_best or 0:g} kg, PR {record or 0:g} kg."
+        )
+
+    return fit_budget(lines, current_app.config['AI_DIGEST_TOKEN_BUDGET'])
+
+
+def is_current(digest, now):
+    # Stale after a write, and from an earlier day: the window has moved
+    return not digest.stale and digest.updated_at is not None and digest.updated_at.date() >= now.date()
+
+
+def get_digest(user_id):
+    """Return the user's digest, rebuilding it when stale, outdated or missing."""
+    now = datetime.utcnow()
+    digest = db.session.get(TrainingDigest, user_id)
+    if digest is None:
+        # Stored stale before it is built, so that a write landing in the
+        # meantime has a row to mark
+        db.session.add(TrainingDigest(user_id=user_id, content='', stale=True))
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # Another request created it first
+            db.session.rollback()
+        digest = db.session.get(TrainingDigest, user_id)
+    if is_current(digest, now):
+        return digest.content
+
+    built_from = digest.updated_at
+    content = build_digest(user_id, now)
+    # Only replaces the version read above: an invalidation committed while
+    # building moved updated_at, so it is kept and the next request rebuilds
+    db.session.execute(
+        update(TrainingDigest)
+        .where(TrainingDigest.user_id == user_id, TrainingDigest.updated_at == built_from)
+        .values(content=content, stale=False, updated_at=now)
+    )
+    db.session.commit()
+    return content
+
+
+@on_training_data_changed
+def invalidate_digest(user_id, kind):
+    db.session.execute(
+        update(TrainingDigest).where(TrainingDigest.user_id == user_id)
+        .values(stale=True, updated_at=datetime.utcnow())
+    )
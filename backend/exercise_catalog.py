@@ -0,0 +1,244 @@
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from flask import Blueprint, current_app, jsonify, request
+from flask_jwt_extended import jwt_required
+from changes import on_training_data_changed
+from models import db, Workout, Exercise
+from user_cache import current_user_id
+
+exercises_bp = Blueprint('exercises', __name__, url_prefix='/api/exercises')
+
+# Exercise name autocomplete.
+#
+# Names are normalized (case, punctuation, spacing) and indexed in a trie by
+# the prefixes of each word, so "pr" finds "Bench Press" and "bench pr"
+# narrows it. The shared catalog is indexed once per process; each user's
+# own history is loaded once, kept in an LRU with a TTL, and new names from
+# created workouts are merged into it without reloading. Ranking puts the
+# user's most-used exercises first.
+
+# Ordered roughly by how common the movement is
+CATALOG = [
+    'Bench Press', 'Squat', 'Deadlift', 'Overhead Press', 'Barbell Row',
+    'Pull-up', 'Chin-up', 'Push-up', 'Dips', 'Lat Pulldown',
+    'Incline Bench Press', 'Dumbbell Bench Press', 'Front Squat', 'Romanian Deadlift', 'Leg Press',
+    'Lunges', 'Bulgarian Split Squat', 'Hip Thrust', 'Bicep Curls', 'Hammer Curls',
+    'Tricep Extensions', 'Tricep Pushdown', 'Skull Crushers', 'Lateral Raises', 'Face Pulls',
+    'Seated Cable Row', 'Dumbbell Row', 'T-Bar Row', 'Leg Curl', 'Leg Extension',
+    'Calf Raises', 'Seated Calf Raises', 'Shrugs', 'Arnold Press', 'Chest Fly',
+    'Cable Crossover', 'Pec Deck', 'Goblet Squat', 'Hack Squat', 'Sumo Deadlift',
+    'Good Mornings', 'Back Extension', 'Glute Bridge', 'Step-ups', 'Kettlebell Swing',
+    'Clean and Press', 'Power Clean', 'Snatch', 'Farmer Carry', 'Planks',
+    'Side Plank', 'Hanging Leg Raise', 'Crunches', 'Russian Twists', 'Ab Wheel Rollout',
+    'Mountain Climbers', 'Burpees', 'Box Jumps', 'Battle Ropes', 'Rowing Machine',
+]
+
+SUGGEST_DEFAULT_LIMIT = 8
+SUGGEST_MAX_LIMIT = 20
+
+_NON_WORD = re.compile(r'[^0-9a-z]+')
+
+
+def _singular(word):
+    # Just enough to merge "Squats"/"Squat" and "Pull-ups"/"Pull-up"
+    if len(word) > 3 and word.endswith('s') and not word.endswith('ss'):
+        return word[:-1]
+    return word
+
+
+def normalize_name(name):
+    # "  Pull-Ups " -> "pull up"
+    name = unicodedata.normalize('NFKD', name).encode('ascii', 'ignore').decode().lower()
+    return ' '.join(_singular(word) for word in _NON_WORD.sub(' ', name).split())
+
+
+class PrefixIndex:
+    """Trie over the words of normalized names.
+
+    Every node keeps the set of names having a word with that prefix, so a
+    lookup is one walk of the query's characters with no subtree scan.
+    """
+
+    def __init__(self):
+        self.root = {}
+
+    def add(self, key):
+        for word in set(key.split()):
+            node = self.root
+            for char in word:
+                node = node.setdefault(char, {})
+                node.setdefault('', set()).add(key)
+
+    def _lookup(self, token):
+        node = self.root
+        for char in token:
+            node = node.get(char)
+            if node is None:
+                return set()
+        return node.get('', set())
+
+    def search(self, tokens):
+        # Names where every token prefixes some word
+        matches = None
+        for token in tokens:
+            found = self._lookup(token)
+            matches = set(found) if matches is None else matches & found
+            if not matches:
+                return set()
+        return matches
+
+
+class CatalogIndex:
+    def __init__(self, names):
+        self.index = PrefixIndex()
+        self.names = {}
+        self.popularity = {}
+        for rank, name in enumerate(names):
+            key = normalize_name(name)
+            if key and key not in self.names:
+                self.names[key] = name
+                self.popularity[key] = len(names) - rank
+                self.index.add(key)
+
+
+catalog = CatalogIndex(CATALOG)
+
+
+class UserExercises:
+    """One user's exercise names with how many times each was logged."""
+
+    def __init__(self, rows):
+        self.index = PrefixIndex()
+        self.names = {}
+        self.counts = {}
+        self.expires_at = time.monotonic() + current_app.config['EXERCISE_INDEX_TTL']
+        self.lock = threading.Lock()
+        self.merge(rows)
+
+    def merge(self, rows):
+        with self.lock:
+            for name, count in rows:
+                key = normalize_name(name)
+                if not key:
+                    continue
+                if key not in self.counts:
+                    self.counts[key] = 0
+                    self.index.add(key)
+                # The catalog's spelling wins; otherwise the first one seen
+                self.names.setdefault(key, catalog.names.get(key, ' '.join(name.split())))
+                self.counts[key] += count
+
+
+class UserIndexCache:
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            if entry.expires_at < time.monotonic():
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return entry
+
+    def put(self, user_id, entry):
+        max_users = current_app.config['EXERCISE_INDEX_MAX_USERS']
+        with self._lock:
+            self._entries[user_id] = entry
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > max_users:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+user_indexes = UserIndexCache()
+
+
+def get_user_exercises(user_id):
+    user_id = int(user_id)
+    entry = user_indexes.get(user_id)
+    if entry is None:
+        rows = db.session.execute(
+            db.select(Exercise.name, db.func.count())
+            .join(Workout, Workout.id == Exercise.workout_id)
+            .where(Workout.user_id == user_id)
+            .group_by(Exercise.name)
+        ).all()
+        entry = UserExercises(rows)
+        user_indexes.put(user_id, entry)
+    return entry
+
+
+def exercises_added(user_id, names):
+    """Merge names from a committed workout into the cached user index."""
+    entry = user_indexes.get(int(user_id))
+    if entry is not None:
+        entry.merge((name, 1) for name in names if name)
+
+
+@on_training_data_changed
+def invalidate_user_exercises(user_id, kind):
+    # Creates are merged by exercises_added() after commit; edits, deletes
+    # and imports reload the history on the next lookup
+    if kind.startswith('workout') and kind != 'workout_created':
+        user_indexes.invalidate(int(user_id))
+
+
+def suggest(user_id, query, limit=SUGGEST_DEFAULT_LIMIT):
+    normalized = normalize_name(query)
+    tokens = normalized.split()
+    if not tokens:
+        return []
+
+    user = get_user_exercises(user_id)
+    with user.lock:
+        keys = user.index.search(tokens) | catalog.index.search(tokens)
+        ranked = sorted(
+            keys,
+            key=lambda key: (
+                -user.counts.get(key, 0),
+                not key.startswith(normalized),
+                -catalog.popularity.get(key, 0),
+                len(key),
+                key
+            )
+        )[:limit]
+        return [
+            {
+                'name': user.names.get(key) or catalog.names[key],
+                'count': user.counts.get(key, 0),
+                'source': 'history' if key in user.counts else 'catalog'
+            }
+            for key in ranked
+        ]
+
+
+# ============== EXERCISE ROUTES ==============
+
+@exercises_bp.route('/suggest', methods=['GET'])
+@jwt_required()
+def suggest_exercises():
+    try:
+        limit = min(int(request.args.get('limit', SUGGEST_DEFAULT_LIMIT)), SUGGEST_MAX_LIMIT)
+    except ValueError:
+        return jsonify({'message': 'limit must be an integer'}), 400
+
+    try:
+        return jsonify(suggest(current_user_id(), request.args.get('q', ''), max(limit, 1))), 200
+
+    except Exception as e:
+        return jsonify({'message': str(e)}), 500
@@ -0,0 +1,9 @@
+from flask_cors import CORS
+from flask_jwt_extended import JWTManager
+from flask_migrate import Migrate
+
+# Extensions are created unbound and attached to an app in create_app();
+# the SQLAlchemy instance lives in models.py
+migrate = Migrate()
+jwt = JWTManager()
+cors = CORS()
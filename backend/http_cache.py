@@ -0,0 +1,51 @@
+import hashlib
+from functools import wraps
+from flask import g, make_response, request
+from sqlalchemy import update
+from changes import on_training_data_changed
+from compression import etag_variants
+from models import db, User
+from user_cache import current_user_id
+
+# Conditional GET for per-user read endpoints.
+#
+# users.data_version is bumped in the same transaction as every workout or
+# cardio write. Reads derive a strong ETag from (user, version, query
+# string) and answer a matching If-None-Match with 304 after a single
+# primary-key lookup, before the endpoint's own queries run.
+
+
+@on_training_data_changed
+def bump_data_version(user_id, kind):
+    # updated_at is the profile's: keep its onupdate from firing
+    db.session.execute(
+        update(User).where(User.id == user_id)
+        .values(data_version=User.data_version + 1, updated_at=User.updated_at)
+    )
+
+
+def data_etag(user_id):
+    version = g.data_version = db.session.execute(
+        db.select(User.data_version).where(User.id == user_id)
+    ).scalar()
+    variant = hashlib.sha1(request.full_path.encode()).hexdigest()[:16]
+    return f"{user_id}-{version}-{variant}"
+
+
+def conditional_get(view):
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        etag = data_etag(current_user_id())
+        # The client may hold the compressed representation's validator
+        matched = next((tag for tag in etag_variants(etag) if request.if_none_match.contains(tag)), None)
+        if matched:
+            response = make_response('', 304)
+            etag = matched
+        else:
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+    return wrapper
@@ -0,0 +1,319 @@
+import io
+import logging
+import threading
+import time
+from flask import Response, current_app, g, has_request_context, request
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy import event
+from db_pool import pool_status
+from models import db
+
+logger = logging.getLogger(__name__)
+
+# Per-request performance instrumentation.
+#
+# Each request collects its wall time, SQL statement count and DB time (from
+# engine cursor events), JSON serialization time and AI call latency in
+# flask.g. At teardown these feed per-endpoint histograms exposed in
+# Prometheus text format on /api/metrics (only when METRICS_TOKEN is set;
+# scrapers send it as a bearer token), and requests slower than
+# SLOW_REQUEST_MS are logged with their slowest statements. Metrics are per
+# worker process; scrape each worker or aggregate downstream.
+#
+# Streamed bodies (SSE, exports) are timed until the response is handed to
+# the server; LLM stream latency is recorded separately by chat.py.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 250)
+MAX_RECORDED_STATEMENTS = 100
+SLOW_LOG_STATEMENTS = 5
+
+
+class Histogram:
+    def __init__(self, name, help_text, labels, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                # One count per bucket, then sum and total count
+                series = self._series[label_values] = [0] * len(self.buckets) + [0.0, 0]
+            for idx, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[idx] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((key, list(series)) for key, series in self._series.items())
+        for label_values, series in items:
+            labels = _labels(self.labels, label_values)
+            prefix = labels + ',' if labels else ''
+            for bound, count in zip(self.buckets, series):
+                lines.append(f'{self.name}_bucket{{{prefix}le="{bound:g}"}} {count}')
+            lines.append(f'{self.name}_bucket{{{prefix}le="+Inf"}} {series[-1]}')
+            lines.append(f"{_series(self.name + '_sum', labels)} {series[-2]:.6f}")
+            lines.append(f"{_series(self.name + '_count', labels)} {series[-1]}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name, help_text, labels):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for label_values, value in items:
+            lines.append(f"{_series(self.name, _labels(self.labels, label_values))} {value}")
+        return lines
+
+
+def _labels(names, values):
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"') for value in values)
+    return ','.join(f'{name}="{value}"' for name, value in zip(names, escaped))
+
+
+def _series(name, labels):
+    return f"{name}{{{labels}}}" if labels else name
+
+
+REQUEST_SECONDS = Histogram(
+    'http_request_duration_seconds', 'Request wall time',
+    ('endpoint', 'method', 'status'), LATENCY_BUCKETS)
+REQUEST_QUERIES = Histogram(
+    'http_request_db_queries', 'SQL statements executed per request',
+    ('endpoint',), QUERY_COUNT_BUCKETS)
+REQUEST_DB_SECONDS = Histogram(
+    'http_request_db_seconds', 'Time spent in SQL statements per request',
+    ('endpoint',), LATENCY_BUCKETS)
+REQUEST_SERIALIZE_SECONDS = Histogram(
+    'http_request_serialize_seconds', 'Time spent encoding JSON per request',
+    ('endpoint',), LATENCY_BUCKETS)
+AI_SECONDS = Histogram(
+    'ai_request_duration_seconds', 'Upstream LLM call latency (streams: until the last token)',
+    ('mode', 'outcome'), LATENCY_BUCKETS)
+AI_FIRST_TOKEN_SECONDS = Histogram(
+    'ai_first_token_seconds', 'Time to the first streamed token',
+    (), LATENCY_BUCKETS)
+SLOW_REQUESTS = Counter(
+    'http_slow_requests_total', 'Requests slower than SLOW_REQUEST_MS', ('endpoint',))
+JOB_SECONDS = Histogram(
+    'job_duration_seconds', 'Background job attempt run time',
+    ('kind', 'outcome'), LATENCY_BUCKETS)
+
+METRICS = (REQUEST_SECONDS, REQUEST_QUERIES, REQUEST_DB_SECONDS, REQUEST_SERIALIZE_SECONDS,
+           AI_SECONDS, AI_FIRST_TOKEN_SECONDS, SLOW_REQUESTS, JOB_SECONDS)
+
+
+class RequestStats:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.serialize_seconds = 0.0
+        self.statements = []
+        self.status = None
+
+
+def current_stats():
+    return g.get('perf') if has_request_context() else None
+
+
+def record_serialization(seconds):
+    stats = current_stats()
+    if stats is not None:
+        stats.serialize_seconds += seconds
+
+
+def record_ai_call(seconds, mode, outcome):
+    AI_SECONDS.observe(seconds, mode, outcome)
+
+
+def record_first_token(seconds):
+    AI_FIRST_TOKEN_SECONDS.observe(seconds)
+
+
+def record_job(seconds, kind, outcome):
+    JOB_SECONDS.observe(seconds, kind, outcome)
+
+
+class TimedJSONProvider(DefaultJSONProvider):
+    def dumps(self, obj, **kwargs):
+        started = time.perf_counter()
+        try:
+            return super().dumps(obj, **kwargs)
+        finally:
+            record_serialization(time.perf_counter() - started)
+
+
+# ============== SQL TIMING ==============
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('perf_query_start', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get('perf_query_start')
+    if not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    stats = current_stats()
+    if stats is None:
+        return
+    stats.queries += 1
+    stats.db_seconds += elapsed
+    if len(stats.statements) < MAX_RECORDED_STATEMENTS:
+        stats.statements.append((elapsed, statement))
+
+
+def _handle_error(exception_context):
+    # Failed statements never reach after_cursor_execute
+    conn = exception_context.connection
+    if conn is not None and conn.info.get('perf_query_start'):
+        conn.info['perf_query_start'].pop()
+
+
+def instrument_engine(engine):
+    if event.contains(engine, 'before_cursor_execute', _before_cursor_execute):
+        return
+    event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+    event.listen(engine, 'handle_error', _handle_error)
+
+
+# ============== PROFILING ==============
+
+def _start_profiler():
+    # pyinstrument samples the stack; cProfile (always available) traces
+    # every call and is slower, but needs nothing installed
+    try:
+        from pyinstrument import Profiler
+    except ImportError:
+        import cProfile
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+        return profiler
+    profiler = Profiler()
+    profiler.start()
+    return profiler
+
+
+def _profile_report(profiler):
+    if hasattr(profiler, 'output_text'):
+        profiler.stop()
+        return profiler.output_text(unicode=True)
+
+    import pstats
+
+    profiler.disable()
+    buffer = io.StringIO()
+    pstats.Stats(profiler, stream=buffer).sort_stats('cumulative').print_stats(40)
+    return buffer.getvalue()
+
+
+def wants_profile():
+    return current_app.config['PROFILING_ENABLED'] and (
+        request.args.get('profile') == '1' or request.headers.get('X-Profile') == '1'
+    )
+
+
+# ============== FLASK HOOKS ==============
+
+def render_metrics():
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+
+    # Point-in-time pool gauges (QueuePool only)
+    engines = sorted(db.engines.items(), key=lambda item: str(item[0]))
+    for key in ('size', 'checkedIn', 'checkedOut', 'overflow'):
+        gauge = f'db_pool_{key.lower()}'
+        values = [(name, pool_status(engine).get(key)) for name, engine in engines]
+        values = [(name, value) for name, value in values if value is not None]
+        if values:
+            lines.append(f"# TYPE {gauge} gauge")
+            lines.extend(f'{gauge}{{bind="{name or "default"}"}} {value}' for name, value in values)
+    return '\n'.join(lines) + '\n'
+
+
+def init_instrumentation(app):
+    app.json = TimedJSONProvider(app)
+    with app.app_context():
+        for engine in db.engines.values():
+            instrument_engine(engine)
+
+    @app.before_request
+    def start_request_timer():
+        g.perf = RequestStats()
+        if wants_profile():
+            g.profiler = _start_profiler()
+
+    @app.after_request
+    def finish_request(response):
+        stats = current_stats()
+        if stats is not None:
+            stats.status = response.status_code
+            response.headers['Server-Timing'] = (
+                f"db;dur={stats.db_seconds * 1000:.1f};desc=\"{stats.queries} queries\", "
+                f"app;dur={(time.perf_counter() - stats.started) * 1000:.1f}"
+            )
+
+        profiler = g.pop('profiler', None)
+        if profiler is not None:
+            # The profile replaces the body; only for explicit opt-in requests
+            return Response(_profile_report(profiler), mimetype='text/plain')
+        return response
+
+    @app.teardown_request
+    def record_request(exception):
+        stats = g.pop('perf', None)
+        if stats is None:
+            return
+        elapsed = time.perf_counter() - stats.started
+        endpoint = request.endpoint or 'unmatched'
+        status = stats.status or (500 if exception else 0)
+
+        REQUEST_SECONDS.observe(elapsed, endpoint, request.method, status)
+        REQUEST_QUERIES.observe(stats.queries, endpoint)
+        REQUEST_DB_SECONDS.observe(stats.db_seconds, endpoint)
+        REQUEST_SERIALIZE_SECONDS.observe(stats.serialize_seconds, endpoint)
+
+        if elapsed * 1000 >= current_app.config['SLOW_REQUEST_MS']:
+            SLOW_REQUESTS.inc(endpoint)
+            slowest = sorted(stats.statements, key=lambda item: -item[0])[:SLOW_LOG_STATEMENTS]
+            logger.warning(
+                "Slow request %s %s -> %s: %.0f ms, %d queries, %.0f ms in DB, %.0f ms serializing%s",
+                request.method, request.full_path.rstrip('?'), status, elapsed * 1000,
+                stats.queries, stats.db_seconds * 1000, stats.serialize_seconds * 1000,
+                ''.join(f"\n  {seconds * 1000:8.1f} ms  {' '.join(statement.split())[:500]}"
+                        for seconds, statement in slowest)
+            )
+
+    @app.route('/api/metrics', methods=['GET'])
+    def metrics():
+        # Opt-in: without a token the endpoint does not exist
+        token = app.config['METRICS_TOKEN']
+        if not token:
+            return Response('Not Found\n', status=404, mimetype='text/plain')
+        if request.headers.get('Authorization') != f'Bearer {token}':
+            return Response('Unauthorized\n', status=401, mimetype='text/plain')
+        return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
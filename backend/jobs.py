@@ -0,0 +1,397 @@
+import abc
+import importlib
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from flask import Blueprint, current_app, jsonify, request, url_for
+from flask_jwt_extended import jwt_required
+from sqlalchemy import func, update
+from instrumentation import record_job
+from models import db, Job, User
+from user_cache import current_user_id
+
+logger = logging.getLogger(__name__)
+
+jobs_bp = Blueprint('jobs', __name__, url_prefix='/api/jobs')
+
+# Background jobs.
+#
+# Slow work (LLM calls, large deletes, rollup rebuilds) can be queued instead
+# of run inside the request: the route stores a row in the jobs table,
+# answers 202 with the job id and the client polls /api/jobs/<id>. The table
+# holds job state for every backend; a JobQueue only decides where queued
+# jobs execute:
+#
+#   thread        a thread pool in each web process (default; development,
+#                 tests, single-box deployments)
+#   database      nothing runs in the web process; `flask run-jobs` workers
+#                 poll the table, so jobs survive restarts and scale apart
+#   module:Class  any JobQueue subclass, e.g. one backed by a broker
+#
+# Starting an attempt is a conditional UPDATE that also counts the user's
+# running jobs, so at most JOB_USER_CONCURRENCY run per user across all
+# processes and an attempt is never run twice. Failures are retried with
+# exponential backoff up to the task's max_attempts, so tasks must be safe
+# to rerun. Threads cannot be killed: tasks pass their timeout on to their
+# I/O (e.g. the LLM client), and a reaper requeues or fails attempts still
+# running past their deadline. A late result from a reaped attempt is
+# discarded.
+
+TERMINAL_STATUSES = ('succeeded', 'failed')
+
+# Grace period on top of a task's timeout before its attempt is reaped
+REAP_GRACE_SECONDS = 30
+# Delay before retrying a job held back by the per-user concurrency cap
+CAPPED_RETRY_SECONDS = 1
+# A queued job this far past run_after has lost its runner (e.g. the web
+# process that queued it restarted); polling it submits it again
+STALE_QUEUED_SECONDS = 60
+WORKER_BATCH_SIZE = 20
+
+
+class JobError(Exception):
+    """Raised by a task for failures that retrying cannot fix."""
+
+
+class QueueFull(Exception):
+    pass
+
+
+class Task:
+    def __init__(self, name, func, timeout, max_attempts, retry_delay):
+        self.name = name
+        self.func = func
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+
+
+_tasks = {}
+
+
+def task(name, timeout=60, max_attempts=3, retry_delay=5):
+    """Register a function as a job kind.
+
+    It is called as ``func(user_id, **payload)`` inside an app context and
+    its JSON-serializable return value becomes the job result.
+    """
+    def register(func):
+        _tasks[name] = Task(name, func, timeout, max_attempts, retry_delay)
+        return func
+    return register
+
+
+# ============== EXECUTION ==============
+
+def _settle(job_id, attempt, **values):
+    # Only the attempt that still owns the job may record its outcome
+    result = db.session.execute(
+        update(Job)
+        .where(Job.id == job_id, Job.status == 'running', Job.attempts == attempt)
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    return result.rowcount == 1
+
+
+def claim(job_id, user_id, max_running):
+    # Lock the user row so concurrent claims for one user count each other
+    db.session.execute(db.select(User.id).where(User.id == user_id).with_for_update())
+    running = (
+        db.select(func.count()).select_from(Job)
+        .where(Job.user_id == user_id, Job.status == 'running')
+        .scalar_subquery()
+    )
+    result = db.session.execute(
+        update(Job)
+        .where(Job.id == job_id, Job.status == 'queued', running < max_running)
+        .values(status='running', attempts=Job.attempts + 1, started_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    return result.rowcount == 1
+
+
+def defer(job_id, seconds):
+    db.session.execute(
+        update(Job)
+        .where(Job.id == job_id, Job.status == 'queued')
+        .values(run_after=datetime.utcnow() + timedelta(seconds=seconds))
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+
+
+def run_job(job_id):
+    """Run one attempt of a queued job.
+
+    Returns the number of seconds after which the job should be submitted
+    again (backoff or the per-user cap), or None when nothing is left to do.
+    """
+    job = db.session.get(Job, job_id)
+    if job is None or job.status != 'queued':
+        return None
+    wait = (job.run_after - datetime.utcnow()).total_seconds()
+    if wait > 0:
+        return wait
+
+    spec = _tasks.get(job.kind)
+    if spec is None:
+        job.status = 'failed'
+        job.error = f"Unknown job kind '{job.kind}'"
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+        return None
+
+    user_id, payload = job.user_id, json.loads(job.payload)
+    if not claim(job_id, user_id, current_app.config['JOB_USER_CONCURRENCY']):
+        defer(job_id, CAPPED_RETRY_SECONDS)
+        return CAPPED_RETRY_SECONDS
+
+    db.session.refresh(job)
+    attempt, max_attempts = job.attempts, job.max_attempts
+    started = time.perf_counter()
+    try:
+        result = spec.func(user_id, **payload)
+    except Exception as e:
+        db.session.rollback()
+        record_job(time.perf_counter() - started, spec.name, 'error')
+        if isinstance(e, JobError) or attempt >= max_attempts:
+            logger.warning("Job %s (%s) failed on attempt %d: %s", job_id, spec.name, attempt, e)
+            _settle(job_id, attempt, status='failed', error=str(e), finished_at=datetime.utcnow())
+            return None
+        delay = spec.retry_delay * 2 ** (attempt - 1)
+        logger.info("Job %s (%s) attempt %d failed, retrying in %ss: %s", job_id, spec.name, attempt, delay, e)
+        retried = _settle(job_id, attempt, status='queued', error=str(e),
+                          run_after=datetime.utcnow() + timedelta(seconds=delay))
+        return delay if retried else None
+
+    record_job(time.perf_counter() - started, spec.name, 'ok')
+    if not _settle(job_id, attempt, status='succeeded', result=json.dumps(result), error=None,
+                   finished_at=datetime.utcnow()):
+        logger.warning("Job %s (%s) finished after it was reaped; result discarded", job_id, spec.name)
+    return None
+
+
+def reap_stalled(user_id=None):
+    """Requeue or fail attempts running past their task's timeout.
+
+    Returns the ids of requeued jobs.
+    """
+    now = datetime.utcnow()
+    query = db.select(Job.id, Job.kind, Job.attempts, Job.max_attempts, Job.started_at).where(
+        Job.status == 'running', Job.started_at < now - timedelta(seconds=REAP_GRACE_SECONDS)
+    )
+    if user_id is not None:
+        query = query.where(Job.user_id == user_id)
+
+    requeued = []
+    for job_id, kind, attempts, max_attempts, started_at in db.session.execute(query).all():
+        spec = _tasks.get(kind)
+        deadline = started_at + timedelta(seconds=(spec.timeout if spec else 0) + REAP_GRACE_SECONDS)
+        if deadline > now:
+            continue
+        if attempts < max_attempts:
+            if _settle(job_id, attempts, status='queued', error='Timed out', run_after=now):
+                requeued.append(job_id)
+        else:
+            _settle(job_id, attempts, status='failed', error='Timed out', finished_at=now)
+    return requeued
+
+
+def due_job_ids(limit):
+    return db.session.execute(
+        db.select(Job.id)
+        .where(Job.status == 'queued', Job.run_after <= datetime.utcnow())
+        .order_by(Job.run_after)
+        .limit(limit)
+    ).scalars().all()
+
+
+# ============== QUEUE BACKENDS ==============
+
+class JobQueue(abc.ABC):
+    """Decides where queued jobs run; job state always lives in the table."""
+
+    def __init__(self, app):
+        self.app = app
+
+    @abc.abstractmethod
+    def submit(self, job_id, delay=0):
+        """Schedule a committed, queued job to run in about ``delay`` seconds."""
+
+    def shutdown(self):
+        pass
+
+
+class ThreadJobQueue(JobQueue):
+    """Runs jobs on a thread pool inside the web process."""
+
+    def __init__(self, app):
+        super().__init__(app)
+        self.max_workers = app.config['JOB_WORKERS']
+        self._executor = None
+        self._executor_pid = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        # Pools do not survive fork; each worker process builds its own
+        if self._executor is None or self._executor_pid != os.getpid():
+            with self._lock:
+                if self._executor is None or self._executor_pid != os.getpid():
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_workers, thread_name_prefix='job'
+                    )
+                    self._executor_pid = os.getpid()
+        return self._executor
+
+    def submit(self, job_id, delay=0):
+        if delay > 0:
+            timer = threading.Timer(delay, self.submit, (job_id,))
+            timer.daemon = True
+            timer.start()
+            return
+        self._get_executor().submit(self._run, job_id)
+
+    def _run(self, job_id):
+        with self.app.app_context():
+            try:
+                delay = run_job(job_id)
+            except Exception:
+                db.session.rollback()
+                logger.exception("Job %s could not be run", job_id)
+                return
+        if delay is not None:
+            self.submit(job_id, delay)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+
+
+class DatabaseJobQueue(JobQueue):
+    """Durable backend: the jobs table is the queue, polled by `flask run-jobs`."""
+
+    def submit(self, job_id, delay=0):
+        # The committed row (and its run_after) is all a worker needs
+        pass
+
+    def work(self, poll_interval, once=False):
+        # One job at a time per worker; run more workers to scale out
+        while True:
+            reap_stalled()
+            job_ids = due_job_ids(WORKER_BATCH_SIZE)
+            for job_id in job_ids:
+                try:
+                    run_job(job_id)
+                except Exception:
+                    db.session.rollback()
+                    logger.exception("Job %s could not be run", job_id)
+            if once:
+                return
+            if not job_ids:
+                time.sleep(poll_interval)
+
+
+QUEUE_BACKENDS = {'thread': ThreadJobQueue, 'database': DatabaseJobQueue}
+
+
+def load_queue_class(name):
+    if name in QUEUE_BACKENDS:
+        return QUEUE_BACKENDS[name]
+    module_name, _, class_name = name.partition(':')
+    return getattr(importlib.import_module(module_name), class_name)
+
+
+def init_jobs(app):
+    app.extensions['job_queue'] = load_queue_class(app.config['JOB_BACKEND'])(app)
+
+
+def get_queue():
+    return current_app.extensions['job_queue']
+
+
+# ============== ENQUEUEING ==============
+
+def enqueue(kind, user_id, payload=None):
+    """Store a job and hand it to the queue. Raises QueueFull when the user
+    already has JOB_USER_MAX_PENDING unfinished jobs."""
+    spec = _tasks[kind]
+    user_id = int(user_id)
+    # Lock the user row, as claim() does, so concurrent enqueues for one
+    # user count each other
+    db.session.execute(db.select(User.id).where(User.id == user_id).with_for_update())
+    pending = db.session.execute(
+        db.select(func.count()).select_from(Job)
+        .where(Job.user_id == user_id, Job.status.in_(('queued', 'running')))
+    ).scalar()
+    if pending >= current_app.config['JOB_USER_MAX_PENDING']:
+        raise QueueFull()
+
+    job = Job(
+        id=str(uuid.uuid4()), user_id=user_id, kind=kind, status='queued',
+        payload=json.dumps(payload or {}), attempts=0, max_attempts=spec.max_attempts,
+        run_after=datetime.utcnow()
+    )
+    db.session.add(job)
+    db.session.commit()
+    get_queue().submit(job.id)
+    return job
+
+
+def prefers_async():
+    # RFC 7240 "Prefer: respond-async" opts a route into queuing its work
+    return 'respond-async' in request.headers.get('Prefer', '').lower()
+
+
+def job_accepted(job):
+    response = jsonify(job.to_dict())
+    response.status_code = 202
+    response.headers['Location'] = url_for('jobs.get_job', job_id=job.id)
+    response.headers['Preference-Applied'] = 'respond-async'
+    response.headers['Retry-After'] = str(current_app.config['JOB_POLL_INTERVAL'])
+    return response
+
+
+def queue_full_response():
+    response = jsonify({'message': 'Too many unfinished jobs. Please retry shortly.'})
+    response.status_code = 429
+    response.headers['Retry-After'] = str(current_app.config['JOB_POLL_INTERVAL'] * 5)
+    return response
+
+
+# ============== JOB ROUTES ==============
+
+@jobs_bp.route('/<job_id>', methods=['GET'])
+@jwt_required()
+def get_job(job_id):
+    try:
+        user_id = current_user_id()
+        job = Job.query.filter_by(id=job_id, user_id=user_id).first()
+
+        if not job:
+            return jsonify({'message': 'Job not found'}), 404
+
+        now = datetime.utcnow()
+        if job.status == 'running' and job.started_at < now - timedelta(seconds=REAP_GRACE_SECONDS):
+            for requeued_id in reap_stalled(job.user_id):
+                get_queue().submit(requeued_id)
+            db.session.refresh(job)
+        elif job.status == 'queued' and job.run_after < now - timedelta(seconds=STALE_QUEUED_SECONDS):
+            get_queue().submit(job.id)
+
+        response = jsonify(job.to_dict())
+        response.headers['Cache-Control'] = 'no-store'
+        if job.status not in TERMINAL_STATUSES:
+            response.headers['Retry-After'] = str(current_app.config['JOB_POLL_INTERVAL'])
+        return response, 200
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'message': str(e)}), 500
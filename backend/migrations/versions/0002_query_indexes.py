@@ -0,0 +1,46 @@
+"""indexes for foreign keys and listing sort orders
+
+Revision ID: 0002_query_indexes
+Revises: 0001_initial_schema
+Create Date: 2026-10-17 09:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002_query_indexes'
+down_revision = '0001_initial_schema'
+branch_labels = None
+depends_on = None
+
+# (name, table, columns) - each index matches a query shape in routes.py:
+#   workouts listing      WHERE user_id = ? ORDER BY created_at DESC, id DESC
+#   cardio listing        WHERE user_id = ? ORDER BY date DESC, id DESC
+#   exercise eager load   WHERE workout_id IN (...) ORDER BY "order"
+#   set eager load        WHERE exercise_id IN (...) ORDER BY set_number
+INDEXES = [
+    ('ix_workouts_user_id_created_at', 'workouts',
+     ['user_id', sa.text('created_at DESC'), sa.text('id DESC')]),
+    ('ix_cardio_sessions_user_id_date', 'cardio_sessions',
+     ['user_id', sa.text('date DESC'), sa.text('id DESC')]),
+    ('ix_exercises_workout_id_order', 'exercises', ['workout_id', 'order']),
+    ('ix_sets_exercise_id_set_number', 'sets', ['exercise_id', 'set_number']),
+]
+
+
+def upgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        # Build without blocking writes on large, live tables
+        with op.get_context().autocommit_block():
+            for name, table, columns in INDEXES:
+                op.create_index(name, table, columns, postgresql_concurrently=True, if_not_exists=True)
+    else:
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns)
+
+
+def downgrade():
+    for name, table, columns in INDEXES:
+        op.drop_index(name, table_name=table)
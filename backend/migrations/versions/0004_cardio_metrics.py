@@ -0,0 +1,55 @@
+"""derived cardio metrics columns and indexes
+
+Revision ID: 0004_cardio_metrics
+Revises: 0003_user_data_version
+Create Date: 2026-10-17 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004_cardio_metrics'
+down_revision = '0003_user_data_version'
+branch_labels = None
+depends_on = None
+
+# Existing rows keep metrics_version 0 until `flask backfill-cardio-metrics`
+# computes them.
+INDEXES = [
+    ('ix_cardio_sessions_user_id_date_metrics', 'cardio_sessions', ['user_id', 'date'],
+     {'postgresql_include': ['distance_m', 'duration_minutes', 'training_load']}),
+    ('ix_cardio_sessions_user_id_activity_pace', 'cardio_sessions',
+     ['user_id', 'activity_type', 'pace_s_per_km'], {}),
+]
+
+
+def upgrade():
+    with op.batch_alter_table('cardio_sessions', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('distance_m', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('pace_s_per_km', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('speed_kmh', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('training_load', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('metrics_version', sa.SmallInteger(), nullable=False, server_default='0'))
+
+    if op.get_bind().dialect.name == 'postgresql':
+        # Build without blocking writes on large, live tables
+        with op.get_context().autocommit_block():
+            for name, table, columns, options in INDEXES:
+                op.create_index(name, table, columns, postgresql_concurrently=True, if_not_exists=True, **options)
+    else:
+        for name, table, columns, options in INDEXES:
+            op.create_index(name, table, columns)
+
+
+def downgrade():
+    for name, table, columns, options in INDEXES:
+        op.drop_index(name, table_name=table)
+
+    with op.batch_alter_table('cardio_sessions', schema=None) as batch_op:
+        batch_op.drop_column('metrics_version')
+        batch_op.drop_column('training_load')
+        batch_op.drop_column('speed_kmh')
+        batch_op.drop_column('pace_s_per_km')
+        batch_op.drop_column('distance_m')
@@ -0,0 +1,53 @@
+"""offline sync idempotency log and change feed
+
+Revision ID: 0006_sync
+Revises: 0005_jobs
+Create Date: 2026-10-17 17:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0006_sync'
+down_revision = '0005_jobs'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('sync_operations',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('op_id', sa.String(length=64), nullable=False),
+    sa.Column('client_id', sa.String(length=64), nullable=True),
+    sa.Column('entity', sa.String(length=20), nullable=False),
+    sa.Column('entity_id', sa.Integer(), nullable=True),
+    sa.Column('result', sa.Text(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_id', 'op_id', name='uq_sync_operations_user_id_op_id')
+    )
+    op.create_index('ix_sync_operations_user_id_client_id', 'sync_operations', ['user_id', 'client_id'], unique=False)
+    op.create_table('sync_changes',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('version', sa.BigInteger(), nullable=False),
+    sa.Column('entity', sa.String(length=20), nullable=False),
+    sa.Column('entity_id', sa.Integer(), nullable=False),
+    sa.Column('deleted', sa.Boolean(), nullable=False),
+    sa.Column('changed_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_id', 'entity', 'entity_id', name='uq_sync_changes_user_id_entity')
+    )
+    op.create_index('ix_sync_changes_user_id_version', 'sync_changes', ['user_id', 'version'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_sync_changes_user_id_version', table_name='sync_changes')
+    op.drop_table('sync_changes')
+    op.drop_index('ix_sync_operations_user_id_client_id', table_name='sync_operations')
+    op.drop_table('sync_operations')
@@ -0,0 +1,214 @@
+"""time partitioning and archive tables for sets and cardio sessions
+
+Revision ID: 0007_partitioning
+Revises: 0006_sync
+Create Date: 2026-10-17 19:00:00.000000
+
+"""
+from datetime import date
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0007_partitioning'
+down_revision = '0006_sync'
+branch_labels = None
+depends_on = None
+
+# sets gains performed_at, a copy of its workout's created_at, as its time
+# key; cardio_sessions is keyed on date.
+#
+# On Postgres both tables are rebuilt range-partitioned by month, with
+# partitions from the oldest row's month to MONTHS_AHEAD months ahead and a
+# default partition for anything outside them. Existing rows are copied
+# into the new tables, which locks them for the duration: schedule the
+# upgrade accordingly on a large database. The *_archive tables are
+# partitioned the same way but have no default partition, so
+# `flask archive-history` can move whole months between the two (see
+# archive.py). Elsewhere (SQLite) every table stays a plain table.
+
+MONTHS_AHEAD = 3
+
+KEYS = {'sets': 'performed_at', 'cardio_sessions': 'date'}
+NEW_COLUMNS = {'sets': ', performed_at TIMESTAMP WITHOUT TIME ZONE NOT NULL', 'cardio_sessions': ''}
+FOREIGN_KEYS = {
+    'sets': '(exercise_id) REFERENCES exercises (id)',
+    'cardio_sessions': '(user_id) REFERENCES users (id)',
+}
+INDEXES = {
+    'sets': [
+        ('ix_{table}_exercise_id_set_number', '(exercise_id, set_number)'),
+    ],
+    'cardio_sessions': [
+        ('ix_{table}_user_id_date', '(user_id, date DESC, id DESC)'),
+        ('ix_{table}_user_id_date_metrics', '(user_id, date) INCLUDE (distance_m, duration_minutes, training_load)'),
+        ('ix_{table}_user_id_activity_pace', '(user_id, activity_type, pace_s_per_km)'),
+    ],
+}
+OLDEST = {
+    'sets': 'SELECT min(created_at) FROM workouts',
+    'cardio_sessions': 'SELECT min(date) FROM cardio_sessions',
+}
+COPY = {
+    # LEFT JOINs: a set whose exercise or workout is gone is still copied
+    'sets': 'INSERT INTO sets SELECT s.*, COALESCE(w.created_at, s.created_at, TIMESTAMP \'1970-01-01\') '
+            'FROM sets_unpartitioned s LEFT JOIN exercises e ON e.id = s.exercise_id '
+            'LEFT JOIN workouts w ON w.id = e.workout_id',
+    'cardio_sessions': 'INSERT INTO cardio_sessions SELECT * FROM cardio_sessions_unpartitioned',
+}
+
+SET_COLUMNS = [
+    ('id', sa.Integer(), False),
+    ('exercise_id', sa.Integer(), False),
+    ('set_number', sa.Integer(), False),
+    ('reps', sa.Integer(), False),
+    ('weight', sa.Float(), True),
+    ('completed', sa.Boolean(), True),
+    ('rest_seconds', sa.Integer(), True),
+    ('notes', sa.Text(), True),
+    ('created_at', sa.DateTime(), True),
+    ('performed_at', sa.DateTime(), False),
+]
+CARDIO_COLUMNS = [
+    ('id', sa.Integer(), False),
+    ('user_id', sa.Integer(), False),
+    ('date', sa.Date(), False),
+    ('activity_type', sa.String(length=50), False),
+    ('duration_minutes', sa.Integer(), False),
+    ('distance', sa.Float(), True),
+    ('distance_unit', sa.String(length=10), True),
+    ('calories_burned', sa.Integer(), True),
+    ('avg_heart_rate', sa.Integer(), True),
+    ('notes', sa.Text(), True),
+    ('created_at', sa.DateTime(), True),
+    ('distance_m', sa.Float(), True),
+    ('pace_s_per_km', sa.Float(), True),
+    ('speed_kmh', sa.Float(), True),
+    ('training_load', sa.Float(), True),
+    ('metrics_version', sa.SmallInteger(), False),
+]
+
+
+def _months(first, months_ahead):
+    today = date.today()
+    month = date(first.year, first.month, 1)
+    last = date(today.year + (today.month - 1 + months_ahead) // 12, (today.month - 1 + months_ahead) % 12 + 1, 1)
+    while month <= last:
+        following = date(month.year + month.month // 12, month.month % 12 + 1, 1)
+        yield month, following
+        month = following
+
+
+def _add_keys(table, name):
+    op.execute(f'ALTER TABLE {name} ADD PRIMARY KEY (id, {KEYS[table]})')
+    op.execute(f'ALTER TABLE {name} ADD FOREIGN KEY {FOREIGN_KEYS[table]}')
+    for index, columns in INDEXES[table]:
+        op.execute(f'CREATE INDEX {index.format(table=name)} ON {name} {columns}')
+
+
+def _partition_postgres(table):
+    conn = op.get_bind()
+    key = KEYS[table]
+    legacy = f'{table}_unpartitioned'
+    oldest = conn.execute(sa.text(OLDEST[table])).scalar() or date.today()
+
+    op.execute(f'ALTER TABLE {table} RENAME TO {legacy}')
+    op.execute(f'CREATE TABLE {table} (LIKE {legacy} INCLUDING DEFAULTS{NEW_COLUMNS[table]}) '
+               f'PARTITION BY RANGE ({key})')
+    for month, following in _months(oldest, MONTHS_AHEAD):
+        op.execute(f"CREATE TABLE {table}_p{month:%Y%m} PARTITION OF {table} "
+                   f"FOR VALUES FROM ('{month.isoformat()}') TO ('{following.isoformat()}')")
+    op.execute(f'CREATE TABLE {table}_default PARTITION OF {table} DEFAULT')
+    op.execute(COPY[table])
+
+    sequence = conn.execute(sa.text("SELECT pg_get_serial_sequence(:name, 'id')"), {'name': legacy}).scalar()
+    op.execute(f'ALTER SEQUENCE {sequence} OWNED BY {table}.id')
+    op.execute(f'DROP TABLE {legacy}')
+    _add_keys(table, table)
+
+    archive = f'{table}_archive'
+    op.execute(f'CREATE TABLE {archive} (LIKE {table}) PARTITION BY RANGE ({key})')
+    _add_keys(table, archive)
+
+
+def _unpartition_postgres(table):
+    conn = op.get_bind()
+    partitioned = f'{table}_partitioned'
+    op.execute(f'ALTER TABLE {table} RENAME TO {partitioned}')
+    op.execute(f'CREATE TABLE {table} (LIKE {partitioned} INCLUDING DEFAULTS)')
+    op.execute(f'INSERT INTO {table} SELECT * FROM {partitioned}')
+    op.execute(f'INSERT INTO {table} SELECT * FROM {table}_archive')
+
+    sequence = conn.execute(sa.text("SELECT pg_get_serial_sequence(:name, 'id')"), {'name': partitioned}).scalar()
+    op.execute(f'ALTER SEQUENCE {sequence} OWNED BY {table}.id')
+    op.execute(f'DROP TABLE {partitioned}')
+    op.execute(f'DROP TABLE {table}_archive')
+
+    op.execute(f'ALTER TABLE {table} ADD PRIMARY KEY (id)')
+    op.execute(f'ALTER TABLE {table} ADD FOREIGN KEY {FOREIGN_KEYS[table]}')
+    for index, columns in INDEXES[table]:
+        op.execute(f'CREATE INDEX {index.format(table=table)} ON {table} {columns}')
+
+
+def _create_archive_table(table, columns, foreign_key, indexes):
+    archive = f'{table}_archive'
+    op.create_table(archive,
+    *[sa.Column(name, type_, nullable=nullable) for name, type_, nullable in columns],
+    sa.ForeignKeyConstraint(*foreign_key),
+    sa.PrimaryKeyConstraint('id')
+    )
+    for name, index_columns, options in indexes:
+        op.create_index(name.format(table=archive), archive, index_columns, unique=False, **options)
+
+
+def upgrade():
+    op.create_table('archive_boundaries',
+    sa.Column('table_name', sa.String(length=50), nullable=False),
+    sa.Column('archived_before', sa.Date(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('table_name')
+    )
+
+    if op.get_bind().dialect.name == 'postgresql':
+        _partition_postgres('sets')
+        _partition_postgres('cardio_sessions')
+        return
+
+    with op.batch_alter_table('sets', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('performed_at', sa.DateTime(), nullable=True))
+    op.execute(
+        "UPDATE sets SET performed_at = COALESCE((SELECT w.created_at FROM exercises e "
+        "JOIN workouts w ON w.id = e.workout_id WHERE e.id = sets.exercise_id), "
+        "sets.created_at, '1970-01-01 00:00:00')"
+    )
+    with op.batch_alter_table('sets', schema=None) as batch_op:
+        batch_op.alter_column('performed_at', existing_type=sa.DateTime(), nullable=False)
+
+    _create_archive_table('sets', SET_COLUMNS, (['exercise_id'], ['exercises.id']), [
+        ('ix_{table}_exercise_id_set_number', ['exercise_id', 'set_number'], {}),
+    ])
+    _create_archive_table('cardio_sessions', CARDIO_COLUMNS, (['user_id'], ['users.id']), [
+        ('ix_{table}_user_id_date', ['user_id', sa.text('date DESC'), sa.text('id DESC')], {}),
+        ('ix_{table}_user_id_date_metrics', ['user_id', 'date'], {}),
+        ('ix_{table}_user_id_activity_pace', ['user_id', 'activity_type', 'pace_s_per_km'], {}),
+    ])
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        _unpartition_postgres('cardio_sessions')
+        _unpartition_postgres('sets')
+        op.execute('ALTER TABLE sets DROP COLUMN performed_at')
+    else:
+        # Archived rows go back before the archive tables are dropped
+        for table, columns in (('sets', SET_COLUMNS), ('cardio_sessions', CARDIO_COLUMNS)):
+            names = ', '.join(name for name, _, _ in columns)
+            op.execute(f'INSERT INTO {table} ({names}) SELECT {names} FROM {table}_archive')
+            for index, _ in INDEXES[table]:
+                op.drop_index(index.format(table=f'{table}_archive'), table_name=f'{table}_archive')
+            op.drop_table(f'{table}_archive')
+        with op.batch_alter_table('sets', schema=None) as batch_op:
+            batch_op.drop_column('performed_at')
+
+    op.drop_table('archive_boundaries')
@@ -0,0 +1,78 @@
+"""stats rollups, training digests, chat history and the AI cache opt-out
+
+Revision ID: 0008_coach_and_rollups
+Revises: 0007_partitioning
+Create Date: 2026-10-17 20:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0008_coach_and_rollups'
+down_revision = '0007_partitioning'
+branch_labels = None
+depends_on = None
+
+# These tables and users.ai_cache_opt_out used to be created by 0001, which
+# is now the schema databases built with db.create_all() before migrations
+# existed have. Databases upgraded through the old 0001 already have them,
+# so each is created only when missing.
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    if 'ai_cache_opt_out' not in {column['name'] for column in inspector.get_columns('users')}:
+        with op.batch_alter_table('users', schema=None) as batch_op:
+            batch_op.add_column(sa.Column('ai_cache_opt_out', sa.Boolean(), nullable=False, server_default=sa.false()))
+
+    if not inspector.has_table('user_stats_rollups'):
+        op.create_table('user_stats_rollups',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('period', sa.String(length=10), nullable=False),
+        sa.Column('period_start', sa.Date(), nullable=False),
+        sa.Column('workout_count', sa.Integer(), nullable=False),
+        sa.Column('set_count', sa.Integer(), nullable=False),
+        sa.Column('total_reps', sa.Integer(), nullable=False),
+        sa.Column('total_volume', sa.Float(), nullable=False),
+        sa.Column('cardio_count', sa.Integer(), nullable=False),
+        sa.Column('cardio_minutes', sa.Integer(), nullable=False),
+        sa.Column('cardio_calories', sa.Integer(), nullable=False),
+        sa.Column('cardio_distance_km', sa.Float(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('user_id', 'period', 'period_start', name='uq_user_stats_rollups_bucket')
+        )
+    if not inspector.has_table('training_digests'):
+        op.create_table('training_digests',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('content', sa.Text(), nullable=False),
+        sa.Column('stale', sa.Boolean(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('user_id')
+        )
+    if not inspector.has_table('chat_messages'):
+        op.create_table('chat_messages',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('conversation_id', sa.String(length=36), nullable=False),
+        sa.Column('role', sa.String(length=20), nullable=False),
+        sa.Column('content', sa.Text(), nullable=False),
+        sa.Column('token_count', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index('ix_chat_messages_user_conversation_created', 'chat_messages', ['user_id', 'conversation_id', 'created_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_chat_messages_user_conversation_created', table_name='chat_messages')
+    op.drop_table('chat_messages')
+    op.drop_table('training_digests')
+    op.drop_table('user_stats_rollups')
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_column('ai_cache_opt_out')
@@ -1,8 +1,10 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
-from werkzeug.security import generate_password_hash, check_password_hash
+import json
+from db_pool import RoutingSession
+from passwords import hash_password, needs_rehash, verify_password
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 class User(db.Model):
     __tablename__ = 'users'
@@ -11,6 +13,9 @@ class User(db.Model):
     username = db.Column(db.String(80), unique=True, nullable=False)
     email = db.Column(db.String(120), unique=True, nullable=False)
     password_hash = db.Column(db.String(255), nullable=False)
+    ai_cache_opt_out = db.Column(db.Boolean, nullable=False, default=False)
+    # Bumped on every workout/cardio write; read endpoints derive ETags from it
+    data_version = db.Column(db.BigInteger, nullable=False, default=0, server_default='0')
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -19,16 +24,20 @@ class User(db.Model):
     cardio_sessions = db.relationship('CardioSession', backref='user', lazy=True, cascade='all, delete-orphan')
     
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hash_password(password)
     
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return verify_password(self.password_hash, password)
+    
+    def password_needs_rehash(self):
+        return needs_rehash(self.password_hash)
     
     def to_dict(self):
         return {
             'id': self.id,
             'username': self.username,
             'email': self.email,
+            'ai_cache_opt_out': bool(self.ai_cache_opt_out),
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
@@ -43,10 +52,15 @@ class Workout(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    # Matches the listing: WHERE user_id = ? ORDER BY created_at DESC, id DESC
+    __table_args__ = (
+        db.Index('ix_workouts_user_id_created_at', user_id, created_at.desc(), id.desc()),
+    )
+    
     # Relationships
     exercises = db.relationship('Exercise', backref='workout', lazy=True, cascade='all, delete-orphan', order_by='Exercise.order')
     
-    def to_dict(self, include_exercises=True):
+    def to_dict(self, include_exercises=True, include_sets=True):
         data = {
             'id': self.id,
             'userId': self.user_id,
@@ -56,10 +70,8 @@ class Workout(db.Model):
             'updatedAt': self.updated_at.isoformat() if self.updated_at else None
         }
         
-        if include_exercises and self.exercises:
-            data['exercises'] = [exercise.to_dict() for exercise in self.exercises]
-        else:
-            data['exercises'] = []
+        if include_exercises:
+            data['exercises'] = [exercise.to_dict(include_sets=include_sets) for exercise in self.exercises]
         
         return data
 
@@ -74,6 +86,11 @@ class Exercise(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    # Serves both the FK lookup and the relationship's ORDER BY "order"
+    __table_args__ = (
+        db.Index('ix_exercises_workout_id_order', workout_id, order),
+    )
+    
     # Relationships
     sets = db.relationship('Set', backref='exercise', lazy=True, cascade='all, delete-orphan', order_by='Set.set_number')
     
@@ -86,10 +103,8 @@ class Exercise(db.Model):
             'notes': self.notes
         }
         
-        if include_sets and self.sets:
+        if include_sets:
             data['sets'] = [set_obj.to_dict() for set_obj in self.sets]
-        else:
-            data['sets'] = []
         
         return data
 
@@ -105,6 +120,14 @@ class Set(db.Model):
     rest_seconds = db.Column(db.Integer)
     notes = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Copy of the workout's created_at: the time key sets are partitioned
+    # and archived on (see archive.py). On Postgres the primary key is
+    # (id, performed_at), as partitioning requires
+    performed_at = db.Column(db.DateTime, nullable=False)
+    
+    __table_args__ = (
+        db.Index('ix_sets_exercise_id_set_number', exercise_id, set_number),
+    )
     
     def to_dict(self):
         return {
@@ -132,6 +155,24 @@ class CardioSession(db.Model):
     avg_heart_rate = db.Column(db.Integer)
     notes = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    # Derived at write time by cardio_metrics.py
+    distance_m = db.Column(db.Float)
+    pace_s_per_km = db.Column(db.Float)
+    speed_kmh = db.Column(db.Float)
+    training_load = db.Column(db.Float)
+    metrics_version = db.Column(db.SmallInteger, nullable=False, default=0, server_default='0')
+    
+    # Partitioned by month on date on Postgres, primary key (id, date)
+    # Matches the listing: WHERE user_id = ? ORDER BY date DESC, id DESC
+    # The metrics index covers date-range aggregates (index-only on Postgres);
+    # the pace index serves per-activity filters and "fastest" orderings
+    __table_args__ = (
+        db.Index('ix_cardio_sessions_user_id_date', user_id, date.desc(), id.desc()),
+        db.Index('ix_cardio_sessions_user_id_date_metrics', user_id, date,
+                 postgresql_include=['distance_m', 'duration_minutes', 'training_load']),
+        db.Index('ix_cardio_sessions_user_id_activity_pace', user_id, activity_type, pace_s_per_km),
+    )
 
     def to_dict(self):
         return {
@@ -145,5 +186,180 @@ class CardioSession(db.Model):
             'caloriesBurned': self.calories_burned,
             'avgHeartRate': self.avg_heart_rate,
             'notes': self.notes,
+            'createdAt': self.created_at.isoformat() if self.created_at else None,
+            'distanceM': self.distance_m,
+            'paceSecondsPerKm': self.pace_s_per_km,
+            'speedKmh': self.speed_kmh,
+            'trainingLoad': self.training_load
+        }
+
+class UserStatsRollup(db.Model):
+    __tablename__ = 'user_stats_rollups'
+    
+    # One row per user per period bucket; period is 'week', 'month' or
+    # 'total' (lifetime, period_start fixed at 1970-01-01)
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    period = db.Column(db.String(10), nullable=False)
+    period_start = db.Column(db.Date, nullable=False)
+    workout_count = db.Column(db.Integer, nullable=False, default=0)
+    set_count = db.Column(db.Integer, nullable=False, default=0)
+    total_reps = db.Column(db.Integer, nullable=False, default=0)
+    total_volume = db.Column(db.Float, nullable=False, default=0)
+    cardio_count = db.Column(db.Integer, nullable=False, default=0)
+    cardio_minutes = db.Column(db.Integer, nullable=False, default=0)
+    cardio_calories = db.Column(db.Integer, nullable=False, default=0)
+    cardio_distance_km = db.Column(db.Float, nullable=False, default=0)
+    
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'period', 'period_start', name='uq_user_stats_rollups_bucket'),
+    )
+    
+    def to_dict(self):
+        return {
+            'period': self.period,
+            'periodStart': self.period_start.isoformat() if self.period_start else None,
+            'workouts': self.workout_count,
+            'sets': self.set_count,
+            'reps': self.total_reps,
+            'volume': self.total_volume,
+            'cardioSessions': self.cardio_count,
+            'cardioMinutes': self.cardio_minutes,
+            'cardioCalories': self.cardio_calories,
+            'cardioDistanceKm': round(self.cardio_distance_km, 2)
+        }
+
+class TrainingDigest(db.Model):
+    __tablename__ = 'training_digests'
+    
+    # Precomputed, token-budgeted summary of a user's training for the AI
+    # coach; rebuilt lazily after the user's data changes
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    content = db.Column(db.Text, nullable=False, default='')
+    stale = db.Column(db.Boolean, nullable=False, default=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class ChatMessage(db.Model):
+    __tablename__ = 'chat_messages'
+    
+    # Append-only log of AI coach conversations
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    conversation_id = db.Column(db.String(36), nullable=False)
+    role = db.Column(db.String(20), nullable=False)  # user or assistant
+    content = db.Column(db.Text, nullable=False)
+    token_count = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        db.Index('ix_chat_messages_user_conversation_created', 'user_id', 'conversation_id', 'created_at'),
+    )
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'conversationId': self.conversation_id,
+            'role': self.role,
+            'content': self.content,
             'createdAt': self.created_at.isoformat() if self.created_at else None
-        }
\ No newline at end of file
+        }
+
+class Job(db.Model):
+    __tablename__ = 'jobs'
+    
+    # Background work queued by jobs.py; also the queue itself for the
+    # database backend
+    id = db.Column(db.String(36), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    kind = db.Column(db.String(50), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, succeeded, failed
+    payload = db.Column(db.Text, nullable=False, default='{}')
+    result = db.Column(db.Text)
+    error = db.Column(db.Text)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=1)
+    run_after = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    
+    __table_args__ = (
+        db.Index('ix_jobs_user_id_status', 'user_id', 'status'),
+        db.Index('ix_jobs_status_run_after', 'status', 'run_after'),
+    )
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'result': json.loads(self.result) if self.result else None,
+            'error': self.error,
+            'attempts': self.attempts,
+            'maxAttempts': self.max_attempts,
+            'createdAt': self.created_at.isoformat() if self.created_at else None,
+            'startedAt': self.started_at.isoformat() if self.started_at else None,
+            'finishedAt': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+class SyncOperation(db.Model):
+    __tablename__ = 'sync_operations'
+    
+    # Idempotency log for /api/sync: one row per applied client operation,
+    # written in the same transaction as its effects
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    op_id = db.Column(db.String(64), nullable=False)
+    client_id = db.Column(db.String(64))
+    entity = db.Column(db.String(20), nullable=False)
+    entity_id = db.Column(db.Integer)
+    result = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'op_id', name='uq_sync_operations_user_id_op_id'),
+        db.Index('ix_sync_operations_user_id_client_id', 'user_id', 'client_id'),
+    )
+
+class SyncChange(db.Model):
+    __tablename__ = 'sync_changes'
+    
+    # Latest change per synced entity, stamped with the user's data_version
+    # at the time; deleted rows are tombstones
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    version = db.Column(db.BigInteger, nullable=False)
+    entity = db.Column(db.String(20), nullable=False)
+    entity_id = db.Column(db.Integer, nullable=False)
+    deleted = db.Column(db.Boolean, nullable=False, default=False)
+    changed_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'entity', 'entity_id', name='uq_sync_changes_user_id_entity'),
+        db.Index('ix_sync_changes_user_id_version', 'user_id', 'version'),
+    )
+
+def archive_table(model):
+    # Same columns, keys and index definitions as the hot table, so that on
+    # Postgres a monthly partition can be detached from one and attached to
+    # the other without rebuilding anything
+    name = f'{model.__tablename__}_archive'
+    table = model.__table__.to_metadata(db.metadata, name=name)
+    for index in table.indexes:
+        index.name = index.name.replace(model.__tablename__, name, 1)
+    return table
+
+class ArchivedSet(db.Model):
+    __table__ = archive_table(Set)
+
+class ArchivedCardioSession(db.Model):
+    __table__ = archive_table(CardioSession)
+
+class ArchiveBoundary(db.Model):
+    __tablename__ = 'archive_boundaries'
+    
+    # Rows of table_name keyed before archived_before may have been moved to
+    # its archive table; only ever moves forward
+    table_name = db.Column(db.String(50), primary_key=True)
+    archived_before = db.Column(db.Date, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
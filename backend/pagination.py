@@ -0,0 +1,104 @@
+import base64
+import json
+from datetime import date, datetime
+from flask import jsonify, request
+from sqlalchemy import and_, or_
+from urllib.parse import urlencode
+
+# Page size limits for list endpoints
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+class PaginationError(ValueError):
+    pass
+
+
+def encode_cursor(sort_value, row_id):
+    # Opaque cursor: the (sort key, id) of the last row on the page
+    if isinstance(sort_value, (date, datetime)):
+        sort_value = sort_value.isoformat()
+    raw = json.dumps([sort_value, row_id], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor, parse_sort_value):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(padded))
+        return parse_sort_value(sort_value), int(row_id)
+    except (ValueError, TypeError):
+        raise PaginationError('Invalid cursor')
+
+
+def parse_limit(raw):
+    if raw is None:
+        return DEFAULT_PAGE_SIZE
+    try:
+        limit = int(raw)
+    except ValueError:
+        raise PaginationError('limit must be an integer')
+    if limit < 1:
+        raise PaginationError('limit must be positive')
+    return min(limit, MAX_PAGE_SIZE)
+
+
+def parse_csv_param(raw):
+    # "a, b,,c" -> {'a', 'b', 'c'}; None means the parameter was not sent
+    if raw is None:
+        return None
+    return {part.strip() for part in raw.split(',') if part.strip()}
+
+
+def wants_pagination(args):
+    # Listings stay unpaginated unless the client asks for a page
+    return 'limit' in args or 'cursor' in args
+
+
+def paginate_desc(query, sort_column, id_column, args, parse_sort_value, fetch=None):
+    """Keyset pagination over (sort_column, id) in descending order.
+
+    The cursor names the last row already seen, so rows inserted while a
+    client is paging never shift later pages. ``query`` may be an ORM query
+    or a Core select, in which case ``fetch`` executes it. Returns
+    (rows, next_cursor).
+    """
+    limit = parse_limit(args.get('limit'))
+    cursor = args.get('cursor')
+
+    if cursor:
+        sort_value, row_id = decode_cursor(cursor, parse_sort_value)
+        query = query.filter(or_(
+            sort_column < sort_value,
+            and_(sort_column == sort_value, id_column < row_id)
+        ))
+
+    # Fetch one extra row to know whether another page exists
+    query = query.order_by(sort_column.desc(), id_column.desc()).limit(limit + 1)
+    rows = fetch(query) if fetch else query.all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(getattr(last, sort_column.key), last.id)
+
+    return rows, next_cursor
+
+
+def select_fields(data, fields):
+    # Sparse fieldsets: keep only the requested top-level keys (plus id)
+    if not fields:
+        return data
+    return {key: value for key, value in data.items() if key in fields or key == 'id'}
+
+
+def paginated_response(items, next_cursor, render=jsonify):
+    # Body stays a plain list; the next page is advertised in headers
+    response = render(items)
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+        args = request.args.to_dict()
+        args['cursor'] = next_cursor
+        response.headers['Link'] = '<{}?{}>; rel="next"'.format(request.base_url, urlencode(args))
+    return response
@@ -0,0 +1,91 @@
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from flask import current_app
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, check_password_hash, generate_password_hash
+
+# Password hashing service.
+#
+# scrypt/pbkdf2 are deliberately CPU-heavy. Running them inline lets a burst
+# of logins pin every request worker, so hashes run in a bounded process
+# pool instead. At most PASSWORD_HASH_MAX_PENDING hashes may be queued or
+# running per worker process; beyond that callers get HashingBusy rather
+# than piling up behind the pool, as do callers whose hash is not done
+# within PASSWORD_HASH_TIMEOUT. PASSWORD_HASH_WORKERS=0 hashes inline.
+
+
+class HashingBusy(Exception):
+    pass
+
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+_pending = None
+
+
+def canonical_method(method):
+    # Spell out werkzeug's defaults so stored hashes compare exactly
+    parts = method.split(':')
+    if parts[0] == 'scrypt':
+        defaults = ['scrypt', '32768', '8', '1']
+    elif parts[0] == 'pbkdf2':
+        defaults = ['pbkdf2', 'sha256', str(DEFAULT_PBKDF2_ITERATIONS)]
+    else:
+        return method
+    return ':'.join(parts + defaults[len(parts):])
+
+
+def needs_rehash(pwhash):
+    """True when a stored hash was made with other parameters than the
+    configured PASSWORD_HASH_METHOD (e.g. after raising the cost)."""
+    stored_method = pwhash.split('$', 1)[0]
+    return stored_method != canonical_method(current_app.config['PASSWORD_HASH_METHOD'])
+
+
+def _get_executor(config):
+    global _executor, _executor_pid, _pending
+    # Pools do not survive fork; each worker process builds its own
+    if _executor is None or _executor_pid != os.getpid():
+        with _executor_lock:
+            if _executor is None or _executor_pid != os.getpid():
+                _executor = ProcessPoolExecutor(max_workers=config['PASSWORD_HASH_WORKERS'])
+                _executor_pid = os.getpid()
+                _pending = threading.BoundedSemaphore(config['PASSWORD_HASH_MAX_PENDING'])
+    return _executor
+
+
+def _run(func, *args):
+    config = current_app.config
+    if not config['PASSWORD_HASH_WORKERS']:
+        return func(*args)
+
+    executor = _get_executor(config)
+    pending = _pending
+    # One deadline covers waiting for a slot and for the hash itself
+    timeout = config['PASSWORD_HASH_TIMEOUT']
+    deadline = time.monotonic() + timeout
+    if not pending.acquire(timeout=timeout):
+        raise HashingBusy()
+    try:
+        future = executor.submit(func, *args)
+    except Exception:
+        pending.release()
+        raise
+    # The slot is held until the hash is done, not until this caller stops
+    # waiting for it, so abandoned hashes still count against the bound
+    future.add_done_callback(lambda _: pending.release())
+    try:
+        return future.result(timeout=max(deadline - time.monotonic(), 0))
+    except FutureTimeoutError:
+        future.cancel()
+        raise HashingBusy()
+
+
+def hash_password(password):
+    return _run(generate_password_hash, password, current_app.config['PASSWORD_HASH_METHOD'])
+
+
+def verify_password(pwhash, password):
+    return _run(check_password_hash, pwhash, password)
@@ -0,0 +1,64 @@
+import threading
+import time
+from collections import deque
+from flask import current_app
+
+# In-process sliding-window rate limiting, used to turn away abusive auth
+# traffic before any password hashing happens. Limits are per worker
+# process; put a shared limiter in front of the app for global limits.
+
+
+class SlidingWindowLimiter:
+    def __init__(self, limit, window_seconds):
+        self.limit = limit
+        self.window = window_seconds
+        self._hits = {}
+        self._lock = threading.Lock()
+
+    def _prune(self, hits, now):
+        while hits and hits[0] <= now - self.window:
+            hits.popleft()
+
+    def retry_after(self, key):
+        # Seconds until ``key`` may try again; 0 when it is under the limit
+        now = time.monotonic()
+        with self._lock:
+            hits = self._hits.get(key)
+            if not hits:
+                return 0
+            self._prune(hits, now)
+            if len(hits) < self.limit:
+                return 0
+            return max(1, int(hits[0] + self.window - now) + 1)
+
+    def hit(self, key):
+        now = time.monotonic()
+        with self._lock:
+            hits = self._hits.setdefault(key, deque())
+            self._prune(hits, now)
+            hits.append(now)
+            # Keep memory bounded under key-spraying attacks
+            if len(self._hits) > 100000:
+                self._hits = {k: v for k, v in self._hits.items() if v and v[-1] > now - self.window}
+
+    def reset(self, key):
+        with self._lock:
+            self._hits.pop(key, None)
+
+
+def parse_limit(spec):
+    # "20/60" -> 20 attempts per 60 seconds
+    limit, window = spec.split('/')
+    return int(limit), float(window)
+
+
+def init_rate_limits(app):
+    app.extensions['rate_limiters'] = {
+        'login_ip': SlidingWindowLimiter(*parse_limit(app.config['LOGIN_RATE_LIMIT_IP'])),
+        'login_email': SlidingWindowLimiter(*parse_limit(app.config['LOGIN_RATE_LIMIT_EMAIL'])),
+        'register_ip': SlidingWindowLimiter(*parse_limit(app.config['REGISTER_RATE_LIMIT_IP'])),
+    }
+
+
+def rate_limiter(name):
+    return current_app.extensions['rate_limiters'][name]
@@ -0,0 +1,159 @@
+import itertools
+import threading
+import time
+from functools import wraps
+from flask import current_app, g, has_request_context
+from sqlalchemy import event
+from changes import on_training_data_changed
+from models import db, User
+from user_cache import current_user_id
+
+# Read replica routing.
+#
+# Every SQLALCHEMY_BINDS key starting with "replica" (Config builds them from
+# DATABASE_REPLICA_URLS) is a read replica of the primary. Views decorated
+# with @read_replica run their SELECTs on one of them, picked round-robin;
+# all writes stay on the primary (see db_pool.RoutingSession).
+#
+# Reads fall back to the primary when:
+#   - the user wrote in this process within REPLICA_STICKY_SECONDS
+#   - the replica's users.data_version for the user is behind the primary's,
+#     which gives read-your-writes across worker processes and keeps ETags
+#     (derived from the primary's version) from labelling stale bodies
+#   - the replica failed to connect recently; it is skipped for
+#     REPLICA_RETRY_SECONDS, and a request it fails midway is rerun on the
+#     primary
+
+REPLICA_BIND_PREFIX = 'replica'
+STICKY_MAX_USERS = 100000
+
+
+class ReplicaRouter:
+    def __init__(self, bind_keys, sticky_seconds, retry_seconds):
+        self.bind_keys = list(bind_keys)
+        self.sticky_seconds = sticky_seconds
+        self.retry_seconds = retry_seconds
+        self._next = itertools.cycle(self.bind_keys)
+        self._down_until = {}
+        self._sticky_until = {}
+        self._lock = threading.Lock()
+
+    def stick(self, user_id):
+        now = time.monotonic()
+        with self._lock:
+            self._sticky_until[user_id] = now + self.sticky_seconds
+            # Keep memory bounded
+            if len(self._sticky_until) > STICKY_MAX_USERS:
+                self._sticky_until = {k: v for k, v in self._sticky_until.items() if v > now}
+
+    def is_sticky(self, user_id):
+        return self._sticky_until.get(user_id, 0) > time.monotonic()
+
+    def mark_down(self, bind_key):
+        with self._lock:
+            self._down_until[bind_key] = time.monotonic() + self.retry_seconds
+
+    def is_up(self, bind_key):
+        return self._down_until.get(bind_key, 0) <= time.monotonic()
+
+    def next_replica(self):
+        with self._lock:
+            for _ in self.bind_keys:
+                bind_key = next(self._next)
+                if self.is_up(bind_key):
+                    return bind_key
+        return None
+
+    def status(self):
+        return {bind_key: 'up' if self.is_up(bind_key) else 'down' for bind_key in self.bind_keys}
+
+
+def get_router():
+    return current_app.extensions.get('replica_router')
+
+
+def _data_version(user_id, engine=None):
+    query = db.select(User.data_version).where(User.id == user_id)
+    if engine is None:
+        return db.session.execute(query).scalar()
+    return db.session.execute(query, bind_arguments={'bind': engine}).scalar()
+
+
+def choose_replica(user_id):
+    """Replica bind key to serve this user's reads from, or None for the primary."""
+    router = get_router()
+    if router is None or user_id is None or router.is_sticky(int(user_id)):
+        return None
+    bind_key = router.next_replica()
+    if bind_key is None:
+        return None
+
+    try:
+        replica_version = _data_version(user_id, db.engines[bind_key])
+    except Exception:
+        db.session.rollback()
+        g.pop('replica_failed', None)
+        router.mark_down(bind_key)
+        return None
+
+    # conditional_get has usually just read the primary's version
+    primary_version = g.get('data_version')
+    if primary_version is None:
+        primary_version = _data_version(user_id)
+    if replica_version is None or replica_version < primary_version:
+        return None
+    return bind_key
+
+
+def read_replica(view):
+    """Run a read-only view's SELECTs on a replica when one is fresh enough.
+
+    Goes below @conditional_get so the ETag is still computed on the primary.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        g.read_bind = choose_replica(current_user_id())
+        try:
+            response = view(*args, **kwargs)
+            if g.pop('replica_failed', False):
+                # The replica went away mid-request; reads are safe to redo
+                db.session.rollback()
+                g.read_bind = None
+                response = view(*args, **kwargs)
+            return response
+        finally:
+            g.pop('read_bind', None)
+    return wrapper
+
+
+@on_training_data_changed
+def stick_to_primary(user_id, kind):
+    router = get_router()
+    if router is not None:
+        router.stick(int(user_id))
+
+
+def init_replicas(app):
+    bind_keys = sorted(
+        key for key in app.config.get('SQLALCHEMY_BINDS') or {}
+        if key.startswith(REPLICA_BIND_PREFIX)
+    )
+    if not bind_keys:
+        return
+    router = app.extensions['replica_router'] = ReplicaRouter(
+        bind_keys, app.config['REPLICA_STICKY_SECONDS'], app.config['REPLICA_RETRY_SECONDS']
+    )
+
+    with app.app_context():
+        for bind_key in bind_keys:
+            event.listen(db.engines[bind_key], 'handle_error', _replica_error_handler(router, bind_key))
+
+
+def _replica_error_handler(router, bind_key):
+    def handle_error(context):
+        # Connection failures only; a bad query is not a dead replica
+        if context.is_disconnect or context.connection is None:
+            router.mark_down(bind_key)
+            if has_request_context():
+                g.replica_failed = True
+    return handle_error
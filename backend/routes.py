@@ -1,9 +1,30 @@
-from flask import Blueprint, request, jsonify
-from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
+from flask import Blueprint, current_app, request, jsonify
+from flask_jwt_extended import create_access_token, current_user, jwt_required
 from datetime import datetime, timedelta
 from werkzeug.security import generate_password_hash
-from models import db, User, Workout, Exercise, Set, CardioSession
+from models import db, User, Workout, Exercise, CardioSession
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import selectinload
+from replicas import read_replica
+from archive import restore_cardio_session, restore_workout_sets
+from http_cache import conditional_get
+from serializers import (
+    cardio_select, fetch_rows, json_response, paginate_cardio, serialize_cardio_rows, serialize_workout_rows,
+    workout_select
+)
+from passwords import HashingBusy
+from rate_limit import rate_limiter
+from workout_writer import apply_exercise_diff, delete_workout_tree, insert_exercise_tree, replace_exercise_tree
+from changes import training_data_changed
+from change_log import CARDIO, WORKOUT, log_changes
+from cardio_metrics import apply_cardio_metrics
+from exercise_catalog import exercises_added
+from jobs import QueueFull, enqueue, job_accepted, prefers_async, queue_full_response, task
+from stats import record_cardio, record_workout, record_workout_change, workout_totals
+from pagination import (
+    PaginationError, paginate_desc, paginated_response, parse_csv_param, select_fields, wants_pagination
+)
+from user_cache import current_user_id
 
 # Create blueprints
 auth_bp = Blueprint('auth', __name__, url_prefix='/api/auth')
@@ -12,6 +33,12 @@ cardio_bp = Blueprint('cardio', __name__, url_prefix='/api/cardio')
 
 # ============== AUTH ROUTES ==============
 
+def retry_later(message, retry_after, status=429):
+    response = jsonify({'message': message})
+    response.status_code = status
+    response.headers['Retry-After'] = str(retry_after)
+    return response
+
 @auth_bp.route('/register', methods=['POST'])
 def register():
     try:
@@ -21,6 +48,14 @@ def register():
         if not data.get('username') or not data.get('email') or not data.get('password'):
             return jsonify({'message': 'Username, email and password are required'}), 400
         
+        # Throttle before any hashing work
+        ip = request.remote_addr or 'unknown'
+        register_ip_limiter = rate_limiter('register_ip')
+        retry_after = register_ip_limiter.retry_after(ip)
+        if retry_after:
+            return retry_later('Too many registration attempts', retry_after)
+        register_ip_limiter.hit(ip)
+        
         # Check if user already exists
         if User.query.filter_by(email=data['email']).first():
             return jsonify({'message': 'Email already registered'}), 409
@@ -50,6 +85,9 @@ def register():
             'user': user.to_dict()
         }), 201
         
+    except HashingBusy:
+        db.session.rollback()
+        return retry_later('Server busy, please retry', 2, status=503)
     except Exception as e:
         db.session.rollback()
         return jsonify({'message': str(e)}), 500
@@ -62,12 +100,30 @@ def login():
         if not data.get('email') or not data.get('password'):
             return jsonify({'message': 'Email and password are required'}), 400
         
+        # Throttle per client IP and per account before any hashing work
+        ip = request.remote_addr or 'unknown'
+        email_key = data['email'].strip().lower()
+        login_ip_limiter, login_email_limiter = rate_limiter('login_ip'), rate_limiter('login_email')
+        retry_after = max(login_ip_limiter.retry_after(ip), login_email_limiter.retry_after(email_key))
+        if retry_after:
+            return retry_later('Too many login attempts', retry_after)
+        login_ip_limiter.hit(ip)
+        
         # Find user by email
         user = User.query.filter_by(email=data['email']).first()
         
         if not user or not user.check_password(data['password']):
+            login_email_limiter.hit(email_key)
             return jsonify({'message': 'Invalid email or password'}), 401
         
+        login_email_limiter.reset(email_key)
+        
+        # Upgrade hashes made with outdated parameters while we have the
+        # plaintext
+        if user.password_needs_rehash():
+            user.set_password(data['password'])
+            db.session.commit()
+        
         # Create access token
         access_token = create_access_token(
             identity=user.id,
@@ -79,49 +135,124 @@ def login():
             'user': user.to_dict()
         }), 200
         
+    except HashingBusy:
+        db.session.rollback()
+        return retry_later('Server busy, please retry', 2, status=503)
     except Exception as e:
+        db.session.rollback()
         return jsonify({'message': str(e)}), 500
 
 @auth_bp.route('/me', methods=['GET'])
 @jwt_required()
 def get_current_user():
     try:
-        user_id = get_jwt_identity()
+        # current_user comes from the per-process user cache; a matching
+        # If-None-Match is answered without a query or serialization
+        user = current_user
+        
+        if request.if_none_match.contains(user.etag):
+            response = current_app.response_class(status=304)
+        else:
+            response = jsonify(user.payload)
+        
+        response.set_etag(user.etag)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+        
+    except Exception as e:
+        return jsonify({'message': str(e)}), 500
+
+@auth_bp.route('/me', methods=['PUT'])
+@jwt_required()
+def update_current_user():
+    try:
+        user_id = current_user_id()
         user = User.query.get(user_id)
         
         if not user:
             return jsonify({'message': 'User not found'}), 404
         
+        data = request.get_json()
+        
+        # Preferences
+        if 'ai_cache_opt_out' in data:
+            user.ai_cache_opt_out = bool(data['ai_cache_opt_out'])
+        
+        db.session.commit()
+        
         return jsonify(user.to_dict()), 200
         
     except Exception as e:
+        db.session.rollback()
         return jsonify({'message': str(e)}), 500
 
 # ============== WORKOUT ROUTES ==============
 
+def workout_tree_query(include_exercises=True, include_sets=True):
+    # Load workouts with their exercises and sets in three fixed queries
+    # (workouts, exercises IN (...), sets IN (...)) instead of lazy loading
+    # each relationship per row.
+    if not include_exercises:
+        return Workout.query
+    if not include_sets:
+        return Workout.query.options(selectinload(Workout.exercises))
+    return Workout.query.options(
+        selectinload(Workout.exercises).selectinload(Exercise.sets)
+    )
+
+def parse_workout_include(args):
+    # ?include=exercises,sets selects nested data; omitted means everything
+    include = parse_csv_param(args.get('include'))
+    if include is None:
+        return True, True
+    include_sets = 'sets' in include
+    return include_sets or 'exercises' in include, include_sets
+
 @workout_bp.route('', methods=['GET'])
 @jwt_required()
+@conditional_get
+@read_replica
 def get_workouts():
     try:
-        user_id = get_jwt_identity()
-        workouts = Workout.query.filter_by(user_id=user_id).order_by(Workout.created_at.desc()).all()
-        
-        return jsonify([workout.to_dict() for workout in workouts]), 200
-        
+        user_id = current_user_id()
+        include_exercises, include_sets = parse_workout_include(request.args)
+        fields = parse_csv_param(request.args.get('fields'))
+        
+        # Read-only listing: plain row tuples, no ORM hydration
+        query = workout_select(user_id)
+        next_cursor = None
+        if wants_pagination(request.args):
+            rows, next_cursor = paginate_desc(
+                query, Workout.created_at, Workout.id, request.args, datetime.fromisoformat, fetch=fetch_rows
+            )
+        else:
+            rows = fetch_rows(query.order_by(Workout.created_at.desc(), Workout.id.desc()))
+        
+        items = [
+            select_fields(workout, fields)
+            for workout in serialize_workout_rows(rows, include_exercises, include_sets)
+        ]
+        return paginated_response(items, next_cursor, render=json_response), 200
+        
+    except PaginationError as e:
+        return jsonify({'message': str(e)}), 400
     except Exception as e:
         return jsonify({'message': str(e)}), 500
 
 @workout_bp.route('/<int:workout_id>', methods=['GET'])
 @jwt_required()
+@conditional_get
+@read_replica
 def get_workout(workout_id):
     try:
-        user_id = get_jwt_identity()
-        workout = Workout.query.filter_by(id=workout_id, user_id=user_id).first()
+        user_id = current_user_id()
+        # Row tuples like the listing, so archived sets are read through
+        rows = fetch_rows(workout_select(user_id).where(Workout.id == workout_id))
         
-        if not workout:
+        if not rows:
             return jsonify({'message': 'Workout not found'}), 404
         
-        return jsonify(workout.to_dict()), 200
+        return json_response(serialize_workout_rows(rows)[0]), 200
         
     except Exception as e:
         return jsonify({'message': str(e)}), 500
@@ -130,7 +261,7 @@ def get_workout(workout_id):
 @jwt_required()
 def create_workout():
     try:
-        user_id = get_jwt_identity()
+        user_id = current_user_id()
         data = request.get_json()
         
         # Validate required fields
@@ -147,33 +278,17 @@ def create_workout():
         db.session.add(workout)
         db.session.flush()  # Get the workout ID without committing
         
-        # Add exercises if provided
-        if data.get('exercises'):
-            for idx, exercise_data in enumerate(data['exercises']):
-                exercise = Exercise(
-                    workout_id=workout.id,
-                    name=exercise_data['name'],
-                    order=exercise_data.get('order', idx + 1),
-                    notes=exercise_data.get('notes', '')
-                )
-                
-                db.session.add(exercise)
-                db.session.flush()
-                
-                # Add sets if provided
-                if exercise_data.get('sets'):
-                    for set_data in exercise_data['sets']:
-                        set_obj = Set(
-                            exercise_id=exercise.id,
-                            set_number=set_data['setNumber'],
-                            reps=set_data['reps'],
-                            weight=set_data.get('weight', 0),
-                            completed=set_data.get('completed', False)
-                        )
-                        db.session.add(set_obj)
+        # Add exercises and sets in bulk
+        workout_id = workout.id
+        insert_exercise_tree(workout_id, data.get('exercises'))
+        record_workout(user_id, workout.created_at, workout_totals(workout_id))
+        training_data_changed(user_id, 'workout_created')
+        log_changes(user_id, WORKOUT, [workout_id])
         
         db.session.commit()
+        exercises_added(user_id, [exercise.get('name') for exercise in data.get('exercises') or []])
         
+        workout = workout_tree_query().filter_by(id=workout_id).first()
         return jsonify(workout.to_dict()), 201
         
     except Exception as e:
@@ -184,7 +299,7 @@ def create_workout():
 @jwt_required()
 def update_workout(workout_id):
     try:
-        user_id = get_jwt_identity()
+        user_id = current_user_id()
         workout = Workout.query.filter_by(id=workout_id, user_id=user_id).first()
         
         if not workout:
@@ -200,38 +315,25 @@ def update_workout(workout_id):
         
         workout.updated_at = datetime.utcnow()
         
-        # Handle exercises update (delete existing and recreate)
+        # Handle exercises update: apply only what changed unless the
+        # client asks for a full rewrite with ?mode=replace
         if 'exercises' in data:
-            # Delete existing exercises (cascades to sets)
-            Exercise.query.filter_by(workout_id=workout_id).delete()
-            
-            # Add new exercises
-            for idx, exercise_data in enumerate(data['exercises']):
-                exercise = Exercise(
-                    workout_id=workout.id,
-                    name=exercise_data['name'],
-                    order=exercise_data.get('order', idx + 1),
-                    notes=exercise_data.get('notes', '')
-                )
-                
-                db.session.add(exercise)
-                db.session.flush()
-                
-                # Add sets
-                if exercise_data.get('sets'):
-                    for set_data in exercise_data['sets']:
-                        set_obj = Set(
-                            exercise_id=exercise.id,
-                            set_number=set_data['setNumber'],
-                            reps=set_data['reps'],
-                            weight=set_data.get('weight', 0),
-                            completed=set_data.get('completed', False)
-                        )
-                        db.session.add(set_obj)
-        
+            restore_workout_sets(workout)
+            before = workout_totals(workout_id)
+            if request.args.get('mode') == 'replace':
+                replace_exercise_tree(workout_id, data['exercises'] or [])
+            else:
+                apply_exercise_diff(workout_id, data['exercises'] or [])
+            record_workout_change(user_id, workout.created_at, before, workout_totals(workout_id))
+        
+        training_data_changed(user_id, 'workout_updated')
+        log_changes(user_id, WORKOUT, [workout_id])
         db.session.commit()
-        
-        return jsonify(workout.to_dict()), 200
+
+        # Sets of an archived workout whose exercises were not edited are
+        # still in the archive
+        rows = fetch_rows(workout_select(user_id).where(Workout.id == workout_id))
+        return json_response(serialize_workout_rows(rows)[0]), 200
         
     except Exception as e:
         db.session.rollback()
@@ -241,32 +343,70 @@ def update_workout(workout_id):
 @jwt_required()
 def delete_workout(workout_id):
     try:
-        user_id = get_jwt_identity()
+        user_id = current_user_id()
         workout = Workout.query.filter_by(id=workout_id, user_id=user_id).first()
         
         if not workout:
             return jsonify({'message': 'Workout not found'}), 404
         
-        db.session.delete(workout)
+        # Large histories can take a while; "Prefer: respond-async" queues
+        # the delete and answers 202 with a job to poll
+        if prefers_async():
+            return job_accepted(enqueue('delete_workout', user_id, {'workout_id': workout_id}))
+        
+        remove_workout(user_id, workout)
         db.session.commit()
         
         return jsonify({'message': 'Workout deleted successfully'}), 200
         
+    except QueueFull:
+        return queue_full_response()
     except Exception as e:
         db.session.rollback()
         return jsonify({'message': str(e)}), 500
 
+def remove_workout(user_id, workout):
+    restore_workout_sets(workout)
+    record_workout(user_id, workout.created_at, workout_totals(workout.id), sign=-1)
+    training_data_changed(user_id, 'workout_deleted')
+    log_changes(user_id, WORKOUT, [workout.id], deleted=True)
+    delete_workout_tree(workout.id)
+
+@task('delete_workout', timeout=120)
+def delete_workout_job(user_id, workout_id):
+    workout = Workout.query.filter_by(id=workout_id, user_id=user_id).first()
+    if not workout:
+        # Deleted meanwhile, or by an earlier attempt
+        return {'deleted': False, 'workoutId': workout_id}
+    remove_workout(user_id, workout)
+    db.session.commit()
+    return {'deleted': True, 'workoutId': workout_id}
+
 # ============== CARDIO ROUTES ==============
 
 @cardio_bp.route('', methods=['GET'])
 @jwt_required()
+@conditional_get
+@read_replica
 def get_cardio_sessions():
     try:
-        user_id = get_jwt_identity()
-        sessions = CardioSession.query.filter_by(user_id=user_id).order_by(CardioSession.date.desc()).all()
-        
-        return jsonify([session.to_dict() for session in sessions]), 200
-        
+        user_id = current_user_id()
+        fields = parse_csv_param(request.args.get('fields'))
+        
+        # Read-only listing: plain row tuples, no ORM hydration
+        next_cursor = None
+        if wants_pagination(request.args):
+            rows, next_cursor = paginate_cardio(user_id, request.args)
+        else:
+            query = cardio_select(user_id)
+            sessions = query.selected_columns
+            rows = fetch_rows(query.order_by(sessions.date.desc(), sessions.id.desc()))
+        
+        items = [select_fields(session, fields) for session in serialize_cardio_rows(rows)]
+        return paginated_response(items, next_cursor, render=json_response), 200
+        
+    except PaginationError as e:
+        return jsonify({'message': str(e)}), 400
     except Exception as e:
         return jsonify({'message': str(e)}), 500
 
@@ -274,7 +414,7 @@ def get_cardio_sessions():
 @jwt_required()
 def create_cardio_session():
     try:
-        user_id = get_jwt_identity()
+        user_id = current_user_id()
         data = request.get_json()
         
         # Validate required fields
@@ -296,8 +436,13 @@ def create_cardio_session():
             avg_heart_rate=data.get('avg_heart_rate'),
             notes=data.get('notes', '')
         )
+        apply_cardio_metrics(session)
         
         db.session.add(session)
+        record_cardio(session)
+        training_data_changed(user_id, 'cardio_created')
+        db.session.flush()
+        log_changes(user_id, CARDIO, [session.id])
         db.session.commit()
         
         return jsonify(session.to_dict()), 201
@@ -312,12 +457,16 @@ def create_cardio_session():
 @jwt_required()
 def delete_cardio_session(session_id):
     try:
-        user_id = get_jwt_identity()
-        session = CardioSession.query.filter_by(id=session_id, user_id=user_id).first()
+        user_id = current_user_id()
+        session = (CardioSession.query.filter_by(id=session_id, user_id=user_id).first()
+                   or restore_cardio_session(user_id, session_id))
         
         if not session:
             return jsonify({'message': 'Cardio session not found'}), 404
         
+        record_cardio(session, sign=-1)
+        training_data_changed(user_id, 'cardio_deleted')
+        log_changes(user_id, CARDIO, [session.id], deleted=True)
         db.session.delete(session)
         db.session.commit()
         
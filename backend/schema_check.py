@@ -0,0 +1,44 @@
+import logging
+from sqlalchemy import inspect
+from models import db
+
+logger = logging.getLogger(__name__)
+
+
+def expected_indexes():
+    # Every named index declared on the models, per table
+    return {
+        table.name: {index.name for index in table.indexes}
+        for table in db.metadata.sorted_tables
+        if table.indexes
+    }
+
+
+def missing_indexes():
+    inspector = inspect(db.engine)
+    tables = set(inspector.get_table_names())
+    missing = []
+    for table, names in expected_indexes().items():
+        if table not in tables:
+            missing.extend((table, name) for name in sorted(names))
+            continue
+        present = {index['name'] for index in inspector.get_indexes(table)}
+        missing.extend((table, name) for name in sorted(names - present))
+    return missing
+
+
+def warn_missing_indexes():
+    """Log a warning for each model index the database does not have.
+
+    Never raises: a missing index is a performance problem, not a reason to
+    refuse to start.
+    """
+    try:
+        missing = missing_indexes()
+    except Exception as e:
+        logger.warning("Index check skipped: %s", e)
+        return []
+
+    for table, name in missing:
+        logger.warning("Missing index %s on %s - run 'flask db upgrade'", name, table)
+    return missing
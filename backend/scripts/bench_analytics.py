@@ -0,0 +1,91 @@
+"""Progression analytics on synthetic multi-year histories.
+
+Generates set rows shaped like analytics.load_sets() output (no database
+involved) and times loading them into a SetHistory, computing analytics
+cold, appending one new workout and recomputing, and a plain
+Python loop computing the weekly volume/e1RM part for comparison:
+
+    python scripts/bench_analytics.py --years 5 --workouts-per-week 4
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import analytics  # noqa: E402
+
+EXERCISES = ['Bench Press', 'Squat', 'Deadlift', 'Overhead Press', 'Barbell Row',
+             'Pull Up', 'Dip', 'Lunge', 'Romanian Deadlift', 'Curl']
+
+
+def synthetic_rows(years, workouts_per_week, exercises_per_workout, sets_per_exercise, seed=7):
+    rng = random.Random(seed)
+    start = datetime(2020, 1, 6, 18)
+    base = {name: rng.uniform(20, 120) for name in EXERCISES}
+    rows = []
+    set_id = workout_id = 0
+    for week in range(years * 52):
+        for session in range(workouts_per_week):
+            workout_id += 1
+            when = start + timedelta(weeks=week, days=session * 7 // workouts_per_week)
+            for name in rng.sample(EXERCISES, exercises_per_workout):
+                # Slow linear progression with noise
+                working = base[name] * (1 + week / 400) * rng.uniform(0.9, 1.05)
+                for _ in range(sets_per_exercise):
+                    set_id += 1
+                    rows.append((set_id, workout_id, when, name, rng.randint(3, 12), round(working, 1)))
+    return rows
+
+
+def python_weekly(rows):
+    # Baseline: the same weekly volume / best e1RM with dict loops
+    weekly = {}
+    for _, _, when, name, reps, weight in rows:
+        week = (when.date() - timedelta(days=when.weekday()))
+        bucket = weekly.setdefault((name, week), [0, 0.0, 0.0])
+        bucket[0] += 1
+        bucket[1] += reps * (weight or 0)
+        e1rm = weight if reps == 1 else weight * (1 + reps / 30)
+        bucket[2] = max(bucket[2], e1rm)
+    return weekly
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return (time.perf_counter() - start) * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Analytics benchmark')
+    parser.add_argument('--years', type=int, default=5)
+    parser.add_argument('--workouts-per-week', type=int, default=4)
+    parser.add_argument('--exercises', type=int, default=5)
+    parser.add_argument('--sets', type=int, default=4)
+    args = parser.parse_args()
+
+    rows = synthetic_rows(args.years, args.workouts_per_week, args.exercises, args.sets)
+    per_workout = args.exercises * args.sets
+    history_rows, new_workout = rows[:-per_workout], rows[-per_workout:]
+    print(f"{len(rows)} sets over {args.years} years")
+
+    history = analytics.SetHistory(version=0)
+    results = [
+        ('load arrays', *timed(history.extend, history_rows)),
+        ('compute (cold)', *timed(analytics.compute_analytics, history)),
+    ]
+    results.append(('append workout', *timed(history.extend, new_workout)))
+    results.append(('recompute', *timed(analytics.compute_analytics, history)))
+    results.append(('python weekly', *timed(python_weekly, rows)))
+
+    print(f"{'step':<18}{'ms':>10}")
+    for label, elapsed, _ in results:
+        print(f"{label:<18}{elapsed:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,297 @@
+"""API load test against a seeded local database.
+
+Seeds synthetic users with workout, set and cardio history, then drives the
+auth, workout, cardio, stats and chat endpoints from a pool of client
+threads at each concurrency level and reports throughput, p50/p95/p99
+latency, SQL statements per request (from the Server-Timing header) and
+errors per endpoint. Chat runs against scripts/fake_openai.py, started
+in-process.
+
+    python scripts/bench_api.py --users 20 --workouts 150 --cardio 100 --concurrency 1,8,32
+    python scripts/bench_api.py --database-url postgresql://localhost/fitness_bench
+
+The database's tables are dropped and recreated: point --database-url at a
+throwaway database. Without it a temporary SQLite file is used.
+
+Results can be stored and compared between runs:
+
+    python scripts/bench_api.py --save-baseline bench_baseline.json
+    python scripts/bench_api.py --baseline bench_baseline.json --tolerance 0.25
+
+A run fails (exit status 1) when any endpoint's p95 latency or throughput
+is worse than the baseline by more than the tolerance, when it issues more
+SQL statements per request, or when its error rate goes up.
+"""
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('LOGIN_RATE_LIMIT_IP', '1000000/1')
+os.environ.setdefault('LOGIN_RATE_LIMIT_EMAIL', '1000000/1')
+
+from flask_jwt_extended import create_access_token  # noqa: E402
+from app import create_app  # noqa: E402
+from cardio_metrics import cardio_metrics  # noqa: E402
+from config import Config  # noqa: E402
+from models import db, User, Workout, CardioSession  # noqa: E402
+from stats import rebuild_user_stats  # noqa: E402
+from workout_writer import insert_workouts  # noqa: E402
+import fake_openai  # noqa: E402
+
+PASSWORD = 'correct horse battery staple'
+EXERCISES = ['Bench Press', 'Squat', 'Deadlift', 'Overhead Press', 'Barbell Row',
+             'Pull-up', 'Dips', 'Lunges', 'Romanian Deadlift', 'Bicep Curls']
+ACTIVITIES = ['running', 'cycling', 'rowing', 'swimming']
+SERVER_TIMING_QUERIES = re.compile(r'desc="(\d+) queries"')
+
+
+# ============== SEEDING ==============
+
+def synthetic_workouts(rng, count, exercises, sets):
+    start = datetime(2022, 1, 3, 18)
+    return [
+        {
+            'name': f'Session {w + 1}',
+            'createdAt': start + timedelta(days=w * 2),
+            'exercises': [
+                {
+                    'name': name,
+                    'sets': [
+                        {'setNumber': s + 1, 'reps': rng.randint(3, 12), 'weight': round(rng.uniform(20, 140), 1)}
+                        for s in range(sets)
+                    ]
+                }
+                for name in rng.sample(EXERCISES, exercises)
+            ]
+        }
+        for w in range(count)
+    ]
+
+
+def synthetic_cardio(rng, user_id, count):
+    start = date(2022, 1, 4)
+    rows = []
+    for c in range(count):
+        distance = round(rng.uniform(2, 20), 2)
+        duration = rng.randint(15, 120)
+        heart_rate = rng.randint(120, 175)
+        rows.append(dict(
+            user_id=user_id, date=start + timedelta(days=c * 3), activity_type=rng.choice(ACTIVITIES),
+            duration_minutes=duration, distance=distance, distance_unit='km',
+            calories_burned=duration * 10, avg_heart_rate=heart_rate, notes='',
+            **cardio_metrics(distance, 'km', duration, heart_rate)
+        ))
+    return rows
+
+
+def seed(args):
+    rng = random.Random(args.seed)
+    db.drop_all()
+    db.create_all()
+
+    # One real hash shared by every user: seeding should not be hash-bound
+    template = User(username='template', email='template@example.com')
+    template.set_password(PASSWORD)
+
+    users = []
+    for u in range(args.users):
+        user = User(username=f'bench{u}', email=f'bench{u}@example.com', password_hash=template.password_hash)
+        db.session.add(user)
+        db.session.flush()
+        insert_workouts(user.id, synthetic_workouts(rng, args.workouts, args.exercises, args.sets))
+        if args.cardio:
+            db.session.execute(db.insert(CardioSession), synthetic_cardio(rng, user.id, args.cardio))
+        rebuild_user_stats(user.id)
+        db.session.commit()
+        users.append({'id': user.id, 'email': user.email, 'token': create_access_token(identity=user.id)})
+    return users
+
+
+# ============== SCENARIOS ==============
+
+def scenarios(users, workout_ids):
+    # Each scenario is (name, fn(client, i) -> response)
+    def auth(i):
+        return {'Authorization': f"Bearer {users[i % len(users)]['token']}"}
+
+    def login(client, i):
+        return client.post('/api/auth/login', json={'email': users[i % len(users)]['email'], 'password': PASSWORD})
+
+    def list_workouts(client, i):
+        return client.get('/api/workouts?limit=20', headers=auth(i))
+
+    def get_workout(client, i):
+        user_workouts = workout_ids[users[i % len(users)]['id']]
+        return client.get(f'/api/workouts/{user_workouts[i % len(user_workouts)]}', headers=auth(i))
+
+    def create_workout(client, i):
+        return client.post('/api/workouts', headers=auth(i), json={
+            'name': f'Bench workout {i}',
+            'exercises': [
+                {'name': name, 'sets': [{'setNumber': s + 1, 'reps': 8, 'weight': 60} for s in range(4)]}
+                for name in EXERCISES[:4]
+            ]
+        })
+
+    def list_cardio(client, i):
+        return client.get('/api/cardio?limit=20', headers=auth(i))
+
+    def create_cardio(client, i):
+        return client.post('/api/cardio', headers=auth(i), json={
+            'date': date.today().isoformat(), 'activity_type': 'running',
+            'duration_minutes': 30, 'distance': 5, 'avg_heart_rate': 150
+        })
+
+    def stats(client, i):
+        return client.get('/api/stats', headers=auth(i))
+
+    def chat(client, i):
+        return client.post('/api/chat', headers=auth(i), json={
+            'message': f'How should I progress my squat? ({i})', 'cache': False
+        })
+
+    return [
+        ('login', login), ('workouts.list', list_workouts), ('workouts.get', get_workout),
+        ('workouts.create', create_workout), ('cardio.list', list_cardio),
+        ('cardio.create', create_cardio), ('stats', stats), ('chat', chat),
+    ]
+
+
+def percentile(sorted_values, p):
+    return sorted_values[min(len(sorted_values) - 1, int(p / 100 * len(sorted_values)))]
+
+
+def drive(app, fn, concurrency, total):
+    local = threading.local()
+
+    def call(i):
+        client = getattr(local, 'client', None)
+        if client is None:
+            client = local.client = app.test_client()
+        start = time.perf_counter()
+        response = fn(client, i)
+        elapsed = time.perf_counter() - start
+        match = SERVER_TIMING_QUERIES.search(response.headers.get('Server-Timing', ''))
+        response.close()
+        return elapsed, int(match.group(1)) if match else 0, response.status_code < 400
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(call, range(total)))
+    wall = time.perf_counter() - started
+
+    latencies = sorted(elapsed for elapsed, _, _ in results)
+    return {
+        'rps': round(total / wall, 1),
+        'p50': round(percentile(latencies, 50) * 1000, 2),
+        'p95': round(percentile(latencies, 95) * 1000, 2),
+        'p99': round(percentile(latencies, 99) * 1000, 2),
+        'queries': round(sum(queries for _, queries, _ in results) / total, 2),
+        'errorRate': round(sum(1 for _, _, ok in results if not ok) / total, 4)
+    }
+
+
+# ============== BASELINE ==============
+
+def regressions(results, baseline, tolerance):
+    found = []
+    for key, current in results.items():
+        previous = baseline.get(key)
+        if previous is None:
+            continue
+        if current['p95'] > previous['p95'] * (1 + tolerance):
+            found.append(f"{key}: p95 {previous['p95']} -> {current['p95']} ms")
+        if current['rps'] < previous['rps'] * (1 - tolerance):
+            found.append(f"{key}: throughput {previous['rps']} -> {current['rps']} req/s")
+        if current['queries'] > previous['queries']:
+            found.append(f"{key}: queries/request {previous['queries']} -> {current['queries']}")
+        if current['errorRate'] > previous['errorRate']:
+            found.append(f"{key}: error rate {previous['errorRate']} -> {current['errorRate']}")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description='API load test')
+    parser.add_argument('--database-url', help='tables are dropped and recreated (default: temporary SQLite)')
+    parser.add_argument('--users', type=int, default=10)
+    parser.add_argument('--workouts', type=int, default=100, help='workouts per user')
+    parser.add_argument('--exercises', type=int, default=5, help='exercises per workout')
+    parser.add_argument('--sets', type=int, default=4, help='sets per exercise')
+    parser.add_argument('--cardio', type=int, default=50, help='cardio sessions per user')
+    parser.add_argument('--concurrency', default='1,8,32', help='comma-separated client thread counts')
+    parser.add_argument('--requests', type=int, default=200, help='requests per endpoint and level')
+    parser.add_argument('--endpoints', help='comma-separated subset of scenarios to run')
+    parser.add_argument('--llm-delay', type=float, default=0.002, help='fake LLM seconds per token')
+    parser.add_argument('--baseline', help='fail on regressions against this results file')
+    parser.add_argument('--save-baseline', help='write results to this file')
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    llm = fake_openai.serve(port=0, delay=args.llm_delay)
+    threading.Thread(target=llm.serve_forever, daemon=True).start()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        class BenchConfig(Config):
+            DEBUG = False
+            SQLALCHEMY_DATABASE_URI = args.database_url or f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+            OPENAI_API_KEY = 'bench'
+            OPENAI_BASE_URL = f'http://127.0.0.1:{llm.server_address[1]}/v1'
+            SLOW_REQUEST_MS = float('inf')
+
+        app = create_app(BenchConfig)
+        with app.app_context():
+            started = time.perf_counter()
+            users = seed(args)
+            workout_ids = {
+                user['id']: db.session.execute(
+                    db.select(Workout.id).where(Workout.user_id == user['id'])
+                ).scalars().all()
+                for user in users
+            }
+            print(f"Seeded {args.users} users x {args.workouts} workouts "
+                  f"({args.users * args.workouts * args.exercises * args.sets} sets), "
+                  f"{args.users * args.cardio} cardio sessions in {time.perf_counter() - started:.1f}s "
+                  f"on {db.engine.dialect.name}")
+
+        selected = set(args.endpoints.split(',')) if args.endpoints else None
+        levels = [int(level) for level in args.concurrency.split(',')]
+        results = {}
+        print(f"{'endpoint':<18}{'conc':>6}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+              f"{'queries':>9}{'errors':>8}")
+        for name, fn in scenarios(users, workout_ids):
+            if selected and name not in selected:
+                continue
+            for level in levels:
+                result = results[f'{name}@{level}'] = drive(app, fn, level, args.requests)
+                print(f"{name:<18}{level:>6}{result['rps']:>10.1f}{result['p50']:>10.1f}{result['p95']:>10.1f}"
+                      f"{result['p99']:>10.1f}{result['queries']:>9.1f}{result['errorRate']:>8.1%}")
+        llm.shutdown()
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f"Baseline written to {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            found = regressions(results, json.load(f), args.tolerance)
+        if found:
+            print(f"\n{len(found)} regressions against {args.baseline}:")
+            for line in found:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"\nNo regressions against {args.baseline}")
+
+
+if __name__ == '__main__':
+    main()
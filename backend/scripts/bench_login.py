@@ -0,0 +1,81 @@
+"""Login throughput under concurrent load.
+
+Drives POST /api/auth/login from a pool of client threads against a
+throwaway SQLite database and reports throughput and latency, once with
+hashing inline in the request thread and once through the process pool:
+
+    python scripts/bench_login.py --concurrency 16 --requests 200
+
+Rate limits are lifted for the run so every request reaches the hasher.
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('LOGIN_RATE_LIMIT_IP', '1000000/1')
+os.environ.setdefault('LOGIN_RATE_LIMIT_EMAIL', '1000000/1')
+
+from app import create_app  # noqa: E402
+from config import Config  # noqa: E402
+from models import db, User  # noqa: E402
+
+EMAIL = 'bench@example.com'
+PASSWORD = 'correct horse battery staple'
+
+
+def run(hash_workers, concurrency, total, db_path):
+    class BenchConfig(Config):
+        DEBUG = False
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{db_path}'
+        PASSWORD_HASH_WORKERS = hash_workers
+
+    app = create_app(BenchConfig)
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        user = User(username='bench', email=EMAIL)
+        user.set_password(PASSWORD)
+        db.session.add(user)
+        db.session.commit()
+
+    def login(_):
+        client = app.test_client()
+        start = time.perf_counter()
+        response = client.post('/api/auth/login', json={'email': EMAIL, 'password': PASSWORD})
+        assert response.status_code == 200, response.get_data(as_text=True)
+        return time.perf_counter() - start
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = sorted(pool.map(login, range(total)))
+    elapsed = time.perf_counter() - started
+
+    def pct(p):
+        return latencies[min(len(latencies) - 1, int(p / 100 * len(latencies)))] * 1000
+
+    label = 'inline' if not hash_workers else f'pool x{hash_workers}'
+    print(f"{label:<12}{total / elapsed:>10.1f}{pct(50):>10.1f}{pct(95):>10.1f}{pct(99):>10.1f}"
+          f"{statistics.mean(latencies) * 1000:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Concurrent login benchmark')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--hash-workers', type=int, default=os.cpu_count() or 2)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        print(f"{'mode':<12}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'mean ms':>10}")
+        run(0, args.concurrency, args.requests, db_path)
+        run(args.hash_workers, args.concurrency, args.requests, db_path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""Serialization cost of the workout listing.
+
+Builds one user with ~10k sets in an in-memory SQLite database and times
+the old path (ORM objects + to_dict + stdlib json) against the row-tuple
+path used by GET /api/workouts (serializers.py + orjson when installed):
+
+    python scripts/bench_serialization.py --workouts 200 --exercises 5 --sets 10
+
+Only query + encode time is measured; HTTP and compression are excluded.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app  # noqa: E402
+from config import Config  # noqa: E402
+from models import db, User, Workout, Exercise, Set  # noqa: E402
+from routes import workout_tree_query  # noqa: E402
+import serializers  # noqa: E402
+
+
+class BenchConfig(Config):
+    DEBUG = False
+    SQLALCHEMY_DATABASE_URI = 'sqlite://'
+
+
+def seed(workouts, exercises, sets):
+    user = User(username='bench', email='bench@example.com', password_hash='x')
+    db.session.add(user)
+    db.session.flush()
+
+    started = datetime(2024, 1, 1)
+    for w in range(workouts):
+        workout = Workout(user_id=user.id, name=f'Workout {w}', created_at=started + timedelta(days=w))
+        db.session.add(workout)
+        db.session.flush()
+        for e in range(exercises):
+            exercise = Exercise(workout_id=workout.id, name=f'Exercise {e}', order=e)
+            db.session.add(exercise)
+            db.session.flush()
+            db.session.add_all(
+                Set(exercise_id=exercise.id, set_number=s + 1, reps=8, weight=60.0 + s,
+                    performed_at=workout.created_at)
+                for s in range(sets)
+            )
+    db.session.commit()
+    return user.id
+
+
+def orm_path(user_id):
+    workouts = workout_tree_query(True, True).filter_by(user_id=user_id) \
+        .order_by(Workout.created_at.desc(), Workout.id.desc()).all()
+    return json.dumps([workout.to_dict() for workout in workouts]).encode()
+
+
+def row_path(user_id):
+    rows = serializers.fetch_rows(
+        serializers.workout_select(user_id).order_by(Workout.created_at.desc(), Workout.id.desc())
+    )
+    return serializers.dumps(serializers.serialize_workout_rows(rows))
+
+
+def measure(fn, user_id, repeat):
+    timings = []
+    for _ in range(repeat):
+        # Fresh session each run so the ORM path pays for hydration every time
+        db.session.expunge_all()
+        start = time.perf_counter()
+        body = fn(user_id)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000, len(body)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Workout listing serialization benchmark')
+    parser.add_argument('--workouts', type=int, default=200)
+    parser.add_argument('--exercises', type=int, default=5)
+    parser.add_argument('--sets', type=int, default=10)
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    app = create_app(BenchConfig)
+    with app.app_context():
+        db.create_all()
+        user_id = seed(args.workouts, args.exercises, args.sets)
+        total_sets = args.workouts * args.exercises * args.sets
+
+        # Both paths must produce the same document
+        assert json.loads(orm_path(user_id)) == json.loads(row_path(user_id))
+
+        encoder = 'orjson' if serializers.orjson is not None else 'json'
+        print(f"{total_sets} sets, encoder: {encoder}")
+        print(f"{'path':<16}{'median ms':>12}{'bytes':>12}")
+        for label, fn in (('orm + json', orm_path), ('rows + ' + encoder, row_path)):
+            elapsed, size = measure(fn, user_id, args.repeat)
+            print(f"{label:<16}{elapsed:>12.1f}{size:>12}")
+
+
+if __name__ == '__main__':
+    main()
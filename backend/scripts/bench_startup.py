@@ -0,0 +1,57 @@
+"""Measure cold start: importing the app module, building the app with
+create_app() and serving the first request.
+
+Each sample runs in a fresh interpreter so module caches do not hide the
+import cost:
+
+    python scripts/bench_startup.py --runs 10
+
+Uses an in-memory SQLite database unless DATABASE_URL is set.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = """
+import json, time
+t0 = time.perf_counter()
+import app as app_module
+t1 = time.perf_counter()
+app = app_module.create_app()
+t2 = time.perf_counter()
+response = app.test_client().get('/api/health')
+t3 = time.perf_counter()
+assert response.status_code == 200, response.status_code
+print(json.dumps({'import': t1 - t0, 'create_app': t2 - t1, 'first_request': t3 - t2, 'total': t3 - t0}))
+"""
+
+
+def sample():
+    env = dict(os.environ)
+    env.setdefault('DATABASE_URL', 'sqlite://')
+    output = subprocess.run(
+        [sys.executable, '-c', PROBE], cwd=BACKEND_DIR, env=env,
+        check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Cold import + first request benchmark')
+    parser.add_argument('--runs', type=int, default=10)
+    args = parser.parse_args()
+
+    samples = [sample() for _ in range(args.runs)]
+    print(f"{'phase':<15}{'median ms':>12}{'min ms':>10}{'max ms':>10}")
+    for phase in ('import', 'create_app', 'first_request', 'total'):
+        values = [s[phase] * 1000 for s in samples]
+        print(f"{phase:<15}{statistics.median(values):>12.1f}{min(values):>10.1f}{max(values):>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
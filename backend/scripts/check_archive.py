@@ -0,0 +1,160 @@
+"""Archival checks against a local SQLite database.
+
+Imports a user's history spanning several years, archives everything
+before 2024 and checks that:
+
+    - old sets and cardio sessions leave the hot tables
+    - listings, single workouts, stats, analytics and exports still return
+      the archived rows
+    - reads that start after the boundary use the hot tables only, and
+      first pages of the listings never touch the archive tables
+    - editing an archived workout or deleting an archived cardio session
+      works, and the changed rows are back in the hot tables
+
+    python scripts/check_archive.py
+
+On Postgres the same flow also moves whole monthly partitions; run
+`flask db upgrade` and `flask archive-history --before YYYY-MM-DD` against
+a copy of the database and compare the same endpoints.
+"""
+import json
+import os
+import sys
+import tempfile
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask_jwt_extended import create_access_token  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+from app import create_app  # noqa: E402
+from archive import CARDIO, SETS, archive_history, cardio_source, set_source  # noqa: E402
+from config import Config  # noqa: E402
+from models import db, User  # noqa: E402
+from stats import rebuild_user_stats  # noqa: E402
+
+BOUNDARY = date(2024, 1, 1)
+YEARS = (2021, 2022, 2023, 2024, 2025)
+
+
+def count(table):
+    return db.session.execute(db.select(db.func.count()).select_from(table)).scalar()
+
+
+def main():
+    failures = 0
+
+    def check(label, condition):
+        nonlocal failures
+        print(f"{'PASS' if condition else 'FAIL'}  {label}")
+        failures += not condition
+
+    with tempfile.TemporaryDirectory() as tmp:
+        class CheckConfig(Config):
+            DEBUG = False
+            SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(tmp, 'archive.db')}"
+
+        app = create_app(CheckConfig)
+        client = app.test_client()
+        with app.app_context():
+            db.create_all()
+            user = User(username='archive', email='archive@example.com', password_hash='x')
+            db.session.add(user)
+            db.session.commit()
+            headers = {'Authorization': f'Bearer {create_access_token(identity=user.id)}'}
+
+        workouts = [
+            {'name': f'Squats {year}', 'createdAt': f'{year}-06-01T18:00:00',
+             'exercises': [{'name': 'Squat', 'sets': [{'setNumber': n, 'reps': 5, 'weight': 100 + year % 10}
+                                                     for n in (1, 2, 3)]}]}
+            for year in YEARS
+        ]
+        cardio = [
+            {'date': f'{year}-07-01', 'activityType': 'running', 'durationMinutes': 30, 'distance': 5}
+            for year in YEARS
+        ]
+        for path, records in (('/api/workouts/import', workouts), ('/api/cardio/import', cardio)):
+            client.post(path, headers=headers, content_type='application/x-ndjson',
+                        data='\n'.join(json.dumps(record) for record in records))
+
+        def get(path):
+            response = client.get(path, headers=headers)
+            assert response.status_code == 200, response.get_data(as_text=True)
+            return response.get_json()
+
+        def reads_archive(path):
+            statements = []
+
+            def record(conn, cursor, statement, parameters, context, executemany):
+                statements.append(statement)
+
+            with app.app_context():
+                engine = db.engine
+            event.listen(engine, 'before_cursor_execute', record)
+            try:
+                get(path)
+            finally:
+                event.remove(engine, 'before_cursor_execute', record)
+            return any(table.name in statement for statement in statements for table in (SETS.cold, CARDIO.cold))
+
+        listing = get('/api/workouts')
+        sessions = get('/api/cardio')
+        stats = get('/api/stats')['totals']
+        records = get('/api/stats/records')
+        analytics = client.get('/api/workouts/analytics', headers=headers).get_data()
+        export = client.get('/api/cardio/export', headers=headers).get_data()
+
+        with app.app_context():
+            report = archive_history(BOUNDARY, wait=False)
+            check('old sets are archived', report['sets']['rows'] == 9 and count(SETS.cold) == 9)
+            check('old cardio sessions are archived', report['cardio_sessions']['rows'] == 3 and count(CARDIO.cold) == 3)
+            check('recent rows stay hot', count(SETS.hot) == 6 and count(CARDIO.hot) == 2)
+            check('reads after the boundary use the hot tables',
+                  set_source(BOUNDARY) is SETS.hot and cardio_source(date(2025, 1, 1)) is CARDIO.hot)
+
+        check('the workout listing reads archived sets through', get('/api/workouts') == listing)
+        old_workout = next(workout for workout in listing if workout['name'] == 'Squats 2021')
+        check('a single archived workout has its sets',
+              len(get(f"/api/workouts/{old_workout['id']}")['exercises'][0]['sets']) == 3)
+        check('the cardio listing includes archived sessions', get('/api/cardio') == sessions)
+        page = client.get('/api/cardio?limit=4', headers=headers)
+        next_page = client.get(f"/api/cardio?limit=4&cursor={page.headers['X-Next-Cursor']}", headers=headers)
+        check('paging crosses into the archive', page.get_json() + next_page.get_json() == sessions)
+        check('first pages read the hot tables only',
+              not reads_archive('/api/workouts?limit=2') and not reads_archive('/api/cardio?limit=1'))
+        check('a page past the boundary reads the archive', reads_archive('/api/cardio?limit=3'))
+        check('records include archived history', get('/api/stats/records') == records)
+        check('analytics include archived history',
+              client.get('/api/workouts/analytics', headers=headers).get_data() == analytics)
+        check('exports include archived sessions', client.get('/api/cardio/export', headers=headers).get_data() == export)
+        summary = get('/api/stats/cardio?from=2024-01-01')
+        check('a recent date range sees recent sessions only', summary[0]['sessions'] == 2)
+
+        response = client.put(f"/api/workouts/{old_workout['id']}", headers=headers, json={'name': 'Old squats'})
+        check('renaming an archived workout keeps its sets',
+              response.status_code == 200 and len(response.get_json()['exercises'][0]['sets']) == 3)
+        response = client.put(f"/api/workouts/{old_workout['id']}", headers=headers, json={
+            'exercises': [{'name': 'Squat', 'sets': [{'setNumber': 1, 'reps': 8, 'weight': 90}]}]
+        })
+        check('an archived workout can be edited',
+              response.status_code == 200 and len(response.get_json()['exercises'][0]['sets']) == 1)
+        old_session = next(session for session in sessions if session['date'] == '2021-07-01')
+        response = client.delete(f"/api/cardio/{old_session['id']}", headers=headers)
+        check('an archived cardio session can be deleted', response.status_code == 200)
+        with app.app_context():
+            check('edited rows are restored to the hot tables', count(SETS.cold) == 6 and count(CARDIO.cold) == 2)
+
+        totals = get('/api/stats')['totals']
+        with app.app_context():
+            rebuild_user_stats(user.id)
+            db.session.commit()
+        check('rebuilt stats match the incremental ones', get('/api/stats')['totals'] == totals)
+        check('stats reflect the edits',
+              totals['sets'] == stats['sets'] - 2 and totals['cardioSessions'] == stats['cardioSessions'] - 1)
+
+    print(f"\n{failures} failed" if failures else "\nAll checks passed")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""Replica routing checks against two local SQLite databases.
+
+The "replica" is a file copy of the primary, refreshed by hand to stand in
+for replication, with one workout renamed so responses show which database
+served them. Checks that:
+
+    - reads go to a fresh replica
+    - a user's reads stay on the primary right after they write
+    - a replica that has not caught up with the user's writes is skipped
+    - an unreachable replica is marked down and reads fall back
+
+    python scripts/check_replicas.py
+
+Against Postgres, set DATABASE_URL and DATABASE_REPLICA_URLS to a primary
+and a streaming standby; GET /api/health lists each replica as up or down.
+"""
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask_jwt_extended import create_access_token  # noqa: E402
+from app import create_app  # noqa: E402
+from config import Config  # noqa: E402
+from models import db, User  # noqa: E402
+from replicas import get_router  # noqa: E402
+
+REPLICA_MARKER = 'served by replica'
+
+
+def replicate(primary_path, replica_path, engine):
+    # Snapshot the primary and tag its first workout
+    engine.dispose()
+    shutil.copyfile(primary_path, replica_path)
+    with sqlite3.connect(replica_path) as conn:
+        conn.execute("UPDATE workouts SET name = ? WHERE id = (SELECT MIN(id) FROM workouts)", (REPLICA_MARKER,))
+
+
+def main():
+    failures = 0
+
+    def check(label, condition):
+        nonlocal failures
+        print(f"{'PASS' if condition else 'FAIL'}  {label}")
+        failures += not condition
+
+    with tempfile.TemporaryDirectory() as tmp:
+        primary_path = os.path.join(tmp, 'primary.db')
+        replica_path = os.path.join(tmp, 'replica.db')
+
+        class CheckConfig(Config):
+            DEBUG = False
+            SQLALCHEMY_DATABASE_URI = f'sqlite:///{primary_path}'
+            SQLALCHEMY_BINDS = {'replica0': f'sqlite:///{replica_path}'}
+
+        app = create_app(CheckConfig)
+        client = app.test_client()
+        with app.app_context():
+            db.create_all()
+            user = User(username='replica', email='replica@example.com', password_hash='x')
+            db.session.add(user)
+            db.session.commit()
+            headers = {'Authorization': f'Bearer {create_access_token(identity=user.id)}'}
+            replica_engine = db.engines['replica0']
+            router = get_router()
+            router.sticky_seconds = 0.5
+
+        def workout_names():
+            response = client.get('/api/workouts', headers=headers)
+            assert response.status_code == 200, response.get_data(as_text=True)
+            return [workout['name'] for workout in response.get_json()]
+
+        client.post('/api/workouts', headers=headers, json={'name': 'First', 'exercises': []})
+        time.sleep(router.sticky_seconds)
+        replicate(primary_path, replica_path, replica_engine)
+        check('reads go to a fresh replica', workout_names() == [REPLICA_MARKER])
+
+        client.post('/api/workouts', headers=headers, json={'name': 'Second', 'exercises': []})
+        check('reads stick to the primary after a write', workout_names() == ['Second', 'First'])
+
+        time.sleep(router.sticky_seconds)
+        check('a lagging replica is skipped', workout_names() == ['Second', 'First'])
+
+        replicate(primary_path, replica_path, replica_engine)
+        check('a caught-up replica is used again', workout_names() == ['Second', REPLICA_MARKER])
+
+        # A directory where the database file should be: every connect fails
+        replica_engine.dispose()
+        os.remove(replica_path)
+        os.mkdir(replica_path)
+        check('an unreachable replica falls back to the primary', workout_names() == ['Second', 'First'])
+        health = client.get('/api/health').get_json()
+        check('the unreachable replica is reported down', health.get('replicas') == {'replica0': 'down'})
+
+    print(f"\n{failures} failed" if failures else "\nAll checks passed")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""Minimal OpenAI-compatible chat completions server for local testing.
+
+Run it and point the backend at it:
+
+    python scripts/fake_openai.py --port 8001 --delay 0.05
+    OPENAI_API_KEY=test OPENAI_BASE_URL=http://localhost:8001/v1 python app.py
+
+Answers POST /v1/chat/completions with a canned reply, either as a single
+JSON body or as an SSE stream when the request sets "stream": true. The
+per-token delay simulates upstream latency.
+"""
+import argparse
+import json
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+REPLY = ("Aim for 3 to 5 working sets per exercise in the 6-12 rep range, "
+         "resting 60-90 seconds, and add load once you hit the top of the range.")
+
+
+def make_handler(delay):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, format, *args):
+            pass
+
+        def do_POST(self):
+            if not self.path.endswith('/chat/completions'):
+                self.send_error(404)
+                return
+
+            length = int(self.headers.get('Content-Length', 0))
+            body = json.loads(self.rfile.read(length) or b'{}')
+            completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+            model = body.get('model', 'fake-model')
+            tokens = [word + ' ' for word in REPLY.split(' ')]
+
+            if body.get('stream'):
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/event-stream')
+                self.send_header('Cache-Control', 'no-cache')
+                self.send_header('Connection', 'close')
+                self.end_headers()
+                for token in tokens:
+                    time.sleep(delay)
+                    chunk = {
+                        'id': completion_id, 'object': 'chat.completion.chunk',
+                        'created': int(time.time()), 'model': model,
+                        'choices': [{'index': 0, 'delta': {'content': token}, 'finish_reason': None}]
+                    }
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                    self.wfile.flush()
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.wfile.flush()
+                self.close_connection = True
+                return
+
+            time.sleep(delay * len(tokens))
+            payload = json.dumps({
+                'id': completion_id, 'object': 'chat.completion',
+                'created': int(time.time()), 'model': model,
+                'choices': [{
+                    'index': 0, 'finish_reason': 'stop',
+                    'message': {'role': 'assistant', 'content': ''.join(tokens).strip()}
+                }],
+                'usage': {'prompt_tokens': 0, 'completion_tokens': len(tokens), 'total_tokens': len(tokens)}
+            }).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+    return Handler
+
+
+def serve(port=8001, delay=0.02):
+    return ThreadingHTTPServer(('127.0.0.1', port), make_handler(delay))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--port', type=int, default=8001)
+    parser.add_argument('--delay', type=float, default=0.02, help='seconds per streamed token')
+    args = parser.parse_args()
+
+    print(f"Fake OpenAI server on http://127.0.0.1:{args.port}/v1")
+    serve(args.port, args.delay).serve_forever()
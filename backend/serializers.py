@@ -0,0 +1,198 @@
+import json
+import time
+from datetime import date, datetime
+from flask import current_app
+from archive import CARDIO, SETS, archive_reaches, cardio_source
+from instrumentation import record_serialization
+from models import db, Workout, Exercise, CardioSession
+from pagination import paginate_desc
+
+try:
+    import orjson
+except ImportError:  # optional: stdlib json is used as a fallback
+    orjson = None
+
+# Read-only serialization straight from row tuples.
+#
+# The list endpoints select plain columns instead of hydrating ORM objects,
+# assemble the nested workout -> exercises -> sets structure with dict
+# lookups, and encode with orjson when it is installed. Output matches the
+# models' to_dict() shapes. Timestamps are left as date/datetime objects
+# for the encoder to format. Sets and cardio sessions are read from the hot
+# tables, and through to the archive tables only when the rows asked for
+# can be there (archive.py).
+
+IN_CHUNK_SIZE = 1000
+
+WORKOUT_COLUMNS = (
+    Workout.id, Workout.user_id, Workout.name, Workout.description,
+    Workout.created_at, Workout.updated_at
+)
+CARDIO_COLUMNS = (
+    CardioSession.id, CardioSession.user_id, CardioSession.date, CardioSession.activity_type,
+    CardioSession.duration_minutes, CardioSession.distance, CardioSession.distance_unit,
+    CardioSession.calories_burned, CardioSession.avg_heart_rate, CardioSession.notes,
+    CardioSession.created_at, CardioSession.distance_m, CardioSession.pace_s_per_km,
+    CardioSession.speed_kmh, CardioSession.training_load
+)
+
+
+def workout_select(user_id):
+    return db.select(*WORKOUT_COLUMNS).where(Workout.user_id == user_id)
+
+
+def cardio_select(user_id, since=None):
+    # Columns come from the hot table or the hot/archive union: filter and
+    # order through the statement's selected_columns
+    sessions = cardio_source(since)
+    return db.select(*(sessions.c[column.key] for column in CARDIO_COLUMNS)).where(sessions.c.user_id == user_id)
+
+
+def fetch_rows(statement):
+    return db.session.execute(statement).all()
+
+
+def paginate_cardio(user_id, args):
+    """One page of the cardio listing, newest first: (rows, next_cursor).
+
+    Pages come from the hot table alone while they end at or after the
+    archive boundary; only a page reaching back past it is read again
+    from the hot/archive union.
+    """
+    def page(since):
+        query = cardio_select(user_id, since)
+        sessions = query.selected_columns
+        return paginate_desc(query, sessions.date, sessions.id, args, date.fromisoformat, fetch=fetch_rows)
+
+    rows, next_cursor = page(date.max)
+    # A short page may continue in the archive: unknown key
+    if archive_reaches(CARDIO, rows[-1].date if next_cursor else None):
+        rows, next_cursor = page(None)
+    return rows, next_cursor
+
+
+def _chunks(ids):
+    for start in range(0, len(ids), IN_CHUNK_SIZE):
+        yield ids[start:start + IN_CHUNK_SIZE]
+
+
+def serialize_workout_rows(rows, include_exercises=True, include_sets=True):
+    workouts = [
+        {
+            'id': row[0],
+            'userId': row[1],
+            'name': row[2],
+            'description': row[3],
+            'createdAt': row[4],
+            'updatedAt': row[5]
+        }
+        for row in rows
+    ]
+    if not include_exercises or not workouts:
+        return workouts
+
+    by_workout = {}
+    for workout in workouts:
+        workout['exercises'] = by_workout[workout['id']] = []
+
+    exercises = {}
+    for ids in _chunks(list(by_workout)):
+        for exercise_id, workout_id, name, order, notes in db.session.execute(
+            db.select(Exercise.id, Exercise.workout_id, Exercise.name, Exercise.order, Exercise.notes)
+            .where(Exercise.workout_id.in_(ids))
+            .order_by(Exercise.order)
+        ):
+            exercise = {
+                'id': exercise_id,
+                'workoutId': workout_id,
+                'name': name,
+                'order': order,
+                'notes': notes
+            }
+            if include_sets:
+                exercise['sets'] = []
+            exercises[exercise_id] = exercise
+            by_workout[workout_id].append(exercise)
+
+    if include_sets and exercises:
+        # performed_at is the workout's created_at: bounding it by the
+        # workouts' range lets Postgres skip every other partition. Only the
+        # exercises of workouts from before the archive boundary are also
+        # looked up in the archive
+        times = [workout['createdAt'] for workout in workouts]
+        span = (min(times), max(times)) if all(times) else None
+        created_at = {workout['id']: workout['createdAt'] for workout in workouts}
+        archived = [
+            exercise_id for exercise_id, exercise in exercises.items()
+            if archive_reaches(SETS, created_at[exercise['workoutId']])
+        ]
+        for sets, exercise_ids in ((SETS.hot, list(exercises)), (SETS.cold, archived)):
+            for ids in _chunks(exercise_ids):
+                query = (
+                    db.select(sets.c.id, sets.c.exercise_id, sets.c.set_number, sets.c.reps, sets.c.weight,
+                              sets.c.completed, sets.c.rest_seconds, sets.c.notes)
+                    .where(sets.c.exercise_id.in_(ids))
+                    .order_by(sets.c.set_number)
+                )
+                if span:
+                    query = query.where(sets.c.performed_at.between(*span))
+                for set_id, exercise_id, set_number, reps, weight, completed, rest_seconds, notes in db.session.execute(query):
+                    exercises[exercise_id]['sets'].append({
+                        'id': set_id,
+                        'exerciseId': exercise_id,
+                        'setNumber': set_number,
+                        'reps': reps,
+                        'weight': weight,
+                        'completed': completed,
+                        'restSeconds': rest_seconds,
+                        'notes': notes
+                    })
+        # An archive run moving rows in batches can leave a workout's sets
+        # split between the tables
+        for exercise_id in archived:
+            exercises[exercise_id]['sets'].sort(key=lambda row: row['setNumber'])
+
+    return workouts
+
+
+def serialize_cardio_rows(rows):
+    return [
+        {
+            'id': row[0],
+            'userId': row[1],
+            'date': row[2],
+            'activityType': row[3],
+            'durationMinutes': row[4],
+            'distance': row[5],
+            'distanceUnit': row[6],
+            'caloriesBurned': row[7],
+            'avgHeartRate': row[8],
+            'notes': row[9],
+            'createdAt': row[10],
+            'distanceM': row[11],
+            'paceSecondsPerKm': row[12],
+            'speedKmh': row[13],
+            'trainingLoad': row[14]
+        }
+        for row in rows
+    ]
+
+
+def _default(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(payload):
+    started = time.perf_counter()
+    try:
+        if orjson is not None:
+            return orjson.dumps(payload, default=_default, option=orjson.OPT_NON_STR_KEYS)
+        return json.dumps(payload, default=_default, separators=(',', ':')).encode()
+    finally:
+        record_serialization(time.perf_counter() - started)
+
+
+def json_response(payload, status=200):
+    return current_app.response_class(dumps(payload), status=status, mimetype='application/json')
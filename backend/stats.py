@@ -0,0 +1,391 @@
+from flask import Blueprint, jsonify, request
+from flask_jwt_extended import jwt_required
+from datetime import date, datetime, timedelta
+from sqlalchemy import func, update
+from sqlalchemy.exc import IntegrityError
+from archive import cardio_source, set_source
+from cardio_metrics import distance_m
+from replicas import read_replica
+from http_cache import bump_data_version, conditional_get
+from jobs import QueueFull, enqueue, job_accepted, queue_full_response, task
+from models import db, User, Workout, Exercise, Set, UserStatsRollup
+from user_cache import current_user_id
+
+stats_bp = Blueprint('stats', __name__, url_prefix='/api/stats')
+
+# Number of recent buckets returned by GET /api/stats
+RECENT_WEEKS = 12
+RECENT_MONTHS = 12
+
+TOTAL_PERIOD_START = date(1970, 1, 1)
+
+ROLLUP_COLUMNS = (
+    'workout_count', 'set_count', 'total_reps', 'total_volume',
+    'cardio_count', 'cardio_minutes', 'cardio_calories', 'cardio_distance_km'
+)
+
+# ============== ROLLUP MAINTENANCE ==============
+#
+# Write routes call the record_* helpers inside their own transaction, so the
+# rollup rows commit or roll back together with the change they describe.
+
+def week_start(day):
+    return day - timedelta(days=day.weekday())
+
+def month_start(day):
+    return day.replace(day=1)
+
+def months_back(day, months):
+    month_index = day.year * 12 + day.month - 1 - months
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+def period_buckets(day):
+    if isinstance(day, datetime):
+        day = day.date()
+    return [
+        ('week', week_start(day)),
+        ('month', month_start(day)),
+        ('total', TOTAL_PERIOD_START)
+    ]
+
+def distance_km(distance, unit):
+    return distance_m(distance, unit) / 1000
+
+def apply_delta(user_id, day, **deltas):
+    deltas = {column: value for column, value in deltas.items() if value}
+    if not deltas:
+        return
+
+    for period, period_start in period_buckets(day):
+        bucket = (
+            (UserStatsRollup.user_id == user_id)
+            & (UserStatsRollup.period == period)
+            & (UserStatsRollup.period_start == period_start)
+        )
+        increment = {
+            column: getattr(UserStatsRollup, column) + value
+            for column, value in deltas.items()
+        }
+        result = db.session.execute(update(UserStatsRollup).where(bucket).values(**increment))
+        if result.rowcount:
+            continue
+
+        # First write into this bucket. A concurrent request may create the
+        # row first, in which case we fall back to the increment.
+        try:
+            with db.session.begin_nested():
+                row = UserStatsRollup(user_id=user_id, period=period, period_start=period_start)
+                for column in ROLLUP_COLUMNS:
+                    setattr(row, column, deltas.get(column, 0))
+                db.session.add(row)
+        except IntegrityError:
+            db.session.execute(update(UserStatsRollup).where(bucket).values(**increment))
+
+def workout_totals(workout_id):
+    # Set count, reps and volume of one workout, aggregated in the database.
+    # Hot table only: writers restore an archived workout's sets first
+    row = db.session.execute(
+        db.select(
+            func.count(Set.id),
+            func.coalesce(func.sum(Set.reps), 0),
+            func.coalesce(func.sum(Set.reps * func.coalesce(Set.weight, 0)), 0)
+        )
+        .select_from(Set)
+        .join(Exercise, Exercise.id == Set.exercise_id)
+        .where(Exercise.workout_id == workout_id)
+    ).one()
+    return {'set_count': row[0], 'total_reps': row[1], 'total_volume': float(row[2])}
+
+def record_workout(user_id, created_at, totals, sign=1, count_workout=True):
+    apply_delta(
+        user_id, created_at,
+        workout_count=sign if count_workout else 0,
+        **{column: sign * value for column, value in totals.items()}
+    )
+
+def record_workout_change(user_id, created_at, before, after):
+    apply_delta(user_id, created_at, **{
+        column: after[column] - before[column] for column in after
+    })
+
+def record_cardio(session, sign=1):
+    apply_delta(
+        session.user_id, session.date,
+        cardio_count=sign,
+        cardio_minutes=sign * (session.duration_minutes or 0),
+        cardio_calories=sign * (session.calories_burned or 0),
+        cardio_distance_km=sign * distance_km(session.distance, session.distance_unit)
+    )
+
+def rebuild_user_stats(user_id):
+    """Recompute all rollup rows for a user from the raw tables.
+
+    Used for backfills and repairs. The heavy lifting is a per-day GROUP BY
+    in the database; days are then folded into week/month/total buckets.
+    """
+    buckets = {}
+
+    def add(day, **values):
+        if isinstance(day, str):
+            day = date.fromisoformat(day)
+        for key in period_buckets(day):
+            bucket = buckets.setdefault(key, dict.fromkeys(ROLLUP_COLUMNS, 0))
+            for column, value in values.items():
+                bucket[column] += value or 0
+
+    # Full history, archived rows included
+    sets = set_source()
+    sessions = cardio_source()
+
+    workout_day = func.date(Workout.created_at)
+    per_workout = (
+        db.select(
+            Workout.id.label('workout_id'),
+            workout_day.label('day'),
+            func.count(sets.c.id).label('sets'),
+            func.coalesce(func.sum(sets.c.reps), 0).label('reps'),
+            func.coalesce(func.sum(sets.c.reps * func.coalesce(sets.c.weight, 0)), 0).label('volume')
+        )
+        .select_from(Workout)
+        .outerjoin(Exercise, Exercise.workout_id == Workout.id)
+        .outerjoin(sets, sets.c.exercise_id == Exercise.id)
+        .where(Workout.user_id == user_id)
+        .group_by(Workout.id, workout_day)
+        .subquery()
+    )
+    for row in db.session.execute(
+        db.select(
+            per_workout.c.day,
+            func.count(),
+            func.sum(per_workout.c.sets),
+            func.sum(per_workout.c.reps),
+            func.sum(per_workout.c.volume)
+        ).group_by(per_workout.c.day)
+    ):
+        add(row[0], workout_count=row[1], set_count=row[2], total_reps=row[3], total_volume=float(row[4]))
+
+    for row in db.session.execute(
+        db.select(
+            sessions.c.date,
+            sessions.c.distance_unit,
+            func.count(),
+            func.sum(sessions.c.duration_minutes),
+            func.sum(sessions.c.calories_burned),
+            func.sum(sessions.c.distance)
+        )
+        .where(sessions.c.user_id == user_id)
+        .group_by(sessions.c.date, sessions.c.distance_unit)
+    ):
+        add(row[0], cardio_count=row[2], cardio_minutes=row[3], cardio_calories=row[4],
+            cardio_distance_km=distance_km(row[5], row[1]))
+
+    db.session.execute(db.delete(UserStatsRollup).where(UserStatsRollup.user_id == user_id))
+    db.session.add_all(
+        UserStatsRollup(user_id=user_id, period=period, period_start=period_start, **values)
+        for (period, period_start), values in buckets.items()
+    )
+
+@task('rebuild_user_stats', timeout=600, max_attempts=2)
+def rebuild_user_stats_job(user_id):
+    rebuild_user_stats(user_id)
+    # Repaired rollups must not be served from cached responses
+    bump_data_version(user_id, 'stats_rebuilt')
+    db.session.commit()
+    return {'rebuilt': True}
+
+def rebuild_all_user_stats():
+    user_ids = db.session.execute(db.select(User.id)).scalars().all()
+    for user_id in user_ids:
+        rebuild_user_stats(user_id)
+        db.session.commit()
+    return len(user_ids)
+
+# ============== STATS ROUTES ==============
+
+@stats_bp.route('', methods=['GET'])
+@jwt_required()
+@conditional_get
+@read_replica
+def get_stats():
+    try:
+        user_id = current_user_id()
+        today = date.today()
+        oldest_week = week_start(today) - timedelta(weeks=RECENT_WEEKS - 1)
+        oldest_month = months_back(today, RECENT_MONTHS - 1)
+
+        # Bounded by RECENT_WEEKS + RECENT_MONTHS + 1 rows however long the
+        # user's history is
+        rows = UserStatsRollup.query.filter(
+            UserStatsRollup.user_id == user_id,
+            db.or_(
+                UserStatsRollup.period == 'total',
+                db.and_(UserStatsRollup.period == 'week', UserStatsRollup.period_start >= oldest_week),
+                db.and_(UserStatsRollup.period == 'month', UserStatsRollup.period_start >= oldest_month)
+            )
+        ).order_by(UserStatsRollup.period_start.desc()).all()
+
+        total = next((row for row in rows if row.period == 'total'), None)
+        empty = UserStatsRollup(period='total', period_start=TOTAL_PERIOD_START,
+                                **dict.fromkeys(ROLLUP_COLUMNS, 0))
+
+        return jsonify({
+            'totals': (total or empty).to_dict(),
+            'weekly': [row.to_dict() for row in rows if row.period == 'week'],
+            'monthly': [row.to_dict() for row in rows if row.period == 'month']
+        }), 200
+
+    except Exception as e:
+        return jsonify({'message': str(e)}), 500
+
+@stats_bp.route('/exercises', methods=['GET'])
+@jwt_required()
+@read_replica
+def get_exercise_volume():
+    try:
+        user_id = current_user_id()
+        sets = set_source()
+        volume = func.coalesce(func.sum(sets.c.reps * func.coalesce(sets.c.weight, 0)), 0)
+
+        rows = db.session.execute(
+            db.select(
+                Exercise.name,
+                func.count(sets.c.id),
+                func.coalesce(func.sum(sets.c.reps), 0),
+                volume
+            )
+            .select_from(sets)
+            .join(Exercise, Exercise.id == sets.c.exercise_id)
+            .join(Workout, Workout.id == Exercise.workout_id)
+            .where(Workout.user_id == user_id)
+            .group_by(Exercise.name)
+            .order_by(volume.desc())
+        ).all()
+
+        return jsonify([
+            {'exercise': name, 'sets': set_count, 'reps': reps, 'volume': float(total)}
+            for name, set_count, reps, total in rows
+        ]), 200
+
+    except Exception as e:
+        return jsonify({'message': str(e)}), 500
+
+@stats_bp.route('/records', methods=['GET'])
+@jwt_required()
+@read_replica
+def get_personal_records():
+    try:
+        user_id = current_user_id()
+        sets = set_source()
+        sessions = cardio_source()
+
+        lifts = db.session.execute(
+            db.select(
+                Exercise.name,
+                func.max(sets.c.weight),
+                func.max(sets.c.reps),
+                func.max(sets.c.reps * func.coalesce(sets.c.weight, 0))
+            )
+            .select_from(sets)
+            .join(Exercise, Exercise.id == sets.c.exercise_id)
+            .join(Workout, Workout.id == Exercise.workout_id)
+            .where(Workout.user_id == user_id)
+            .group_by(Exercise.name)
+            .order_by(Exercise.name)
+        ).all()
+
+        cardio = db.session.execute(
+            db.select(
+                sessions.c.activity_type,
+                func.max(sessions.c.distance),
+                func.max(sessions.c.duration_minutes),
+                func.max(sessions.c.calories_burned)
+            )
+            .where(sessions.c.user_id == user_id)
+            .group_by(sessions.c.activity_type)
+            .order_by(sessions.c.activity_type)
+        ).all()
+
+        return jsonify({
+            'lifts': [
+                {'exercise': name, 'maxWeight': max_weight, 'maxReps': max_reps, 'bestSetVolume': best_set}
+                for name, max_weight, max_reps, best_set in lifts
+            ],
+            'cardio': [
+                {'activityType': activity, 'longestDistance': distance,
+                 'longestDurationMinutes': duration, 'mostCalories': calories}
+                for activity, distance, duration, calories in cardio
+            ]
+        }), 200
+
+    except Exception as e:
+        return jsonify({'message': str(e)}), 500
+
+@stats_bp.route('/cardio', methods=['GET'])
+@jwt_required()
+@conditional_get
+@read_replica
+def get_cardio_summary():
+    try:
+        start = date.fromisoformat(request.args['from']) if request.args.get('from') else None
+        end = date.fromisoformat(request.args['to']) if request.args.get('to') else None
+    except ValueError:
+        return jsonify({'message': 'Invalid date format. Use YYYY-MM-DD'}), 400
+
+    try:
+        user_id = current_user_id()
+        # Archived sessions are only read when the range starts before the
+        # archive boundary
+        sessions = cardio_source(start)
+        filters = [sessions.c.user_id == user_id]
+        if start:
+            filters.append(sessions.c.date >= start)
+        if end:
+            filters.append(sessions.c.date <= end)
+        if request.args.get('activity'):
+            filters.append(sessions.c.activity_type == request.args['activity'])
+
+        # Aggregates over the precomputed metric columns only; no per-row
+        # unit handling
+        minutes = func.sum(sessions.c.duration_minutes)
+        rows = db.session.execute(
+            db.select(
+                sessions.c.activity_type,
+                func.count(),
+                minutes,
+                func.sum(sessions.c.distance_m),
+                func.sum(sessions.c.training_load),
+                func.min(sessions.c.pace_s_per_km)
+            )
+            .where(*filters)
+            .group_by(sessions.c.activity_type)
+            .order_by(minutes.desc())
+        ).all()
+
+        return jsonify([
+            {
+                'activityType': activity,
+                'sessions': session_count,
+                'minutes': total_minutes or 0,
+                'distanceKm': round((metres or 0) / 1000, 2),
+                'trainingLoad': round(load or 0, 1),
+                'avgPaceSecondsPerKm': round(total_minutes * 60 / (metres / 1000), 1) if metres else None,
+                'bestPaceSecondsPerKm': best_pace
+            }
+            for activity, session_count, total_minutes, metres, load, best_pace in rows
+        ]), 200
+
+    except Exception as e:
+        return jsonify({'message': str(e)}), 500
+
+@stats_bp.route('/rebuild', methods=['POST'])
+@jwt_required()
+def rebuild_stats():
+    # Recomputes every rollup from raw history: always queued, poll the job
+    try:
+        return job_accepted(enqueue('rebuild_user_stats', current_user_id()))
+
+    except QueueFull:
+        return queue_full_response()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'message': str(e)}), 500
@@ -0,0 +1,311 @@
+import json
+from datetime import datetime, timezone
+from flask import Blueprint, current_app, jsonify, request
+from flask_jwt_extended import jwt_required
+from sqlalchemy.exc import IntegrityError
+from archive import restore_cardio_session, restore_workout_sets
+from change_log import CARDIO, WORKOUT, changes_since, log_changes
+from changes import training_data_changed
+from models import db, User, Workout, CardioSession, SyncOperation
+from routes import remove_workout
+from serializers import cardio_select, dumps, fetch_rows, json_response, serialize_cardio_rows, serialize_workout_rows, workout_select
+from stats import record_cardio, record_workout_change, workout_totals
+from transfer import RecordError, validate_cardio, validate_workout, write_cardio, write_workouts
+from workout_writer import apply_exercise_diff
+from user_cache import current_user_id
+
+sync_bp = Blueprint('sync', __name__, url_prefix='/api/sync')
+
+# Batched offline sync for the workout logger.
+#
+# POST /api/sync carries every edit the client made since its last sync as
+# a list of operations, each with a client-generated opId (the idempotency
+# key) and the client's timestamp of the edit:
+#
+#   {"syncToken": "41", "operations": [
+#       {"opId": "...", "type": "workout.create", "clientId": "tmp-1",
+#        "clientTimestamp": "...", "data": {...}},
+#       {"opId": "...", "type": "workout.update", "clientId": "tmp-1", "data": {...}},
+#       {"opId": "...", "type": "cardio.delete", "id": 17}]}
+#
+# Operations apply in order in one transaction, together with a row per
+# opId in sync_operations; a retried batch replays the stored results
+# instead of writing twice. Later operations may address an entity created
+# offline by its clientId. Updates are last-writer-wins on the client's
+# edit time: an update older than the server's copy is reported as a
+# conflict with the current server version and not applied. Deletes always
+# win.
+#
+# The response has one result per operation, and every workout and cardio
+# session changed since the request's syncToken (tombstones for deletes,
+# from change_log.py) with the new token to send next time. Without a token
+# the client gets a full snapshot.
+
+MAX_KEY_LENGTH = 64
+
+
+class OperationRejected(ValueError):
+    pass
+
+
+def _client_timestamp(value):
+    if value is None:
+        return None
+    try:
+        parsed = datetime.fromisoformat(str(value))
+    except ValueError:
+        raise OperationRejected('clientTimestamp must be an ISO 8601 timestamp')
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    # A fast client clock must not win every later conflict
+    return min(parsed, datetime.utcnow())
+
+
+def _key(value, field):
+    if value is None:
+        return None
+    value = str(value)
+    if not value or len(value) > MAX_KEY_LENGTH:
+        raise OperationRejected(f'{field} must be 1-{MAX_KEY_LENGTH} characters')
+    return value
+
+
+class Batch:
+    """One sync request being applied for a user."""
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.client_ids = {}
+        # Created by this batch: stamped with server time, so not comparable
+        # to the client's edit times
+        self.created = set()
+
+    def resolve(self, op, entity):
+        # Server id, or the id created earlier for the op's clientId
+        if op.get('id') is not None:
+            try:
+                return int(op['id'])
+            except (TypeError, ValueError):
+                raise OperationRejected('id must be an integer')
+        client_id = _key(op.get('clientId'), 'clientId')
+        if client_id is None:
+            raise OperationRejected('id or clientId is required')
+        if (entity, client_id) not in self.client_ids:
+            self.client_ids[(entity, client_id)] = db.session.execute(
+                db.select(SyncOperation.entity_id)
+                .where(SyncOperation.user_id == self.user_id, SyncOperation.client_id == client_id,
+                       SyncOperation.entity == entity, SyncOperation.entity_id.is_not(None))
+                .limit(1)
+            ).scalar()
+        entity_id = self.client_ids[(entity, client_id)]
+        if entity_id is None:
+            raise OperationRejected(f'Unknown clientId {client_id}')
+        return entity_id
+
+    def apply(self, op, client_ts):
+        handler = OPERATIONS.get(op.get('type'))
+        if handler is None:
+            raise OperationRejected(f"Unknown operation type {op.get('type')!r}")
+        return handler(self, op, client_ts)
+
+    # ============== OPERATIONS ==============
+
+    def create_workout(self, op, client_ts):
+        data = dict(op.get('data') or {})
+        data.setdefault('createdAt', op.get('clientTimestamp'))
+        try:
+            workout = validate_workout(data)
+        except RecordError as e:
+            raise OperationRejected(str(e))
+        workout_id = write_workouts(self.user_id, [workout])[0]
+        self._created(op, WORKOUT, workout_id)
+        return {'status': 'applied', 'id': workout_id}
+
+    def update_workout(self, op, client_ts):
+        workout_id = self.resolve(op, WORKOUT)
+        workout = Workout.query.filter_by(id=workout_id, user_id=self.user_id).first()
+        if not workout:
+            return {'status': 'conflict', 'reason': 'deleted', 'id': workout_id}
+        stale = client_ts and workout.updated_at and workout.updated_at > client_ts
+        if stale and (WORKOUT, workout_id) not in self.created:
+            return {'status': 'conflict', 'reason': 'stale', 'id': workout_id,
+                    'current': load_workouts(self.user_id, [workout_id])[0]}
+
+        data = op.get('data') or {}
+        try:
+            validated = validate_workout(dict(data, name=data.get('name') or workout.name))
+        except RecordError as e:
+            raise OperationRejected(str(e))
+        workout.name = validated['name']
+        if 'description' in data:
+            workout.description = validated['description']
+        workout.updated_at = client_ts or datetime.utcnow()
+
+        if 'exercises' in data:
+            restore_workout_sets(workout)
+            before = workout_totals(workout_id)
+            apply_exercise_diff(workout_id, validated['exercises'])
+            record_workout_change(self.user_id, workout.created_at, before, workout_totals(workout_id))
+        training_data_changed(self.user_id, 'workout_updated')
+        log_changes(self.user_id, WORKOUT, [workout_id])
+        return {'status': 'applied', 'id': workout_id}
+
+    def delete_workout(self, op, client_ts):
+        workout_id = self.resolve(op, WORKOUT)
+        workout = Workout.query.filter_by(id=workout_id, user_id=self.user_id).first()
+        if workout:
+            remove_workout(self.user_id, workout)
+        return {'status': 'applied', 'id': workout_id}
+
+    def create_cardio(self, op, client_ts):
+        data = dict(op.get('data') or {})
+        data.setdefault('createdAt', op.get('clientTimestamp'))
+        try:
+            session = validate_cardio(data)
+        except RecordError as e:
+            raise OperationRejected(str(e))
+        session_id = write_cardio(self.user_id, [session])[0]
+        self._created(op, CARDIO, session_id)
+        return {'status': 'applied', 'id': session_id}
+
+    def delete_cardio(self, op, client_ts):
+        session_id = self.resolve(op, CARDIO)
+        session = (CardioSession.query.filter_by(id=session_id, user_id=self.user_id).first()
+                   or restore_cardio_session(self.user_id, session_id))
+        if session:
+            record_cardio(session, sign=-1)
+            training_data_changed(self.user_id, 'cardio_deleted')
+            log_changes(self.user_id, CARDIO, [session_id], deleted=True)
+            db.session.delete(session)
+        return {'status': 'applied', 'id': session_id}
+
+    def _created(self, op, entity, entity_id):
+        self.created.add((entity, entity_id))
+        client_id = _key(op.get('clientId'), 'clientId')
+        if client_id is not None:
+            self.client_ids[(entity, client_id)] = entity_id
+
+
+OPERATIONS = {
+    'workout.create': Batch.create_workout,
+    'workout.update': Batch.update_workout,
+    'workout.delete': Batch.delete_workout,
+    'cardio.create': Batch.create_cardio,
+    'cardio.delete': Batch.delete_cardio,
+}
+
+
+def load_workouts(user_id, workout_ids=None):
+    query = workout_select(user_id)
+    if workout_ids is not None:
+        query = query.where(Workout.id.in_(workout_ids))
+    return serialize_workout_rows(fetch_rows(query.order_by(Workout.created_at.desc(), Workout.id.desc())))
+
+
+def load_cardio(user_id, session_ids=None):
+    query = cardio_select(user_id)
+    sessions = query.selected_columns
+    if session_ids is not None:
+        query = query.where(sessions.id.in_(session_ids))
+    return serialize_cardio_rows(fetch_rows(query.order_by(sessions.date.desc(), sessions.id.desc())))
+
+
+def apply_operations(user_id, op_ids, operations):
+    """Apply a batch and record it; the caller commits."""
+    stored = {
+        op_id: json.loads(result)
+        for op_id, result in db.session.execute(
+            db.select(SyncOperation.op_id, SyncOperation.result)
+            .where(SyncOperation.user_id == user_id, SyncOperation.op_id.in_(op_ids))
+        )
+    }
+
+    batch = Batch(user_id)
+    results = []
+    for op_id, op in zip(op_ids, operations):
+        if op_id in stored:
+            results.append(dict(stored[op_id], opId=op_id, replayed=True))
+            continue
+        try:
+            result = batch.apply(op, _client_timestamp(op.get('clientTimestamp')))
+        except OperationRejected as e:
+            result = {'status': 'rejected', 'message': str(e)}
+
+        stored[op_id] = result
+        entity = op.get('type', '').split('.')[0]
+        db.session.add(SyncOperation(
+            user_id=user_id, op_id=op_id, entity=entity[:20],
+            client_id=op.get('clientId') if op.get('type', '').endswith('.create') else None,
+            entity_id=result.get('id'), result=dumps(result).decode()
+        ))
+        results.append(dict(result, opId=op_id))
+    return results
+
+
+def delta(user_id, sync_token):
+    # Read the version first: anything committed after it is sent again next
+    # time rather than missed
+    version = db.session.execute(db.select(User.data_version).where(User.id == user_id)).scalar()
+    if sync_token is None:
+        return {
+            'full': True,
+            'workouts': load_workouts(user_id),
+            'cardio': load_cardio(user_id),
+            'deleted': {'workouts': [], 'cardio': []},
+            'syncToken': str(version)
+        }
+
+    changed = {WORKOUT: [], CARDIO: []}
+    deleted = {WORKOUT: [], CARDIO: []}
+    for entity, entity_id, is_deleted in changes_since(user_id, sync_token):
+        (deleted if is_deleted else changed)[entity].append(entity_id)
+    return {
+        'full': False,
+        'workouts': load_workouts(user_id, changed[WORKOUT]) if changed[WORKOUT] else [],
+        'cardio': load_cardio(user_id, changed[CARDIO]) if changed[CARDIO] else [],
+        'deleted': {'workouts': deleted[WORKOUT], 'cardio': deleted[CARDIO]},
+        'syncToken': str(version)
+    }
+
+
+# ============== SYNC ROUTES ==============
+
+@sync_bp.route('', methods=['POST'])
+@jwt_required()
+def sync():
+    data = request.get_json() or {}
+    operations = data.get('operations') or []
+    if not isinstance(operations, list) or not all(isinstance(op, dict) for op in operations):
+        return jsonify({'message': 'operations must be a list of objects'}), 400
+    max_operations = current_app.config['SYNC_MAX_OPERATIONS']
+    if len(operations) > max_operations:
+        return jsonify({'message': f'At most {max_operations} operations per sync'}), 413
+    try:
+        sync_token = int(data['syncToken']) if data.get('syncToken') is not None else None
+        op_ids = [_key(op.get('opId'), 'opId') for op in operations]
+    except (TypeError, ValueError) as e:
+        return jsonify({'message': str(e) if isinstance(e, OperationRejected) else 'Invalid syncToken'}), 400
+    if None in op_ids or len(set(op_ids)) != len(op_ids):
+        return jsonify({'message': 'Every operation needs a unique opId'}), 400
+
+    user_id = current_user_id()
+    # A concurrent retry of the same batch loses the race on the opId unique
+    # constraint; the second pass replays what the first one stored
+    for attempt in range(2):
+        try:
+            results = apply_operations(user_id, op_ids, operations)
+            db.session.commit()
+            break
+        except IntegrityError:
+            db.session.rollback()
+            if attempt:
+                return jsonify({'message': 'Sync conflict, please retry'}), 409
+        except Exception as e:
+            db.session.rollback()
+            return jsonify({'message': str(e)}), 500
+
+    try:
+        return json_response(dict(delta(user_id, sync_token), results=results))
+
+    except Exception as e:
+        return jsonify({'message': str(e)}), 500
@@ -0,0 +1,62 @@
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask_jwt_extended import create_access_token  # noqa: E402
+from app import create_app  # noqa: E402
+from config import Config  # noqa: E402
+from models import db, User  # noqa: E402
+
+
+class TestConfig(Config):
+    TESTING = True
+    DEBUG = False
+    SQLALCHEMY_DATABASE_URI = 'sqlite://'
+    SQLALCHEMY_BINDS = {}
+
+
+@pytest.fixture
+def app():
+    app = create_app(TestConfig)
+    with app.app_context():
+        db.create_all()
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def headers(app):
+    with app.app_context():
+        user = User(username='test', email='test@example.com', password_hash='x')
+        db.session.add(user)
+        db.session.commit()
+        return {'Authorization': f'Bearer {create_access_token(identity=user.id)}'}
+
+
+def import_records(client, headers, path, records):
+    """POST records to an NDJSON import endpoint."""
+    response = client.post(path, headers=headers, content_type='application/x-ndjson',
+                           data='\n'.join(json.dumps(record) for record in records))
+    assert response.status_code == 200, response.get_data(as_text=True)
+    return response.get_json()
+
+
+def workout_records(count, exercises=2, sets=3, year=2025):
+    return [
+        {'name': f'Workout {w}', 'createdAt': f'{year}-01-01T10:00:00',
+         'exercises': [{'name': f'Exercise {e}', 'sets': [{'setNumber': s + 1, 'reps': 8, 'weight': 60}
+                                                          for s in range(sets)]}
+                       for e in range(exercises)]}
+        for w in range(count)
+    ]
@@ -0,0 +1,74 @@
+import pytest
+
+import analytics
+from changes import training_data_changed
+from conftest import import_records, workout_records
+from models import db, Set, User
+
+
+@pytest.fixture(autouse=True)
+def history_cache():
+    # Per process, so it outlives each test's database
+    analytics.history_cache.clear()
+    yield
+    analytics.history_cache.clear()
+
+
+def user_id(client, headers):
+    return client.get('/api/auth/me', headers=headers).get_json()['id']
+
+
+def test_committed_append_extends_the_cached_history(app, client, headers):
+    uid = user_id(client, headers)
+    import_records(client, headers, '/api/workouts/import', workout_records(1))
+    with app.app_context():
+        history = analytics.get_history(uid)
+        assert len(history.set_id) == 6
+
+    import_records(client, headers, '/api/workouts/import', workout_records(1))
+    with app.app_context():
+        extended = analytics.get_history(uid)
+        assert extended is history
+        assert len(extended.set_id) == 12
+
+
+def test_rolled_back_append_does_not_hide_other_changes(app, client, headers):
+    uid = user_id(client, headers)
+    import_records(client, headers, '/api/workouts/import', workout_records(1))
+    with app.app_context():
+        history = analytics.get_history(uid)
+        assert len(history.set_id) == 6
+
+        training_data_changed(uid, 'workout_created')
+        db.session.rollback()
+
+        # Another worker deletes a set: same version number the rolled back
+        # append would have committed as
+        db.session.execute(db.delete(Set).where(Set.id == int(history.set_id[0])))
+        db.session.execute(db.update(User).where(User.id == uid).values(data_version=User.data_version + 1))
+        db.session.commit()
+
+        reloaded = analytics.get_history(uid)
+        assert reloaded is not history
+        assert len(reloaded.set_id) == 5
+
+
+def test_append_committed_with_lower_set_ids_is_not_lost(app, client, headers):
+    uid = user_id(client, headers)
+    import_records(client, headers, '/api/workouts/import', workout_records(1))
+    with app.app_context():
+        # Leave room below the cached ids, as a write that inserted first
+        # but commits last would
+        db.session.execute(db.update(Set).values(id=Set.id + 1000))
+        db.session.commit()
+        history = analytics.get_history(uid)
+        assert len(history.set_id) == 6
+
+    import_records(client, headers, '/api/workouts/import', workout_records(1))
+    with app.app_context():
+        db.session.execute(db.update(Set).where(Set.id > 1006).values(id=Set.id - 1000))
+        db.session.commit()
+
+        extended = analytics.get_history(uid)
+        assert extended is history
+        assert sorted(extended.set_id.tolist()) == [7, 8, 9, 10, 11, 12, 1001, 1002, 1003, 1004, 1005, 1006]
@@ -0,0 +1,90 @@
+from types import SimpleNamespace
+
+import pytest
+
+from flask_jwt_extended import create_access_token
+
+import chat
+from models import db, User
+
+
+class FakeClient:
+    """Stands in for the OpenAI client; counts completion calls."""
+
+    def __init__(self):
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def with_options(self, **options):
+        return self
+
+    def create(self, **kwargs):
+        self.calls += 1
+        message = SimpleNamespace(content=f'reply {self.calls}')
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+def ask(client, headers, **data):
+    response = client.post('/api/chat', headers=headers, json=dict({'message': 'How many sets?'}, **data))
+    assert response.status_code == 200, response.get_data(as_text=True)
+    return response.get_json()
+
+
+@pytest.fixture
+def fake(app):
+    fake = FakeClient()
+    app.config['OPENAI_API_KEY'] = 'test'
+    app.extensions['ai_client'] = fake
+    return fake
+
+
+@pytest.fixture
+def other_headers(app):
+    with app.app_context():
+        other = User(username='other', email='other@example.com', password_hash='x')
+        db.session.add(other)
+        db.session.commit()
+        return {'Authorization': f'Bearer {create_access_token(identity=other.id)}'}
+
+
+def test_default_requests_hit_the_cache(client, headers, fake):
+    assert not ask(client, headers).get('cached')
+    assert ask(client, headers).get('cached')
+    assert fake.calls == 1
+
+    stats = client.get('/api/chat/cache/stats', headers=headers).get_json()
+    assert (stats['hits'], stats['misses']) == (1, 1)
+
+
+def test_shared_replies_only_without_user_context(client, headers, other_headers, fake):
+    # General questions are shared between users
+    ask(client, headers, context=False)
+    assert ask(client, other_headers, context=False, message='how many SETS').get('cached')
+    assert fake.calls == 1
+
+    # The training digest is personal: cached for its user only
+    assert not ask(client, headers).get('cached')
+    assert not ask(client, other_headers).get('cached')
+    assert fake.calls == 3
+
+
+def test_opting_out_skips_shared_replies_only(client, headers, fake):
+    response = client.put('/api/auth/me', headers=headers, json={'ai_cache_opt_out': True})
+    assert response.status_code == 200
+
+    ask(client, headers, context=False)
+    assert not ask(client, headers, context=False).get('cached')
+    ask(client, headers)
+    assert ask(client, headers).get('cached')
+    assert fake.calls == 3
+
+
+def test_context_errors_answer_json(client, headers, fake, monkeypatch):
+    def broken_digest(user_id):
+        raise RuntimeError('database is down')
+
+    monkeypatch.setattr(chat, 'get_digest', broken_digest)
+    response = client.post('/api/chat', headers=headers, json={'message': 'How many sets?'})
+    assert response.status_code == 500
+    assert response.get_json() == {'error': 'Failed to get response'}
+    assert fake.calls == 0
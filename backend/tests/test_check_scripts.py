@@ -0,0 +1,19 @@
+"""Runs the scripts/check_*.py end-to-end checks as part of the suite.
+
+Each script builds its own app and temporary databases and exits non-zero
+when a check fails; its PASS/FAIL report is shown on failure.
+"""
+import os
+import subprocess
+import sys
+
+import pytest
+
+SCRIPTS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'scripts')
+
+
+@pytest.mark.parametrize('script', sorted(name for name in os.listdir(SCRIPTS) if name.startswith('check_')))
+def test_check_script(script):
+    result = subprocess.run([sys.executable, os.path.join(SCRIPTS, script)],
+                            capture_output=True, text=True, timeout=300)
+    assert result.returncode == 0, result.stdout + result.stderr
@@ -0,0 +1,39 @@
+import pytest
+
+from app import create_app
+from conftest import TestConfig
+from models import db
+
+
+class StrictConfig(TestConfig):
+    SYNC_MAX_OPERATIONS = 1
+    REGISTER_RATE_LIMIT_IP = '1/60'
+
+
+@pytest.fixture
+def strict_client():
+    app = create_app(StrictConfig)
+    with app.app_context():
+        db.create_all()
+    return app.test_client()
+
+
+def test_config_subclass_overrides_sync_limit(strict_client):
+    token = strict_client.post('/api/auth/register', json={
+        'username': 'strict', 'email': 'strict@example.com', 'password': 'secret'
+    }).get_json()['access_token']
+    operations = [{'opId': str(n), 'type': 'cardio.delete', 'id': n} for n in (1, 2)]
+    response = strict_client.post('/api/sync', headers={'Authorization': f'Bearer {token}'},
+                                  json={'operations': operations})
+    assert response.status_code == 413
+
+
+def test_config_subclass_overrides_rate_limits(strict_client):
+    response = strict_client.post('/api/auth/register', json={
+        'username': 'again', 'email': 'again@example.com', 'password': 'secret'
+    })
+    assert response.status_code == 201
+    response = strict_client.post('/api/auth/register', json={
+        'username': 'twice', 'email': 'twice@example.com', 'password': 'secret'
+    })
+    assert response.status_code == 429
@@ -0,0 +1,47 @@
+from datetime import datetime, timedelta
+from unittest import mock
+
+import digest
+from conftest import import_records, workout_records
+from models import db, TrainingDigest, Workout
+
+
+def user_id(client, headers):
+    return client.get('/api/auth/me', headers=headers).get_json()['id']
+
+
+def test_digest_is_rebuilt_on_a_new_day(app, client, headers):
+    uid = user_id(client, headers)
+    recent = datetime.utcnow() - timedelta(days=1)
+    import_records(client, headers, '/api/workouts/import', workout_records(1, year=recent.year))
+    with app.app_context():
+        db.session.execute(db.update(Workout).values(created_at=recent))
+        db.session.commit()
+        assert 'Strength: 1 workouts' in digest.get_digest(uid)
+
+        # Nothing logged since: a later day moves the window past the workout
+        later = datetime.utcnow() + timedelta(days=digest.DIGEST_WINDOW_DAYS + 1)
+        with mock.patch.object(digest, 'datetime', wraps=datetime) as clock:
+            clock.utcnow.return_value = later
+            assert 'Strength: 0 workouts' in digest.get_digest(uid)
+
+
+def test_invalidation_while_building_is_not_lost(app, client, headers):
+    uid = user_id(client, headers)
+    with app.app_context():
+        digest.get_digest(uid)
+        db.session.execute(db.update(TrainingDigest).values(stale=True))
+        db.session.commit()
+
+        build = digest.build_digest
+
+        def build_during_write(*args):
+            content = build(*args)
+            digest.invalidate_digest(uid, 'workout_created')
+            db.session.commit()
+            return content
+
+        with mock.patch.object(digest, 'build_digest', build_during_write):
+            digest.get_digest(uid)
+        assert db.session.get(TrainingDigest, uid).stale
+
@@ -0,0 +1,23 @@
+from conftest import import_records, workout_records
+from models import db, User
+
+
+def test_training_writes_change_the_etag(client, headers):
+    etag = client.get('/api/workouts', headers=headers).headers['ETag']
+    assert client.get('/api/workouts', headers=dict(headers, **{'If-None-Match': etag})).status_code == 304
+
+    import_records(client, headers, '/api/workouts/import', workout_records(1))
+    response = client.get('/api/workouts', headers=dict(headers, **{'If-None-Match': etag}))
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+
+def test_training_writes_leave_the_profile_untouched(app, client, headers):
+    def updated_at():
+        with app.app_context():
+            return db.session.execute(db.select(User.updated_at)).scalar()
+
+    before = updated_at()
+    import_records(client, headers, '/api/workouts/import', workout_records(1))
+    client.post('/api/workouts', headers=headers, json={'name': 'Legs', 'exercises': []})
+    assert updated_at() == before
@@ -0,0 +1,14 @@
+import pytest
+
+from jobs import DatabaseJobQueue, QueueFull, enqueue
+
+
+def test_enqueue_caps_unfinished_jobs_per_user(app, client, headers, monkeypatch):
+    user_id = client.get('/api/auth/me', headers=headers).get_json()['id']
+    # Jobs stay queued: nothing runs them in this process
+    monkeypatch.setitem(app.extensions, 'job_queue', DatabaseJobQueue(app))
+    monkeypatch.setitem(app.config, 'JOB_USER_MAX_PENDING', 1)
+    with app.app_context():
+        enqueue('rebuild_user_stats', user_id)
+        with pytest.raises(QueueFull):
+            enqueue('rebuild_user_stats', user_id)
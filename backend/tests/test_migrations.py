@@ -0,0 +1,39 @@
+import os
+
+import pytest
+import sqlalchemy as sa
+from flask_migrate import upgrade
+
+from app import create_app
+from conftest import TestConfig
+from models import db
+
+MIGRATIONS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'migrations')
+
+
+@pytest.fixture
+def migrated_app(tmp_path):
+    class MigrationConfig(TestConfig):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'migrations.db'}"
+
+    return create_app(MigrationConfig)
+
+
+def schema(engine):
+    inspector = sa.inspect(engine)
+    return {
+        table: {column['name'] for column in inspector.get_columns(table)}
+        for table in inspector.get_table_names() if table != 'alembic_version'
+    }
+
+
+def test_baseline_database_upgrades_to_the_models(migrated_app):
+    with migrated_app.app_context():
+        # What a stamped db.create_all() database from before migrations has
+        upgrade(MIGRATIONS, revision='0001_initial_schema')
+        assert set(schema(db.engine)) == {'users', 'workouts', 'exercises', 'sets', 'cardio_sessions'}
+
+        upgrade(MIGRATIONS)
+        assert schema(db.engine) == {
+            table.name: {column.name for column in table.columns} for table in db.metadata.sorted_tables
+        }
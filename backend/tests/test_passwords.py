@@ -0,0 +1,30 @@
+import time
+
+import pytest
+
+import passwords
+from passwords import HashingBusy
+
+
+@pytest.fixture
+def hashing(app, monkeypatch):
+    # A fresh single-slot pool with a short deadline
+    app.config.update(PASSWORD_HASH_WORKERS=1, PASSWORD_HASH_MAX_PENDING=1, PASSWORD_HASH_TIMEOUT=0.2)
+    monkeypatch.setattr(passwords, '_executor', None)
+    with app.app_context():
+        yield
+        passwords._executor.shutdown(wait=True)
+
+
+def test_slow_hash_is_busy_and_keeps_its_slot(hashing):
+    started = time.monotonic()
+    with pytest.raises(HashingBusy):
+        passwords._run(time.sleep, 1)
+    assert time.monotonic() - started < 0.5
+
+    # Still running in the pool: the pending bound still counts it
+    with pytest.raises(HashingBusy):
+        passwords._run(time.sleep, 0)
+
+    time.sleep(1)
+    assert passwords._run(abs, -1) == 1
@@ -0,0 +1,74 @@
+"""EXPLAIN QUERY PLAN for the statements the listing routes run.
+
+Statements are captured from real requests rather than rebuilt by hand, so
+the test follows the routes as they change. A plan that scans one of the
+history tables without an index fails.
+"""
+import pytest
+from sqlalchemy import event
+
+from conftest import import_records, workout_records
+from models import db
+
+HISTORY_TABLES = ('workouts', 'exercises', 'sets', 'cardio_sessions', 'sets_archive', 'cardio_sessions_archive')
+
+
+def capture_selects(app, client, headers, path):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT'):
+            statements.append((statement, parameters))
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        response = client.get(path, headers=headers)
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+    assert response.status_code == 200, response.get_data(as_text=True)
+    return response, statements
+
+
+def full_scans(plan):
+    # "SCAN sets" is a full table scan; "SCAN sets USING INDEX ..." and
+    # "SEARCH sets USING INDEX ..." are not
+    return [
+        line for line in plan
+        if any(line == f'SCAN {table}' or line.startswith(f'SCAN {table} ') and 'INDEX' not in line
+               for table in HISTORY_TABLES)
+    ]
+
+
+@pytest.fixture
+def history(client, headers):
+    import_records(client, headers, '/api/workouts/import', workout_records(5))
+    import_records(client, headers, '/api/cardio/import', [
+        {'date': f'2025-01-{day:02d}', 'activityType': 'running', 'durationMinutes': 30, 'distance': 5}
+        for day in range(1, 6)
+    ])
+
+
+def listing_paths(client, headers):
+    yield '/api/workouts'
+    yield '/api/workouts?include=exercises'
+    for path in ('/api/workouts?limit=2', '/api/cardio?limit=2'):
+        yield path
+        cursor = client.get(path, headers=headers).headers['X-Next-Cursor']
+        yield f'{path}&cursor={cursor}'
+    yield '/api/cardio'
+    workout_id = client.get('/api/workouts', headers=headers).get_json()[0]['id']
+    yield f'/api/workouts/{workout_id}'
+
+
+def test_listing_queries_use_indexes(app, client, headers, history):
+    checked = 0
+    for path in listing_paths(client, headers):
+        _, statements = capture_selects(app, client, headers, path)
+        with app.app_context(), db.engine.connect() as connection:
+            for statement, parameters in statements:
+                plan = [row[-1] for row in connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters)]
+                assert not full_scans(plan), f'{path}: {statement}\n' + '\n'.join(plan)
+                checked += 1
+    assert checked
@@ -0,0 +1,65 @@
+from datetime import datetime, timedelta
+
+WORKOUT = {'name': 'Push', 'exercises': [{'name': 'Bench Press', 'sets': [{'setNumber': 1, 'reps': 5, 'weight': 80}]}]}
+
+
+def sync(client, headers, operations, sync_token=None):
+    response = client.post('/api/sync', headers=headers, json={'operations': operations, 'syncToken': sync_token})
+    assert response.status_code == 200, response.get_data(as_text=True)
+    return response.get_json()
+
+
+def workout_names(client, headers):
+    return [workout['name'] for workout in client.get('/api/workouts', headers=headers).get_json()]
+
+
+def test_retried_operation_is_replayed(client, headers):
+    create = {'opId': 'op-1', 'type': 'workout.create', 'data': WORKOUT}
+    first = sync(client, headers, [create])['results'][0]
+    retried = sync(client, headers, [create])['results'][0]
+
+    assert first['status'] == 'applied'
+    assert retried == dict(first, replayed=True)
+    assert workout_names(client, headers) == ['Push']
+
+
+def test_client_id_resolves_within_the_batch(client, headers):
+    results = sync(client, headers, [
+        {'opId': 'op-1', 'type': 'workout.create', 'clientId': 'tmp-1', 'data': WORKOUT},
+        {'opId': 'op-2', 'type': 'workout.update', 'clientId': 'tmp-1', 'data': {'name': 'Push A'}},
+    ])['results']
+
+    assert [result['status'] for result in results] == ['applied', 'applied']
+    assert results[0]['id'] == results[1]['id']
+    assert workout_names(client, headers) == ['Push A']
+
+
+def test_stale_update_is_a_conflict(client, headers):
+    workout_id = sync(client, headers, [{'opId': 'op-1', 'type': 'workout.create', 'data': WORKOUT}])['results'][0]['id']
+
+    edited_before = (datetime.utcnow() - timedelta(hours=1)).isoformat()
+    result = sync(client, headers, [{
+        'opId': 'op-2', 'type': 'workout.update', 'id': workout_id,
+        'clientTimestamp': edited_before, 'data': {'name': 'Old edit'}
+    }])['results'][0]
+
+    assert (result['status'], result['reason']) == ('conflict', 'stale')
+    assert result['current']['name'] == 'Push'
+    assert workout_names(client, headers) == ['Push']
+
+
+def test_delta_after_a_delete_has_a_tombstone(client, headers):
+    first = sync(client, headers, [
+        {'opId': 'op-1', 'type': 'workout.create', 'data': WORKOUT},
+        {'opId': 'op-2', 'type': 'workout.create', 'data': dict(WORKOUT, name='Pull')},
+    ])
+    push_id = first['results'][0]['id']
+
+    second = sync(client, headers, [{'opId': 'op-3', 'type': 'workout.delete', 'id': push_id}], first['syncToken'])
+    assert not second['full']
+    assert second['workouts'] == []
+    assert second['deleted'] == {'workouts': [push_id], 'cardio': []}
+
+    third = sync(client, headers, [], second['syncToken'])
+    assert (third['workouts'], third['deleted']['workouts']) == ([], [])
+    assert workout_names(client, headers) == ['Pull']
@@ -0,0 +1,54 @@
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+from conftest import import_records, workout_records
+from models import db
+
+
+@contextmanager
+def count_queries(app):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+
+def listing_queries(app, client, headers, path='/api/workouts'):
+    # The first request warms per-process caches (user, data version);
+    # the second one is measured
+    assert client.get(path, headers=headers).status_code == 200
+    with count_queries(app) as statements:
+        response = client.get(path, headers=headers)
+    assert response.status_code == 200
+    return len(statements), response.get_json()
+
+
+def test_workout_listing_query_count_does_not_grow_with_history(app, client, headers):
+    import_records(client, headers, '/api/workouts/import', workout_records(1))
+    small, workouts = listing_queries(app, client, headers)
+    assert len(workouts) == 1
+
+    import_records(client, headers, '/api/workouts/import', workout_records(40))
+    large, workouts = listing_queries(app, client, headers)
+    assert len(workouts) == 41
+    assert all(len(exercise['sets']) == 3 for workout in workouts for exercise in workout['exercises'])
+    assert large == small
+
+
+def test_paginated_listing_query_count_does_not_grow_with_history(app, client, headers):
+    import_records(client, headers, '/api/workouts/import', workout_records(5))
+    small, _ = listing_queries(app, client, headers, '/api/workouts?limit=3')
+
+    import_records(client, headers, '/api/workouts/import', workout_records(60))
+    large, workouts = listing_queries(app, client, headers, '/api/workouts?limit=3')
+    assert len(workouts) == 3
+    assert large == small
@@ -0,0 +1,515 @@
+import csv
+import io
+import json
+from datetime import datetime, timezone
+from flask import Blueprint, Response, jsonify, request, stream_with_context
+from flask_jwt_extended import jwt_required
+from sqlalchemy import insert
+from cardio_metrics import cardio_metrics
+from changes import training_data_changed
+from change_log import CARDIO, WORKOUT, log_changes
+from models import db, Workout, CardioSession
+from serializers import cardio_select, dumps, serialize_cardio_rows, serialize_workout_rows, workout_select
+from stats import apply_delta, distance_km
+from workout_writer import insert_workouts
+from user_cache import current_user_id
+
+transfer_bp = Blueprint('transfer', __name__, url_prefix='/api')
+
+# Bulk import and export of training history.
+#
+# Imports read the request body as it arrives (NDJSON: one record per line,
+# CSV: one row per set or cardio session), validate every record on its own
+# and commit valid ones in chunks, so a bad line is reported without failing
+# the rest of the file. Exports read through a server-side cursor and stream
+# the response batch by batch.
+
+IMPORT_CHUNK_SIZE = 500
+EXPORT_BATCH_SIZE = 500
+MAX_REPORTED_ERRORS = 100
+
+FORMATS = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv'}
+FORMAT_ALIASES = {'application/jsonl': 'ndjson', 'application/json-lines': 'ndjson'}
+
+WORKOUT_CSV_COLUMNS = (
+    'workout_id', 'created_at', 'workout_name', 'workout_description',
+    'exercise_order', 'exercise_name', 'exercise_notes',
+    'set_number', 'reps', 'weight', 'completed', 'rest_seconds', 'set_notes'
+)
+CARDIO_CSV_COLUMNS = (
+    'date', 'activity_type', 'duration_minutes', 'distance', 'distance_unit',
+    'calories_burned', 'avg_heart_rate', 'notes', 'created_at'
+)
+
+
+class RecordError(ValueError):
+    pass
+
+
+# ============== PARSING ==============
+
+def body_format():
+    fmt = request.args.get('format')
+    if fmt is None:
+        mimetype = request.mimetype
+        fmt = FORMAT_ALIASES.get(mimetype) or next(
+            (name for name, value in FORMATS.items() if value == mimetype), None
+        )
+    return fmt if fmt in FORMATS else None
+
+
+def body_lines():
+    # Decode the request body incrementally instead of buffering it
+    stream = request.stream
+    if isinstance(stream, io.RawIOBase):
+        stream = io.BufferedReader(stream)
+    return io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+
+
+def ndjson_records(lines):
+    for line_no, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            yield line_no, RecordError('Invalid JSON')
+            continue
+        if not isinstance(record, dict):
+            yield line_no, RecordError('Expected a JSON object')
+            continue
+        yield line_no, record
+
+
+def csv_rows(lines):
+    reader = csv.DictReader(lines)
+    for row in reader:
+        # line_num is the last physical line of the row (quoted fields may
+        # span several)
+        yield reader.line_num, {key: value for key, value in row.items() if key is not None}
+
+
+def workout_csv_records(rows):
+    """Fold consecutive set rows into nested workout records.
+
+    A new workout starts whenever workout_id (or, without it, created_at and
+    workout_name) changes; a new exercise whenever exercise_order or
+    exercise_name changes. Rows without an exercise or set number only
+    describe their parent. Records are reported at their first line.
+    """
+    record = record_line = workout_key = exercise_key = None
+    for line_no, row in rows:
+        row = {key: (value.strip() if value and value.strip() else None) for key, value in row.items()}
+        key = row.get('workout_id') or (row.get('created_at'), row.get('workout_name'))
+        if record is None or key != workout_key:
+            if record is not None:
+                yield record_line, record
+            record_line, workout_key, exercise_key = line_no, key, None
+            record = {
+                'name': row.get('workout_name'),
+                'description': row.get('workout_description'),
+                'createdAt': row.get('created_at'),
+                'exercises': []
+            }
+
+        if not row.get('exercise_name'):
+            continue
+        if (row.get('exercise_order'), row['exercise_name']) != exercise_key:
+            exercise_key = (row.get('exercise_order'), row['exercise_name'])
+            exercise = {'name': row['exercise_name'], 'notes': row.get('exercise_notes'), 'sets': []}
+            if row.get('exercise_order') is not None:
+                exercise['order'] = row['exercise_order']
+            record['exercises'].append(exercise)
+
+        if row.get('set_number') is not None:
+            record['exercises'][-1]['sets'].append({
+                'setNumber': row['set_number'],
+                'reps': row.get('reps'),
+                'weight': row.get('weight'),
+                'completed': row.get('completed'),
+                'restSeconds': row.get('rest_seconds'),
+                'notes': row.get('set_notes')
+            })
+
+    if record is not None:
+        yield record_line, record
+
+
+# ============== VALIDATION ==============
+
+def _get(record, *names):
+    # Accepts both the API's camelCase keys and snake_case column names
+    for name in names:
+        if record.get(name) not in (None, ''):
+            return record[name]
+    return None
+
+
+def _integer(value):
+    if isinstance(value, float) and not value.is_integer():
+        raise ValueError
+    return int(value)
+
+
+def _number(value, field, cast, required=False):
+    if value is None:
+        if required:
+            raise RecordError(f'{field} is required')
+        return None
+    if isinstance(value, bool):
+        raise RecordError(f'{field} must be a number')
+    try:
+        return cast(value)
+    except (TypeError, ValueError):
+        raise RecordError(f'{field} must be a number')
+
+
+def _text(value, field, max_length=None, required=False):
+    if value is None:
+        if required:
+            raise RecordError(f'{field} is required')
+        return None
+    value = str(value)
+    if max_length and len(value) > max_length:
+        raise RecordError(f'{field} is longer than {max_length} characters')
+    return value
+
+
+def _flag(value):
+    if isinstance(value, str):
+        return value.strip().lower() in ('1', 'true', 'yes', 'y')
+    return bool(value)
+
+
+def _timestamp(value, field):
+    if value is None:
+        return datetime.utcnow()
+    try:
+        parsed = datetime.fromisoformat(str(value))
+    except ValueError:
+        raise RecordError(f'{field} must be an ISO 8601 timestamp')
+    # Stored columns are naive UTC
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def validate_workout(record):
+    exercises = _get(record, 'exercises') or []
+    if not isinstance(exercises, list):
+        raise RecordError('exercises must be a list')
+
+    workout = {
+        'name': _text(_get(record, 'name', 'workout_name'), 'Workout name', 200, required=True),
+        'description': _text(_get(record, 'description', 'workout_description'), 'description') or '',
+        'createdAt': _timestamp(_get(record, 'createdAt', 'created_at'), 'createdAt'),
+        'exercises': []
+    }
+
+    for exercise_data in exercises:
+        if not isinstance(exercise_data, dict):
+            raise RecordError('Each exercise must be an object')
+        sets = _get(exercise_data, 'sets') or []
+        if not isinstance(sets, list):
+            raise RecordError('sets must be a list')
+
+        name = _text(_get(exercise_data, 'name'), 'Exercise name', 200, required=True)
+        exercise = {
+            'name': name,
+            'notes': _text(_get(exercise_data, 'notes'), 'notes') or '',
+            'sets': []
+        }
+        order = _number(_get(exercise_data, 'order'), f'{name}: order', _integer)
+        if order is not None:
+            exercise['order'] = order
+
+        for set_data in sets:
+            if not isinstance(set_data, dict):
+                raise RecordError(f'{name}: each set must be an object')
+            exercise['sets'].append({
+                'setNumber': _number(_get(set_data, 'setNumber', 'set_number'),
+                                     f'{name}: setNumber', _integer, required=True),
+                'reps': _number(_get(set_data, 'reps'), f'{name}: reps', _integer, required=True),
+                'weight': _number(_get(set_data, 'weight'), f'{name}: weight', float) or 0,
+                'completed': _flag(_get(set_data, 'completed')),
+                'restSeconds': _number(_get(set_data, 'restSeconds', 'rest_seconds'),
+                                       f'{name}: restSeconds', _integer),
+                'notes': _text(_get(set_data, 'notes'), 'notes')
+            })
+
+        workout['exercises'].append(exercise)
+
+    return workout
+
+
+def validate_cardio(record):
+    day = _get(record, 'date')
+    try:
+        day = datetime.strptime(str(day), '%Y-%m-%d').date() if day is not None else None
+    except ValueError:
+        raise RecordError('Invalid date format. Use YYYY-MM-DD')
+    if day is None:
+        raise RecordError('Date is required')
+
+    duration = _number(_get(record, 'durationMinutes', 'duration_minutes'), 'Duration', _integer, required=True)
+    if duration <= 0:
+        raise RecordError('Duration must be positive')
+
+    return {
+        'date': day,
+        'activity_type': _text(_get(record, 'activityType', 'activity_type'), 'Activity type', 50, required=True),
+        'duration_minutes': duration,
+        'distance': _number(_get(record, 'distance'), 'distance', float),
+        'distance_unit': _text(_get(record, 'distanceUnit', 'distance_unit'), 'distance unit', 10) or 'km',
+        'calories_burned': _number(_get(record, 'caloriesBurned', 'calories_burned'), 'calories', _integer),
+        'avg_heart_rate': _number(_get(record, 'avgHeartRate', 'avg_heart_rate'), 'heart rate', _integer),
+        'notes': _text(_get(record, 'notes'), 'notes') or '',
+        'created_at': _timestamp(_get(record, 'createdAt', 'created_at'), 'createdAt')
+    }
+
+
+# ============== WRITING ==============
+
+def write_workouts(user_id, workouts):
+    workout_ids = insert_workouts(user_id, workouts)
+
+    # One rollup increment per calendar day rather than per workout
+    per_day = {}
+    for workout in workouts:
+        sets = [set_data for exercise in workout['exercises'] for set_data in exercise['sets']]
+        totals = per_day.setdefault(workout['createdAt'].date(), {
+            'workout_count': 0, 'set_count': 0, 'total_reps': 0, 'total_volume': 0.0
+        })
+        totals['workout_count'] += 1
+        totals['set_count'] += len(sets)
+        totals['total_reps'] += sum(set_data['reps'] for set_data in sets)
+        totals['total_volume'] += sum(set_data['reps'] * set_data['weight'] for set_data in sets)
+    for day, totals in per_day.items():
+        apply_delta(user_id, day, **totals)
+
+    training_data_changed(user_id, 'workouts_imported')
+    log_changes(user_id, WORKOUT, workout_ids)
+    return workout_ids
+
+
+def write_cardio(user_id, sessions):
+    session_ids = db.session.execute(insert(CardioSession).returning(CardioSession.id), [
+        dict(
+            session,
+            user_id=user_id,
+            **cardio_metrics(session['distance'], session['distance_unit'],
+                             session['duration_minutes'], session['avg_heart_rate'])
+        )
+        for session in sessions
+    ]).scalars().all()
+
+    per_day = {}
+    for session in sessions:
+        totals = per_day.setdefault(session['date'], {
+            'cardio_count': 0, 'cardio_minutes': 0, 'cardio_calories': 0, 'cardio_distance_km': 0.0
+        })
+        totals['cardio_count'] += 1
+        totals['cardio_minutes'] += session['duration_minutes']
+        totals['cardio_calories'] += session['calories_burned'] or 0
+        totals['cardio_distance_km'] += distance_km(session['distance'], session['distance_unit'])
+    for day, totals in per_day.items():
+        apply_delta(user_id, day, **totals)
+
+    training_data_changed(user_id, 'cardio_imported')
+    log_changes(user_id, CARDIO, session_ids)
+    return session_ids
+
+
+class ImportReport:
+    def __init__(self):
+        self.imported = 0
+        self.failed = 0
+        self.errors = []
+
+    def error(self, line, message):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'line': line, 'message': message})
+
+    def to_dict(self):
+        return {
+            'imported': self.imported,
+            'failed': self.failed,
+            'errors': self.errors,
+            'errorsTruncated': self.failed > len(self.errors)
+        }
+
+
+def run_import(user_id, records, validate, write):
+    """Validate records one by one and write valid ones in chunked
+    transactions. A chunk that fails to save is rolled back and each of its
+    lines reported; earlier chunks stay committed."""
+    report = ImportReport()
+    batch = []
+
+    def flush():
+        if not batch:
+            return
+        try:
+            write(user_id, [item for _, item in batch])
+            db.session.commit()
+            report.imported += len(batch)
+        except Exception as e:
+            db.session.rollback()
+            for line_no, _ in batch:
+                report.error(line_no, f'Not saved: {str(e)}')
+        batch.clear()
+
+    line_no = 0
+    try:
+        for line_no, record in records:
+            try:
+                if isinstance(record, RecordError):
+                    raise record
+                batch.append((line_no, validate(record)))
+            except RecordError as e:
+                report.error(line_no, str(e))
+                continue
+            if len(batch) >= IMPORT_CHUNK_SIZE:
+                flush()
+    except (UnicodeDecodeError, csv.Error) as e:
+        # The rest of the body cannot be read; keep what was parsed so far
+        report.error(line_no + 1, f'Stopped reading: {str(e)}')
+
+    flush()
+    return report
+
+
+# ============== EXPORT ==============
+
+def stream_partitions(statement):
+    # Server-side cursor: rows are fetched EXPORT_BATCH_SIZE at a time
+    result = db.session.execute(statement.execution_options(yield_per=EXPORT_BATCH_SIZE))
+    yield from result.partitions()
+
+
+def csv_text(rows):
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    return buffer.getvalue()
+
+
+def ndjson_bytes(items):
+    return b''.join(dumps(item) + b'\n' for item in items)
+
+
+def _iso(value):
+    return value.isoformat() if value else None
+
+
+def workout_csv_rows(workout):
+    head = [workout['id'], _iso(workout['createdAt']), workout['name'], workout['description']]
+    if not workout['exercises']:
+        yield head + [None] * 9
+    for exercise in workout['exercises']:
+        exercise_head = head + [exercise['order'], exercise['name'], exercise['notes']]
+        if not exercise['sets']:
+            yield exercise_head + [None] * 6
+        for set_data in exercise['sets']:
+            yield exercise_head + [
+                set_data['setNumber'], set_data['reps'], set_data['weight'],
+                set_data['completed'], set_data['restSeconds'], set_data['notes']
+            ]
+
+
+def cardio_csv_row(session):
+    return [
+        _iso(session['date']), session['activityType'], session['durationMinutes'],
+        session['distance'], session['distanceUnit'], session['caloriesBurned'],
+        session['avgHeartRate'], session['notes'], _iso(session['createdAt'])
+    ]
+
+
+def export_workouts(user_id, fmt):
+    if fmt == 'csv':
+        yield csv_text([WORKOUT_CSV_COLUMNS])
+    statement = workout_select(user_id).order_by(Workout.created_at, Workout.id)
+    for rows in stream_partitions(statement):
+        workouts = serialize_workout_rows(rows)
+        if fmt == 'csv':
+            yield csv_text(row for workout in workouts for row in workout_csv_rows(workout))
+        else:
+            yield ndjson_bytes(workouts)
+
+
+def export_cardio(user_id, fmt):
+    if fmt == 'csv':
+        yield csv_text([CARDIO_CSV_COLUMNS])
+    statement = cardio_select(user_id)
+    sessions = statement.selected_columns
+    statement = statement.order_by(sessions.date, sessions.id)
+    for rows in stream_partitions(statement):
+        sessions = serialize_cardio_rows(rows)
+        if fmt == 'csv':
+            yield csv_text(cardio_csv_row(session) for session in sessions)
+        else:
+            yield ndjson_bytes(sessions)
+
+
+def export_response(chunks, fmt, name):
+    response = Response(stream_with_context(chunks), mimetype=FORMATS[fmt])
+    response.headers['Content-Disposition'] = f'attachment; filename="{name}.{fmt}"'
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+
+def unsupported_format():
+    return jsonify({'message': 'Unsupported format. Use application/x-ndjson or text/csv'}), 415
+
+
+# ============== IMPORT/EXPORT ROUTES ==============
+
+@transfer_bp.route('/workouts/import', methods=['POST'])
+@jwt_required()
+def import_workouts():
+    try:
+        fmt = body_format()
+        if fmt is None:
+            return unsupported_format()
+
+        lines = body_lines()
+        records = ndjson_records(lines) if fmt == 'ndjson' else workout_csv_records(csv_rows(lines))
+        report = run_import(current_user_id(), records, validate_workout, write_workouts)
+        return jsonify(report.to_dict()), 200
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'message': str(e)}), 500
+
+@transfer_bp.route('/cardio/import', methods=['POST'])
+@jwt_required()
+def import_cardio_sessions():
+    try:
+        fmt = body_format()
+        if fmt is None:
+            return unsupported_format()
+
+        lines = body_lines()
+        records = ndjson_records(lines) if fmt == 'ndjson' else csv_rows(lines)
+        report = run_import(current_user_id(), records, validate_cardio, write_cardio)
+        return jsonify(report.to_dict()), 200
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'message': str(e)}), 500
+
+@transfer_bp.route('/workouts/export', methods=['GET'])
+@jwt_required()
+def export_workout_history():
+    fmt = request.args.get('format', 'ndjson')
+    if fmt not in FORMATS:
+        return unsupported_format()
+    return export_response(export_workouts(current_user_id(), fmt), fmt, 'workouts')
+
+@transfer_bp.route('/cardio/export', methods=['GET'])
+@jwt_required()
+def export_cardio_history():
+    fmt = request.args.get('format', 'ndjson')
+    if fmt not in FORMATS:
+        return unsupported_format()
+    return export_response(export_cardio(current_user_id(), fmt), fmt, 'cardio')
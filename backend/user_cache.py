@@ -0,0 +1,109 @@
+import hashlib
+import json
+import threading
+import time
+from flask import current_app, jsonify
+from flask_jwt_extended import get_jwt_identity
+from sqlalchemy import event
+from models import db, User
+
+# Per-process cache of authenticated users.
+#
+# Every @jwt_required request resolves its user through the JWT user-lookup
+# hook below, so a hot session costs a dict lookup instead of a SELECT.
+# Entries expire after USER_CACHE_TTL seconds (which bounds staleness across
+# worker processes) and are dropped as soon as this process updates or
+# deletes the user.
+
+
+class CachedUser:
+    """Read-only snapshot of a User, detached from any session."""
+
+    def __init__(self, user):
+        self.id = user.id
+        self.username = user.username
+        self.email = user.email
+        self.ai_cache_opt_out = bool(user.ai_cache_opt_out)
+        self.created_at = user.created_at
+        self.updated_at = user.updated_at
+        # Serialized once; /api/auth/me serves these directly
+        self.payload = user.to_dict()
+        self.etag = hashlib.sha1(json.dumps(self.payload, sort_keys=True).encode()).hexdigest()
+
+    def to_dict(self):
+        return dict(self.payload)
+
+
+class UserCache:
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return None
+        cached, expires_at = entry
+        if expires_at < time.monotonic():
+            self.invalidate(user_id)
+            return None
+        return cached
+
+    def put(self, user):
+        cached = CachedUser(user)
+        config = current_app.config
+        with self._lock:
+            if len(self._entries) >= config['USER_CACHE_MAX_ENTRIES']:
+                # Cheap bound: start over rather than track recency
+                self._entries.clear()
+            self._entries[user.id] = (cached, time.monotonic() + config['USER_CACHE_TTL'])
+        return cached
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+user_cache = UserCache()
+
+
+def load_user(user_id):
+    user_id = int(user_id)
+    cached = user_cache.get(user_id)
+    if cached is not None:
+        return cached
+    user = db.session.get(User, user_id)
+    if user is None:
+        return None
+    return user_cache.put(user)
+
+
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def invalidate_cached_user(mapper, connection, target):
+    user_cache.invalidate(target.id)
+
+
+def current_user_id():
+    # Tokens carry the id as a string subject (see register_user_loader)
+    return int(get_jwt_identity())
+
+
+def register_user_loader(jwt):
+    # PyJWT 2.10+ rejects tokens whose "sub" is not a string: user ids are
+    # issued as strings and turned back into ints when a token is read
+    @jwt.user_identity_loader
+    def user_identity(user_id):
+        return str(user_id)
+
+    @jwt.user_lookup_loader
+    def lookup_user(_jwt_header, jwt_data):
+        return load_user(jwt_data[current_app.config.get('JWT_IDENTITY_CLAIM', 'sub')])
+
+    @jwt.user_lookup_error_loader
+    def user_not_found(_jwt_header, jwt_data):
+        return jsonify({'message': 'User not found'}), 404
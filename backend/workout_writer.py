@@ -0,0 +1,258 @@
+from sqlalchemy import delete, insert, select, update
+from models import db, Workout, Exercise, Set
+
+# Write engine for the exercise/set tree of a workout.
+#
+# Every function here issues a fixed number of statements regardless of how
+# many exercises or sets are in the payload: exercises go in as one
+# multi-row INSERT ... RETURNING id, sets as one executemany INSERT, and
+# diff updates batch their UPDATEs and DELETEs by primary key. Sets carry
+# their workout's created_at as performed_at, the time key they are
+# partitioned and archived on.
+
+SET_FIELDS = ('set_number', 'reps', 'weight', 'completed')
+EXERCISE_FIELDS = ('name', 'order', 'notes')
+
+
+def exercise_row(workout_id, idx, exercise_data):
+    return {
+        'workout_id': workout_id,
+        'name': exercise_data['name'],
+        'order': exercise_data.get('order', idx + 1),
+        'notes': exercise_data.get('notes', '')
+    }
+
+
+def set_row(exercise_id, set_data):
+    return {
+        'exercise_id': exercise_id,
+        'set_number': set_data['setNumber'],
+        'reps': set_data['reps'],
+        'weight': set_data.get('weight', 0),
+        'completed': set_data.get('completed', False)
+    }
+
+
+def performed_at(workout_id):
+    # Read inside the INSERT: no extra round trip for the workout's time
+    return select(Workout.created_at).where(Workout.id == workout_id).scalar_subquery()
+
+
+def insert_exercise_tree(workout_id, exercises_data, start_index=0):
+    """Insert exercises and their sets in two statements.
+
+    ``start_index`` offsets the default ``order`` for payloads that are a
+    tail of a larger list. Returns the new exercise ids in payload order.
+    """
+    if not exercises_data:
+        return []
+
+    rows = [
+        exercise_row(workout_id, start_index + idx, exercise_data)
+        for idx, exercise_data in enumerate(exercises_data)
+    ]
+    result = db.session.execute(
+        insert(Exercise).returning(Exercise.id, sort_by_parameter_order=True),
+        rows
+    )
+    exercise_ids = result.scalars().all()
+
+    set_rows = [
+        set_row(exercise_id, set_data)
+        for exercise_id, exercise_data in zip(exercise_ids, exercises_data)
+        for set_data in exercise_data.get('sets') or []
+    ]
+    if set_rows:
+        db.session.execute(insert(Set).values(performed_at=performed_at(workout_id)), set_rows)
+
+    return exercise_ids
+
+
+def insert_workouts(user_id, workouts_data):
+    """Insert many complete workouts in three statements.
+
+    Used by bulk import: workouts, then all of their exercises, then all
+    sets, each as a single multi-row INSERT. Unlike the create route, set
+    rest times and notes are kept. Returns the new workout ids in order.
+    """
+    if not workouts_data:
+        return []
+
+    workout_ids = db.session.execute(
+        insert(Workout).returning(Workout.id, sort_by_parameter_order=True),
+        [
+            {
+                'user_id': user_id,
+                'name': workout_data['name'],
+                'description': workout_data.get('description', ''),
+                'created_at': workout_data['createdAt']
+            }
+            for workout_data in workouts_data
+        ]
+    ).scalars().all()
+
+    exercises_data = []
+    exercise_rows = []
+    for workout_id, workout_data in zip(workout_ids, workouts_data):
+        for idx, exercise_data in enumerate(workout_data.get('exercises') or []):
+            exercises_data.append((workout_data['createdAt'], exercise_data))
+            exercise_rows.append(exercise_row(workout_id, idx, exercise_data))
+    if not exercise_rows:
+        return workout_ids
+
+    exercise_ids = db.session.execute(
+        insert(Exercise).returning(Exercise.id, sort_by_parameter_order=True),
+        exercise_rows
+    ).scalars().all()
+
+    set_rows = [
+        dict(
+            set_row(exercise_id, set_data),
+            rest_seconds=set_data.get('restSeconds'),
+            notes=set_data.get('notes'),
+            performed_at=created_at
+        )
+        for exercise_id, (created_at, exercise_data) in zip(exercise_ids, exercises_data)
+        for set_data in exercise_data.get('sets') or []
+    ]
+    if set_rows:
+        db.session.execute(insert(Set), set_rows)
+
+    return workout_ids
+
+
+def delete_exercises(exercise_ids):
+    # Sets first: bulk DELETE does not run the ORM cascade
+    if not exercise_ids:
+        return
+    db.session.execute(delete(Set).where(Set.exercise_id.in_(exercise_ids)))
+    db.session.execute(delete(Exercise).where(Exercise.id.in_(exercise_ids)))
+
+
+def delete_workout_tree(workout_id):
+    # Three statements however many exercises and sets the workout has
+    exercise_ids = db.session.execute(
+        select(Exercise.id).where(Exercise.workout_id == workout_id)
+    ).scalars().all()
+    delete_exercises(exercise_ids)
+    db.session.execute(delete(Workout).where(Workout.id == workout_id))
+
+
+def replace_exercise_tree(workout_id, exercises_data):
+    existing_ids = db.session.execute(
+        select(Exercise.id).where(Exercise.workout_id == workout_id)
+    ).scalars().all()
+    delete_exercises(existing_ids)
+    insert_exercise_tree(workout_id, exercises_data)
+
+
+def _match(incoming, existing, key_of_existing, key_of_incoming):
+    # Pair incoming payload items with existing rows: by explicit id first,
+    # then by natural key (exercise name / set number). Returns a list of
+    # (incoming, existing_or_None) and the existing rows left unmatched.
+    by_id = {row['id']: row for row in existing}
+    by_key = {}
+    for row in existing:
+        by_key.setdefault(key_of_existing(row), row)
+
+    claimed = set()
+    pairs = []
+    for item in incoming:
+        row = by_id.get(item.get('id'))
+        if row is None:
+            candidate = by_key.get(key_of_incoming(item))
+            if candidate is not None and candidate['id'] not in claimed:
+                row = candidate
+        if row is not None and row['id'] in claimed:
+            row = None
+        if row is not None:
+            claimed.add(row['id'])
+        pairs.append((item, row))
+
+    leftover = [row for row in existing if row['id'] not in claimed]
+    return pairs, leftover
+
+
+def apply_exercise_diff(workout_id, exercises_data):
+    """Bring the stored tree in line with ``exercises_data``, writing only
+    what changed.
+
+    Exercises are matched by ``id`` or else by name, sets by ``id`` or else
+    by ``setNumber``. Unchanged rows are not touched, which keeps dead tuples
+    down on Postgres compared to deleting and recreating the whole tree.
+    """
+    exercise_rows = [
+        dict(row._mapping) for row in db.session.execute(
+            select(Exercise.id, Exercise.name, Exercise.order, Exercise.notes)
+            .where(Exercise.workout_id == workout_id)
+        )
+    ]
+    sets_by_exercise = {row['id']: [] for row in exercise_rows}
+    if exercise_rows:
+        for row in db.session.execute(
+            select(Set.id, Set.exercise_id, Set.set_number, Set.reps, Set.weight, Set.completed)
+            .where(Set.exercise_id.in_(list(sets_by_exercise)))
+        ):
+            sets_by_exercise[row.exercise_id].append(dict(row._mapping))
+
+    pairs, removed_exercises = _match(
+        exercises_data, exercise_rows,
+        lambda row: row['name'].strip().lower(),
+        lambda item: item['name'].strip().lower()
+    )
+
+    exercise_updates = []
+    set_updates = []
+    set_inserts = []
+    removed_set_ids = []
+    new_exercises = []
+
+    for idx, (exercise_data, existing) in enumerate(pairs):
+        if existing is None:
+            new_exercises.append((idx, exercise_data))
+            continue
+
+        wanted = exercise_row(workout_id, idx, exercise_data)
+        if any(existing[field] != wanted[field] for field in EXERCISE_FIELDS):
+            exercise_updates.append(dict(
+                {field: wanted[field] for field in EXERCISE_FIELDS}, id=existing['id']
+            ))
+
+        set_pairs, removed_sets = _match(
+            exercise_data.get('sets') or [], sets_by_exercise[existing['id']],
+            lambda row: row['set_number'],
+            lambda item: item['setNumber']
+        )
+        removed_set_ids.extend(row['id'] for row in removed_sets)
+
+        for set_data, existing_set in set_pairs:
+            wanted_set = set_row(existing['id'], set_data)
+            if existing_set is None:
+                set_inserts.append(wanted_set)
+            elif any(existing_set[field] != wanted_set[field] for field in SET_FIELDS):
+                set_updates.append(dict(
+                    {field: wanted_set[field] for field in SET_FIELDS}, id=existing_set['id']
+                ))
+
+    # Batched writes: each list below is a single executemany
+    delete_exercises([row['id'] for row in removed_exercises])
+    if removed_set_ids:
+        db.session.execute(delete(Set).where(Set.id.in_(removed_set_ids)))
+    if exercise_updates:
+        db.session.execute(update(Exercise), exercise_updates)
+    if set_updates:
+        db.session.execute(update(Set), set_updates)
+    if set_inserts:
+        db.session.execute(insert(Set).values(performed_at=performed_at(workout_id)), set_inserts)
+    if new_exercises:
+        _insert_at_positions(workout_id, new_exercises)
+
+
+def _insert_at_positions(workout_id, indexed_exercises):
+    # New exercises keep their payload position as the default order
+    payload = []
+    for idx, exercise_data in indexed_exercises:
+        exercise_data = dict(exercise_data)
+        exercise_data.setdefault('order', idx + 1)
+        payload.append(exercise_data)
+    insert_exercise_tree(workout_id, payload)
@@ -1,6 +1,7 @@
 import { Component, OnInit } from '@angular/core';
 import { CommonModule, DatePipe, DecimalPipe, TitleCasePipe } from '@angular/common';
 import { Router } from '@angular/router';
+import { ApiService } from '../../services/api.service';
 
 interface Activity {
   icon: string;
@@ -53,7 +54,10 @@ export class DashboardComponent implements OnInit {
     { text: "Strength does not come from physical capacity. It comes from an indomitable will", author: "Mahatma Gandhi" }
   ];
 
-  constructor(private router: Router) {}
+  constructor(
+    private router: Router,
+    private apiService: ApiService
+  ) {}
 
   ngOnInit(): void {
     this.loadDashboardData();
@@ -63,17 +67,27 @@ export class DashboardComponent implements OnInit {
   loadDashboardData(): void {
     this.isLoading = true;
     
+    // Totals come pre-aggregated from the server rollups
+    this.apiService.getStats().subscribe({
+      next: (stats: any) => {
+        const thisWeek = stats.weekly.find((week: any) => week.periodStart === this.getWeekStart());
+        this.dashboardStats = {
+          totalWorkouts: stats.totals.workouts,
+          totalCardioSessions: stats.totals.cardioSessions,
+          totalMinutes: stats.totals.cardioMinutes,
+          weeklyWorkouts: thisWeek?.workouts || 0,
+          weeklyCardio: thisWeek?.cardioSessions || 0,
+          weeklyMinutes: thisWeek?.cardioMinutes || 0
+        };
+      },
+      error: (error: any) => {
+        console.error('Error loading stats:', error);
+        this.loadMockStats();
+      }
+    });
+    
     // To know the weekly exercises
     setTimeout(() => {
-      this.dashboardStats = {
-        totalWorkouts: 12,
-        totalCardioSessions: 8,
-        totalMinutes: 1240,
-        weeklyWorkouts: 2,
-        weeklyCardio: 3,
-        weeklyMinutes: 320
-      };
-      
       this.recentActivities = [
         {
           icon: '💪',
@@ -102,6 +116,26 @@ export class DashboardComponent implements OnInit {
     }, 1000);
   }
 
+  private loadMockStats(): void {
+    this.dashboardStats = {
+      totalWorkouts: 12,
+      totalCardioSessions: 8,
+      totalMinutes: 1240,
+      weeklyWorkouts: 2,
+      weeklyCardio: 3,
+      weeklyMinutes: 320
+    };
+  }
+
+  // Monday of the current week as YYYY-MM-DD, matching the server buckets
+  private getWeekStart(): string {
+    const today = new Date();
+    const monday = new Date(today.getFullYear(), today.getMonth(), today.getDate() - ((today.getDay() + 6) % 7));
+    const month = String(monday.getMonth() + 1).padStart(2, '0');
+    const day = String(monday.getDate()).padStart(2, '0');
+    return `${monday.getFullYear()}-${month}-${day}`;
+  }
+
   refreshData(): void {
     this.loadDashboardData();
   }
@@ -1,6 +1,8 @@
-import { Component, OnInit } from '@angular/core';
+import { Component, OnDestroy, OnInit } from '@angular/core';
 import { CommonModule } from '@angular/common';
 import { FormsModule, ReactiveFormsModule, FormBuilder, FormGroup, Validators } from '@angular/forms';
+import { Observable, Subject, Subscription, of } from 'rxjs';
+import { catchError, debounceTime, map, switchMap } from 'rxjs/operators';
 import { ApiService } from '../../services/api.service';
 
 // Existing interfaces
@@ -53,7 +55,7 @@ interface Set {
   templateUrl: './workouts.component.html',
   styleUrls: ['./workouts.component.scss']
 })
-export class WorkoutsComponent implements OnInit {
+export class WorkoutsComponent implements OnInit, OnDestroy {
   workoutForm: FormGroup;
   workouts: Workout[] = [];
   currentExercises: TempExercise[] = [];
@@ -65,6 +67,7 @@ export class WorkoutsComponent implements OnInit {
   successMessage = '';
   errorMessage = '';
 
+  // Offline fallback when the suggest endpoint is unreachable
   exerciseSuggestions = [
     'Bench Press', 'Squats', 'Deadlifts', 'Pull-ups', 'Push-ups',
     'Overhead Press', 'Barbell Rows', 'Lunges', 'Dips', 'Bicep Curls',
@@ -74,6 +77,15 @@ export class WorkoutsComponent implements OnInit {
 
   filteredSuggestions: string[] = [];
   showSuggestions = false;
+  private suggestQuery = new Subject<string>();
+  private suggestSubscription?: Subscription;
+
+  // Edits go through /api/sync: one request applies the edit and returns
+  // what changed since syncToken. An edit keeps its opId until it is
+  // applied, so resubmitting after a dropped connection never creates the
+  // workout twice
+  private syncToken: string | null = null;
+  private pendingOperation: { opId: string; key: string } | null = null;
 
   constructor(
     private fb: FormBuilder,
@@ -87,6 +99,24 @@ export class WorkoutsComponent implements OnInit {
 
   ngOnInit(): void {
     this.loadWorkouts();
+    this.suggestSubscription = this.suggestQuery.pipe(
+      debounceTime(150),
+      switchMap(query => this.apiService.suggestExercises(query).pipe(
+        map(results => results.map(result => result.name)),
+        catchError(() => of(this.filterLocalSuggestions(query)))
+      ))
+    ).subscribe(suggestions => {
+      // Ignore answers that arrive after the input was cleared
+      if (!this.newExerciseName.trim()) {
+        return;
+      }
+      this.filteredSuggestions = suggestions;
+      this.showSuggestions = suggestions.length > 0;
+    });
+  }
+
+  ngOnDestroy(): void {
+    this.suggestSubscription?.unsubscribe();
   }
 
   loadWorkouts(): void {
@@ -178,17 +208,21 @@ export class WorkoutsComponent implements OnInit {
   }
 
   onExerciseNameInput(): void {
-    const value = this.newExerciseName.toLowerCase();
+    const value = this.newExerciseName.trim();
     if (value.length > 0) {
-      this.filteredSuggestions = this.exerciseSuggestions
-        .filter(exercise => exercise.toLowerCase().includes(value))
-        .slice(0, 5);
-      this.showSuggestions = this.filteredSuggestions.length > 0;
+      this.suggestQuery.next(value);
     } else {
       this.showSuggestions = false;
     }
   }
 
+  private filterLocalSuggestions(query: string): string[] {
+    const value = query.toLowerCase();
+    return this.exerciseSuggestions
+      .filter(exercise => exercise.toLowerCase().includes(value))
+      .slice(0, 5);
+  }
+
   selectSuggestion(suggestion: string): void {
     this.newExerciseName = suggestion;
     this.showSuggestions = false;
@@ -271,41 +305,31 @@ export class WorkoutsComponent implements OnInit {
         }))
       };
 
-      if (this.editingWorkout) {
-        this.apiService.updateWorkout(this.editingWorkout.id, workoutData).subscribe({
-          next: (updatedWorkout: Workout) => {
-            const index = this.workouts.findIndex(w => w.id === updatedWorkout.id);
-            if (index !== -1) {
-              this.workouts[index] = updatedWorkout;
-            }
-            this.successMessage = 'Workout updated successfully!';
-            this.cancelWorkoutForm();
-            this.isLoading = false;
-            this.clearMessagesAfterDelay();
-          },
-          error: (error: any) => {
-            console.error('Error updating workout:', error);
-            this.errorMessage = error.error?.message || 'Failed to update workout';
-            this.isLoading = false;
+      const editing = this.editingWorkout;
+      const operation = editing
+        ? { type: 'workout.update', id: editing.id, data: workoutData }
+        : { type: 'workout.create', data: workoutData };
+
+      this.syncWorkout(operation).subscribe({
+        next: (result: any) => {
+          this.isLoading = false;
+          if (result.status !== 'applied') {
+            this.errorMessage = this.syncErrorMessage(result);
+            return;
           }
-        });
-      } else {
-        this.apiService.createWorkout(workoutData).subscribe({
-          next: (newWorkout: Workout) => {
-            this.workouts.unshift(newWorkout);
-            this.successMessage = 'Workout created successfully!';
-            this.cancelWorkoutForm();
-            this.isLoading = false;
-            this.clearMessagesAfterDelay();
-          },
-          error: (error: any) => {
-            console.error('Error creating workout:', error);
-            this.errorMessage = error.error?.message || 'Failed to create workout';
-            this.isLoading = false;
+          this.successMessage = editing ? 'Workout updated successfully!' : 'Workout created successfully!';
+          this.cancelWorkoutForm();
+          this.clearMessagesAfterDelay();
+        },
+        error: (error: any) => {
+          console.error(`Error ${editing ? 'updating' : 'creating'} workout:`, error);
+          this.errorMessage = error.error?.message || `Failed to ${editing ? 'update' : 'create'} workout`;
+          this.isLoading = false;
+          if (!editing) {
             this.createMockWorkout(workoutData);
           }
-        });
-      }
+        }
+      });
     } else if (this.currentExercises.length === 0) {
       this.errorMessage = 'Please add at least one exercise to your workout';
       this.clearMessagesAfterDelay();
@@ -361,9 +385,8 @@ export class WorkoutsComponent implements OnInit {
   deleteWorkout(workoutId: number): void {
     if (confirm('Are you sure you want to delete this workout? This action cannot be undone.')) {
       this.isLoading = true;
-      this.apiService.deleteWorkout(workoutId).subscribe({
+      this.syncWorkout({ type: 'workout.delete', id: workoutId }).subscribe({
         next: () => {
-          this.workouts = this.workouts.filter(w => w.id !== workoutId);
           this.successMessage = 'Workout deleted successfully!';
           this.isLoading = false;
           this.clearMessagesAfterDelay();
@@ -381,6 +404,59 @@ export class WorkoutsComponent implements OnInit {
     }
   }
 
+  // Sends one workout operation and merges the returned changes into the list
+  private syncWorkout(operation: any): Observable<any> {
+    const key = JSON.stringify(operation);
+    if (!this.pendingOperation || this.pendingOperation.key !== key) {
+      this.pendingOperation = { opId: crypto.randomUUID(), key };
+    }
+    const op = { ...operation, opId: this.pendingOperation.opId, clientTimestamp: new Date().toISOString() };
+
+    return this.apiService.sync([op], this.syncToken).pipe(
+      map(response => {
+        this.pendingOperation = null;
+        this.applySyncChanges(response);
+        const result = response.results[0];
+        if (result.status === 'conflict') {
+          this.applyConflict(result);
+        }
+        return result;
+      })
+    );
+  }
+
+  private applySyncChanges(response: any): void {
+    this.syncToken = response.syncToken;
+    if (response.full) {
+      this.workouts = response.workouts;
+      return;
+    }
+    const changed = new Set<number>(response.workouts.map((workout: Workout) => workout.id));
+    const deleted = new Set<number>(response.deleted.workouts);
+    this.workouts = [
+      ...response.workouts,
+      ...this.workouts.filter(workout => !changed.has(workout.id) && !deleted.has(workout.id))
+    ].sort((a, b) => b.createdAt.localeCompare(a.createdAt) || b.id - a.id);
+  }
+
+  private applyConflict(result: any): void {
+    if (result.reason === 'deleted') {
+      this.workouts = this.workouts.filter(workout => workout.id !== result.id);
+    } else if (result.current) {
+      this.workouts = this.workouts.map(workout => workout.id === result.id ? result.current : workout);
+    }
+  }
+
+  private syncErrorMessage(result: any): string {
+    if (result.reason === 'stale') {
+      return 'This workout was changed elsewhere; the latest version is shown';
+    }
+    if (result.reason === 'deleted') {
+      return 'This workout was deleted elsewhere';
+    }
+    return result.message || 'Failed to save workout';
+  }
+
   // Helper methods
   getTotalReps(exercise: Exercise): number {
     return exercise.sets?.reduce((total, set) => total + set.reps, 0) || 0;
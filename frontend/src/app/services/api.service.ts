@@ -1,7 +1,7 @@
 import { Injectable } from '@angular/core';
-import { HttpClient, HttpHeaders } from '@angular/common/http';
-import { Observable, throwError } from 'rxjs';
-import { catchError } from 'rxjs/operators';
+import { HttpClient, HttpErrorResponse, HttpHeaders } from '@angular/common/http';
+import { Observable, of, throwError, timer } from 'rxjs';
+import { catchError, map, retry } from 'rxjs/operators';
 
 @Injectable({
   providedIn: 'root'
@@ -9,6 +9,9 @@ import { catchError } from 'rxjs/operators';
 export class ApiService {
   private apiUrl = 'http://localhost:5000/api';
 
+  // Last ETag and body per URL; unchanged data comes back as 304
+  private etagCache = new Map<string, { etag: string; body: any }>();
+
   constructor(private http: HttpClient) {}
 
   private getHttpOptions() {
@@ -21,6 +24,31 @@ export class ApiService {
     };
   }
 
+  // Conditional GET: send If-None-Match and reuse the cached body on 304
+  private getWithEtag<T>(url: string): Observable<T> {
+    const cached = this.etagCache.get(url);
+    let headers = this.getHttpOptions().headers;
+    if (cached) {
+      headers = headers.set('If-None-Match', cached.etag);
+    }
+
+    return this.http.get<T>(url, { headers, observe: 'response' }).pipe(
+      map(response => {
+        const etag = response.headers.get('ETag');
+        if (etag) {
+          this.etagCache.set(url, { etag, body: response.body });
+        }
+        return response.body as T;
+      }),
+      catchError((error: HttpErrorResponse) => {
+        if (error.status === 304 && cached) {
+          return of(cached.body as T);
+        }
+        return this.handleError(error);
+      })
+    );
+  }
+
   // Auth endpoints
   login(credentials: any): Observable<any> {
     return this.http.post(`${this.apiUrl}/auth/login`, credentials)
@@ -34,8 +62,7 @@ export class ApiService {
 
   // Workout endpoints
   getWorkouts(): Observable<any[]> {
-    return this.http.get<any[]>(`${this.apiUrl}/workouts`, this.getHttpOptions())
-      .pipe(catchError(this.handleError));
+    return this.getWithEtag<any[]>(`${this.apiUrl}/workouts`);
   }
 
   createWorkout(workout: any): Observable<any> {
@@ -53,10 +80,16 @@ export class ApiService {
       .pipe(catchError(this.handleError));
   }
 
+  // Ranked by the user's own history, then a shared catalog
+  suggestExercises(query: string, limit = 5): Observable<any[]> {
+    const params = `q=${encodeURIComponent(query)}&limit=${limit}`;
+    return this.http.get<any[]>(`${this.apiUrl}/exercises/suggest?${params}`, this.getHttpOptions())
+      .pipe(catchError(this.handleError));
+  }
+
   // Cardio endpoints
   getCardioSessions(): Observable<any[]> {
-    return this.http.get<any[]>(`${this.apiUrl}/cardio`, this.getHttpOptions())
-      .pipe(catchError(this.handleError));
+    return this.getWithEtag<any[]>(`${this.apiUrl}/cardio`);
   }
 
   createCardioSession(session: any): Observable<any> {
@@ -74,9 +107,34 @@ export class ApiService {
       .pipe(catchError(this.handleError));
   }
 
+  // Offline sync: operations carry opIds, so a batch retried after a dropped
+  // connection is applied once
+  sync(operations: any[], syncToken?: string | null): Observable<any> {
+    return this.http.post(`${this.apiUrl}/sync`, { operations, syncToken }, this.getHttpOptions())
+      .pipe(
+        retry({
+          count: 3,
+          delay: (error: HttpErrorResponse, attempt: number) =>
+            error.status === 0 ? timer(1000 * 2 ** attempt) : throwError(() => error)
+        }),
+        catchError(this.handleError)
+      );
+  }
+
+  // Stats endpoints
+  getStats(): Observable<any> {
+    return this.getWithEtag<any>(`${this.apiUrl}/stats`);
+  }
+
   // AI Chat endpoints
-  sendChatMessage(message: string): Observable<any> {
-    return this.http.post(`${this.apiUrl}/chat`, { message }, this.getHttpOptions())
+  sendChatMessage(message: string, conversationId?: string): Observable<any> {
+    return this.http.post(`${this.apiUrl}/chat`, { message, conversationId }, this.getHttpOptions())
+      .pipe(catchError(this.handleError));
+  }
+
+  getChatMessages(conversationId: string, cursor?: string): Observable<any[]> {
+    const query = cursor ? `?cursor=${encodeURIComponent(cursor)}` : '';
+    return this.http.get<any[]>(`${this.apiUrl}/chat/conversations/${conversationId}/messages${query}`, this.getHttpOptions())
       .pipe(catchError(this.handleError));
   }
 